@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+卡拉OK生成器微基准
+Karaoke Generator Microbenchmark
+
+Times line grouping and \\kf tag generation on a synthetic transcript and compares
+against the original per-word implementation kept in tests/test_karaoke_generator.py,
+then compares the streaming ASS writer with serialising through pysubs2.
+
+Usage:
+    python benchmarks/bench_karaoke_generator.py --hours 3 --repeat 5
+"""
+
+import argparse
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tests'))
+
+from subsai.karaoke_generator import KaraokeGenerator
+from subsai.word_timings import WordTimings
+from test_karaoke_generator import reference_generate
+
+VOCAB = ['hello', 'world', 'karaoke', 'subtitle', 'generator', 'the', 'a', 'is',
+         '我们', '今天', '唱歌', '测试', 'beautiful', 'night', 'tonight', 'dance']
+
+
+def synthetic_words(hours: float, words_per_minute: int = 150, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    words, t = [], 0
+    for _ in range(int(hours * 60 * words_per_minute)):
+        duration = rng.randint(120, 700)
+        words.append({"word": rng.choice(VOCAB), "start": t, "end": t + duration})
+        t += duration + rng.choice([0, 0, 0, rng.randint(50, 1500)])
+    return words
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=float, default=2.0, help='length of the synthetic transcript')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case, the best time is reported')
+    args = parser.parse_args()
+
+    words = synthetic_words(args.hours)
+    timings = WordTimings.from_word_list(words)
+    print(f"{len(words)} words ({args.hours} h)")
+
+    for wrap in [None, 1080]:
+        generator = KaraokeGenerator(words_per_line=10, max_line_width_px=wrap)
+        legacy = best_of(args.repeat, lambda: reference_generate(generator, words))
+        # 每次使用新的生成器，避免命中分阶段缓存
+        vectorized = best_of(args.repeat, lambda: KaraokeGenerator(
+            words_per_line=10, max_line_width_px=wrap).generate_from_word_timings(timings))
+        assert (reference_generate(generator, words).to_string('ass')
+                == generator.generate_from_word_timings(timings).to_string('ass'))
+        print(f"max_line_width_px={wrap}: legacy {legacy * 1000:.1f} ms, "
+              f"vectorized {vectorized * 1000:.1f} ms ({legacy / vectorized:.1f}x)")
+
+    pysubs2_path = best_of(args.repeat, lambda: KaraokeGenerator(
+        words_per_line=1).generate_from_word_timings(timings).to_string('ass'))
+    streaming = best_of(args.repeat, lambda: KaraokeGenerator(
+        words_per_line=1).write_ass(timings, io.StringIO()))
+    print(f"ASS serialisation (one word per line): pysubs2 {pysubs2_path * 1000:.1f} ms, "
+          f"write_ass {streaming * 1000:.1f} ms ({pysubs2_path / streaming:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
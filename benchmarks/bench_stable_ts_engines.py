@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+stable-ts引擎基准
+stable-ts Engine Benchmark
+
+Transcribes the same media file with the PyTorch Whisper engine and the
+faster-whisper (CTranslate2) engine of `jianfch/stable-ts` and reports the load
+time, the transcription time and the real-time factor of each.
+
+Usage:
+    python benchmarks/bench_stable_ts_engines.py song.mp4 --model-type base --compute-type int8 --repeat 2
+"""
+
+import argparse
+import time
+
+from subsai import SubsAI
+from subsai.alignment import SAMPLE_RATE, load_audio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('media_file', help='audio or video file to transcribe')
+    parser.add_argument('--model-type', default='base', help='Whisper model size')
+    parser.add_argument('--device', default='cpu', help='device for both engines')
+    parser.add_argument('--compute-type', default='int8', help='CTranslate2 compute type of the faster-whisper engine')
+    parser.add_argument('--cpu-threads', type=int, default=0, help='CTranslate2 CPU threads (0 = default)')
+    parser.add_argument('--word-timestamps', action='store_true', help='transcribe with word level timestamps')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per engine, the best time is reported')
+    args = parser.parse_args()
+
+    duration = len(load_audio(args.media_file)) / SAMPLE_RATE
+    print(f"{args.media_file}: {duration:.1f} s of audio, model {args.model_type} on {args.device}")
+
+    subs_ai = SubsAI()
+    for engine in ['whisper', 'faster-whisper']:
+        configs = {'engine': engine,
+                   'model_type': args.model_type,
+                   'device': args.device,
+                   'word_timestamps': args.word_timestamps,
+                   'fp16': args.device != 'cpu',
+                   'compute_type': args.compute_type,
+                   'cpu_threads': args.cpu_threads}
+        start = time.perf_counter()
+        model = subs_ai.create_model('jianfch/stable-ts', configs)
+        load_time = time.perf_counter() - start
+
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            subs = subs_ai.transcribe(args.media_file, model)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f"{engine:>15}: load {load_time:.1f} s, transcribe {best:.1f} s "
+              f"(RTF {best / duration:.3f}, {len(subs)} events)")
+
+
+if __name__ == '__main__':
+    main()
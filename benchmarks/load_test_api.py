@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量处理服务负载测试
+Batch Service Load Test
+
+Polls the lightweight endpoints of a running api_service (/api/health,
+/api/jobs, /api/jobs/{id}) from many concurrent clients and reports latency
+percentiles. Optionally uploads a video and submits a processing job first, so the
+measurement happens while transcription and encoding are running. The script exits
+with status 1 when the p99 latency is above --max-p99-ms.
+
+Usage:
+    python benchmarks/load_test_api.py --url http://localhost:8001 --video test.mp4 \\
+        --clients 32 --duration 60 --max-p99-ms 200
+"""
+
+import argparse
+import json
+import mimetypes
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+
+
+def request(url: str, data: bytes = None, headers: dict = None, timeout: float = 30) -> bytes:
+    req = urllib.request.Request(url, data=data, headers=headers or {})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return response.read()
+
+
+def submit_job(base_url: str, video: Path, config: dict) -> str:
+    boundary = uuid.uuid4().hex
+    content_type = mimetypes.guess_type(video.name)[0] or 'application/octet-stream'
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="{video.name}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n').encode() + video.read_bytes() + f'\r\n--{boundary}--\r\n'.encode()
+    uploaded = json.loads(request(f'{base_url}/api/upload', body,
+                                  {'Content-Type': f'multipart/form-data; boundary={boundary}'}))
+    payload = json.dumps({'file_ids': [f['id'] for f in uploaded['files']], 'config': config}).encode()
+    job = json.loads(request(f'{base_url}/api/process', payload, {'Content-Type': 'application/json'}))
+    return job['job_id']
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8001', help='base URL of the service')
+    parser.add_argument('--video', type=Path, default=None, help='video to process while measuring')
+    parser.add_argument('--config', default='{}', help='ProcessConfig JSON for the background job')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent polling clients')
+    parser.add_argument('--duration', type=float, default=30, help='measurement duration in seconds')
+    parser.add_argument('--max-p99-ms', type=float, default=250, help='fail when the p99 latency is above this')
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    endpoints = ['/api/health', '/api/jobs?limit=20']
+    if args.video is not None:
+        job_id = submit_job(base_url, args.video, json.loads(args.config))
+        endpoints.append(f'/api/jobs/{job_id}')
+        print(f"submitted job {job_id}")
+
+    latencies = {endpoint: [] for endpoint in endpoints}
+    errors = []
+    stop_at = time.monotonic() + args.duration
+
+    def client(index: int):
+        n = index
+        while time.monotonic() < stop_at:
+            endpoint = endpoints[n % len(endpoints)]
+            n += 1
+            start = time.perf_counter()
+            try:
+                request(base_url + endpoint)
+            except Exception as e:
+                errors.append(f"{endpoint}: {e}")
+                continue
+            latencies[endpoint].append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    if not all_latencies:
+        print("no successful requests")
+        return 1
+    for endpoint, values in [*latencies.items(), ('all', all_latencies)]:
+        if values:
+            print(f"{endpoint:>30}: n={len(values):6d} p50={percentile(values, 50):7.1f} ms "
+                  f"p95={percentile(values, 95):7.1f} ms p99={percentile(values, 99):7.1f} ms "
+                  f"max={max(values):7.1f} ms")
+    print(f"{len(all_latencies) / args.duration:.0f} req/s, {len(errors)} errors")
+
+    p99 = percentile(all_latencies, 99)
+    if p99 > args.max_p99_ms:
+        print(f"FAIL: p99 {p99:.1f} ms > {args.max_p99_ms} ms")
+        return 1
+    print(f"OK: p99 {p99:.1f} ms <= {args.max_p99_ms} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
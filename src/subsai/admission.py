@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+任务准入控制
+Cost-based Admission Control and ETA Estimation
+
+Each submitted job is priced in slot-seconds: media duration times the measured
+real-time factor of its transcription model, plus media duration times the encode
+cost of its x264 preset. The queue ahead of the job (in its priority class or
+higher) is priced the same way. The two estimates give an ETA, and with them the
+service can refuse, or defer, work that would push the backlog past its capacity.
+It can also refuse a client that already holds more than its fair share of the
+queue.
+
+Real-time factors start from rough per-model defaults and follow the measured
+values (exponentially weighted) as files finish.
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from subsai.encode_planner import X264_PRESET_SPEED
+
+# 优先级类别 -> 排序值（越小越先执行）
+PRIORITY_CLASSES = {'interactive': 0, 'normal': 1, 'batch': 2}
+DEFAULT_PRIORITY = 'normal'
+
+# 转录耗时/媒体时长的初始估计（按模型类型），实测值到来后逐渐替换
+DEFAULT_TRANSCRIBE_RTF = {
+    'tiny': 0.05,
+    'base': 0.08,
+    'small': 0.15,
+    'medium': 0.3,
+    'large-v1': 0.5,
+    'large-v2': 0.5,
+    'large-v3': 0.5,
+    'large-v3-turbo': 0.2,
+}
+FALLBACK_TRANSCRIBE_RTF = 0.3
+# 歌词强制对齐（不做语音识别）的初始估计
+ALIGNMENT_RTF = 0.1
+# medium预设下编码耗时/媒体时长的初始估计，其他预设按 X264_PRESET_SPEED 换算
+DEFAULT_ENCODE_RTF = 0.5
+# 无法读取时长的媒体按此时长（秒）估算
+UNKNOWN_MEDIA_DURATION_S = 300.0
+# 占用队列的状态（deferred 尚未进入队列，只在延后任务自己的ETA中计入）
+QUEUED_STATUSES = ('pending', 'processing')
+
+
+def cost_model_key(model_name: str, model_config: Optional[Dict[str, Any]]) -> str:
+    """
+    转录实时率的统计键：模型名 + 模型类型
+
+    Args:
+        model_name: 模型名（歌词对齐为 'forced-alignment'）
+        model_config: 模型配置
+
+    Returns:
+        统计键
+    """
+    model_type = (model_config or {}).get('model_type')
+    return f"{model_name}:{model_type}" if model_type else model_name
+
+
+class CostModel:
+    """
+    按模型统计的转录实时率和按预设换算的编码实时率（指数加权平均，线程安全）
+    """
+
+    def __init__(self, alpha: float = 0.2, encode_rtf: float = DEFAULT_ENCODE_RTF):
+        """
+        初始化成本模型
+
+        Args:
+            alpha: 新观测值的权重
+            encode_rtf: medium预设编码实时率的初始值
+        """
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._transcribe_rtf: Dict[str, float] = {}
+        self._encode_rtf = encode_rtf
+        self.observations = {'transcribe': 0, 'encode': 0}
+
+    def _update(self, current: Optional[float], value: float) -> float:
+        return value if current is None else current + self.alpha * (value - current)
+
+    def transcribe_rtf(self, key: str) -> float:
+        """返回模型的转录实时率（实测优先，否则按模型类型给初始值）"""
+        with self._lock:
+            if key in self._transcribe_rtf:
+                return self._transcribe_rtf[key]
+        if key.startswith('forced-alignment'):
+            return ALIGNMENT_RTF
+        model_type = key.rsplit(':', 1)[-1] if ':' in key else None
+        return DEFAULT_TRANSCRIBE_RTF.get(model_type, FALLBACK_TRANSCRIBE_RTF)
+
+    def observe_transcribe(self, key: str, media_s: Optional[float], elapsed_s: float):
+        """
+        记录一次转录的实测耗时
+
+        Args:
+            key: :func:`cost_model_key`
+            media_s: 媒体时长（秒），未知时忽略
+            elapsed_s: 转录耗时（秒）
+        """
+        if not media_s:
+            return
+        with self._lock:
+            self._transcribe_rtf[key] = self._update(self._transcribe_rtf.get(key), elapsed_s / media_s)
+            self.observations['transcribe'] += 1
+
+    def encode_rtf(self, preset: str) -> float:
+        """返回预设的编码实时率"""
+        with self._lock:
+            medium_rtf = self._encode_rtf
+        return medium_rtf / X264_PRESET_SPEED.get(preset, 1.0)
+
+    def observe_encode(self, preset: str, media_s: Optional[float], elapsed_s: float):
+        """
+        记录一次编码的实测耗时（换算成medium预设后更新）
+
+        Args:
+            preset: 实际使用的x264预设
+            media_s: 媒体时长（秒），未知时忽略
+            elapsed_s: 编码耗时（秒）
+        """
+        if not media_s:
+            return
+        with self._lock:
+            self._encode_rtf = self._update(self._encode_rtf,
+                                            elapsed_s / media_s * X264_PRESET_SPEED.get(preset, 1.0))
+            self.observations['encode'] += 1
+
+    def estimate(self, durations: Iterable[Optional[float]], transcribe_key: Optional[str],
+                 preset: Optional[str]) -> Tuple[float, float]:
+        """
+        估算一个任务的成本
+
+        Args:
+            durations: 各文件的媒体时长（秒），None 表示未知
+            transcribe_key: 转录实时率的统计键，None 表示不需要转录（复用已有转录）
+            preset: 编码预设，None 表示不烧录
+
+        Returns:
+            (转录槽秒数, 编码槽秒数)
+        """
+        total_s = sum(UNKNOWN_MEDIA_DURATION_S if duration is None else duration for duration in durations)
+        asr_s = total_s * self.transcribe_rtf(transcribe_key) if transcribe_key else 0.0
+        encode_s = total_s * self.encode_rtf(preset) if preset else 0.0
+        return asr_s, encode_s
+
+    def stats(self) -> Dict[str, Any]:
+        """返回当前的实时率估计"""
+        with self._lock:
+            return {
+                'transcribe_rtf': {key: round(value, 3) for key, value in self._transcribe_rtf.items()},
+                'encode_rtf_medium': round(self._encode_rtf, 3),
+                'observations': dict(self.observations),
+            }
+
+
+def remaining_cost(job: Dict[str, Any]) -> Tuple[float, float]:
+    """按进度折算任务剩余的 (转录, 编码) 槽秒数"""
+    remaining = 1.0 - (job.get('progress') or 0) / 100
+    return job['estimated_asr_s'] * remaining, job['estimated_encode_s'] * remaining
+
+
+def estimate_finish_s(jobs: Iterable[Dict[str, Any]], slots: Dict[str, int],
+                      extra: Tuple[float, float] = (0.0, 0.0)) -> float:
+    """
+    估算完成一组任务（加上额外成本）所需的时间
+
+    转录和编码流水线并行，取较慢的阶段：max(转录槽秒数 / 转录槽数, 编码槽秒数 / 编码槽数)。
+
+    Args:
+        jobs: 任务（需要 estimated_asr_s、estimated_encode_s、progress）
+        slots: 阶段 -> 槽数（asr、encode）
+        extra: 额外的 (转录, 编码) 槽秒数
+
+    Returns:
+        秒数
+    """
+    asr_s, encode_s = extra
+    for job in jobs:
+        job_asr_s, job_encode_s = remaining_cost(job)
+        asr_s += job_asr_s
+        encode_s += job_encode_s
+    return max(asr_s / max(slots.get('asr', 1), 1), encode_s / max(slots.get('encode', 1), 1))
+
+
+class AdmissionController:
+    """
+    根据队列积压决定接受、延后或拒绝新任务
+    """
+
+    def __init__(self, slots: Dict[str, int], max_backlog_s: float, max_client_backlog_s: Optional[float] = None):
+        """
+        初始化准入控制
+
+        Args:
+            slots: 阶段 -> 槽数（asr、encode），用于把槽秒数换算成等待时间
+            max_backlog_s: 新任务预计完成时间的上限（秒），超过时拒绝或延后
+            max_client_backlog_s: 单个客户端在队列中的工作量上限（槽秒数），None 表示不限制
+        """
+        self.slots = slots
+        self.max_backlog_s = max_backlog_s
+        self.max_client_backlog_s = max_client_backlog_s
+
+    def jobs_ahead(self, jobs: List[Dict[str, Any]], priority: int, include_deferred: bool = False):
+        """排在该优先级任务之前的任务：处理中的任务，以及同级或更高优先级的等待中任务"""
+        statuses = QUEUED_STATUSES + (('deferred',) if include_deferred else ())
+        return [job for job in jobs if job['status'] == 'processing'
+                or (job['status'] in statuses and job['priority'] <= priority)]
+
+    def decide(self, jobs: List[Dict[str, Any]], cost: Tuple[float, float], client_id: Optional[str],
+               priority: int, allow_defer: bool = False) -> Dict[str, Any]:
+        """
+        对一个新任务做准入决策
+
+        Args:
+            jobs: 未结束的任务（需要 status、priority、client_id、progress 和成本估计）
+            cost: 新任务的 (转录, 编码) 槽秒数
+            client_id: 提交任务的客户端
+            priority: 新任务的优先级排序值
+            allow_defer: 超出容量时是否延后而不是拒绝
+
+        Returns:
+            {'action': 'accept' | 'defer' | 'reject', 'eta_s': 预计完成时间（秒）,
+             'retry_after_s': 建议重试间隔（仅拒绝时）, 'reason': 拒绝或延后的原因}
+        """
+        # 公平份额：同一客户端的积压超过上限时拒绝（客户端没有积压时总是允许提交一个任务）
+        if self.max_client_backlog_s is not None:
+            client_jobs = [job for job in jobs if job['client_id'] == client_id]
+            client_backlog_s = sum(sum(remaining_cost(job)) for job in client_jobs)
+            if client_backlog_s > 0 and client_backlog_s + sum(cost) > self.max_client_backlog_s:
+                return {
+                    'action': 'reject',
+                    'eta_s': None,
+                    'retry_after_s': estimate_finish_s(client_jobs, self.slots),
+                    'reason': 'client_share',
+                }
+
+        ahead = self.jobs_ahead(jobs, priority)
+        wait_s = estimate_finish_s(ahead, self.slots)
+        eta_s = estimate_finish_s(ahead, self.slots, cost)
+        # 队列为空时任何任务都接受，否则预计完成时间不能超过上限
+        if wait_s == 0 or eta_s <= self.max_backlog_s:
+            return {'action': 'accept', 'eta_s': eta_s, 'retry_after_s': None, 'reason': None}
+        if allow_defer:
+            return {
+                'action': 'defer',
+                'eta_s': estimate_finish_s(self.jobs_ahead(jobs, priority, include_deferred=True), self.slots, cost),
+                'retry_after_s': None,
+                'reason': 'capacity',
+            }
+        return {'action': 'reject', 'eta_s': eta_s, 'retry_after_s': eta_s - self.max_backlog_s, 'reason': 'capacity'}
+
+    def can_start(self, jobs: List[Dict[str, Any]], deferred_job: Dict[str, Any]) -> bool:
+        """延后的任务现在是否可以进入队列"""
+        ahead = self.jobs_ahead([job for job in jobs if job['job_id'] != deferred_job['job_id']],
+                                deferred_job['priority'])
+        wait_s = estimate_finish_s(ahead, self.slots)
+        return wait_s == 0 or estimate_finish_s(ahead, self.slots, remaining_cost(deferred_job)) <= self.max_backlog_s
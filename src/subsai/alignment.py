@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+强制对齐
+CTC Forced Alignment of Subtitle Text to Audio
+
+Turns segment-level subtitles (whisper.cpp, OpenAI API, faster-whisper without word
+timestamps, ...) into real word timings. Each segment's text is aligned to its slice
+of audio with torchaudio's multilingual MMS_FA acoustic model (about 300M parameters,
+runs on CPU) and `torchaudio.functional.forced_align`.
+
+MMS_FA works on romanized lowercase text; non-latin words are romanized with
+`unidecode` (listed in requirements.txt). Without it only latin-script words can be
+aligned, and a warning is logged when the aligner loads. Words that still have no
+alignable character are spread over the gap between their aligned neighbours.
+
+When the exact lyrics are known, `align_lyrics` aligns the whole text to the whole
+song directly, so karaoke timings can be produced without running any ASR model.
+"""
+
+import logging
+import re
+import subprocess
+import time
+import threading
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+from pysubs2 import SSAFile
+
+from subsai.word_timings import WordTimings
+
+try:
+    from unidecode import unidecode
+except ImportError:
+    unidecode = None
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+# 对齐时在句子前后额外包含的音频（秒），容忍转录时间戳的误差
+SEGMENT_PADDING_S = 0.25
+
+# 长音频分块计算声学模型输出（秒），避免整首歌一次性推理占用过多内存。
+# MMS_FA的卷积特征提取感受野为400采样、步长320，30秒（480000采样）的块输出
+# (480000 - 400) // 320 + 1 = 1499帧而不是1500帧；align_words 按
+# 音频长度 / 总帧数 换算时间，每块少的一帧被均摊到整段音频上
+EMISSION_CHUNK_S = 30
+# 卷积特征提取的感受野（采样数）：更短的输入无法计算，补零到这个长度
+_RECEPTIVE_FIELD_SAMPLES = 400
+# 分块后剩下的尾部短于这个长度（秒）时并入前一块，避免输入短于感受野
+EMISSION_MIN_TAIL_S = 1
+
+# LRC歌词的时间标签，例如 [01:23.45]
+_LRC_TAG_RE = re.compile(r'\[\d+:\d+(?:[.:]\d+)?\]')
+
+
+def load_audio(media_file: str, sample_rate: int = SAMPLE_RATE, ffmpeg_binary: str = '/usr/bin/ffmpeg') -> np.ndarray:
+    """
+    用ffmpeg将媒体文件解码为单声道float32音频
+
+    Args:
+        media_file: 媒体文件路径
+        sample_rate: 采样率
+        ffmpeg_binary: ffmpeg可执行文件路径
+
+    Returns:
+        音频采样数组（-1.0 ~ 1.0）
+    """
+    cmd = [ffmpeg_binary, '-nostdin', '-v', 'error', '-i', media_file,
+           '-map', '0:a:0', '-ac', '1', '-ar', str(sample_rate), '-f', 'f32le', '-']
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to decode audio from {media_file}: "
+                           f"{result.stderr.decode('utf-8', errors='ignore')}")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def _fill_unaligned(starts: List[Optional[int]], ends: List[Optional[int]], lower: int, upper: int):
+    """
+    将没有对齐结果的连续单词均匀分布在前后已对齐单词之间（原地修改）
+
+    Args:
+        starts: 单词开始时间（毫秒），未对齐为None
+        ends: 单词结束时间（毫秒），未对齐为None
+        lower: 第一个单词的最早开始时间
+        upper: 最后一个单词的最晚结束时间
+    """
+    i = 0
+    while i < len(starts):
+        if starts[i] is not None:
+            i += 1
+            continue
+        j = i
+        while j < len(starts) and starts[j] is None:
+            j += 1
+        gap_start = ends[i - 1] if i > 0 else lower
+        gap_end = starts[j] if j < len(starts) else upper
+        step = max(gap_end - gap_start, 0) / (j - i)
+        for k in range(i, j):
+            starts[k] = gap_start + int((k - i) * step)
+            ends[k] = gap_start + int((k - i + 1) * step)
+        i = j
+
+
+def parse_lyrics(lyrics: str) -> List[List[str]]:
+    """
+    将歌词文本拆分为行和单词（忽略空行，去掉LRC时间标签）
+
+    Args:
+        lyrics: 歌词文本，每行一句
+
+    Returns:
+        每行的单词列表
+    """
+    lines = []
+    for line in lyrics.splitlines():
+        words = _LRC_TAG_RE.sub(' ', line).split()
+        if words:
+            lines.append(words)
+    return lines
+
+
+class ForcedAligner:
+    """
+    基于CTC的词级强制对齐器（torchaudio MMS_FA）
+
+    模型在第一次对齐时加载，同一个对齐器可以在多个线程中复用。
+    """
+
+    def __init__(self, device: str = 'cpu'):
+        """
+        初始化对齐器
+
+        Args:
+            device: 运行设备（cpu/cuda）
+        """
+        self.device = device
+        self._model = None
+        self._aligner = None
+        self._dictionary = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is not None:
+                return
+            import torchaudio
+
+            if unidecode is None:
+                logger.warning("⚠️ 未安装 unidecode，非拉丁文字（中文、日文、韩文等）的歌词和字幕无法对齐，"
+                               "这些单词只能按相邻单词均匀分配时间。请安装: pip install unidecode")
+            bundle = torchaudio.pipelines.MMS_FA
+            self._model = bundle.get_model(with_star=False).to(self.device).eval()
+            self._aligner = bundle.get_aligner()
+            # 索引0是CTC空白符，不能出现在对齐目标中
+            self._dictionary = {char: index for char, index in bundle.get_dict(star=None).items() if index != 0}
+            logger.info(f"🎯 强制对齐模型已加载 (MMS_FA, device={self.device})")
+
+    def normalize_word(self, word: str) -> str:
+        """
+        将单词转换为对齐模型字典中的字符（罗马化、小写，去掉标点等无法对齐的字符）
+
+        Args:
+            word: 原始单词
+
+        Returns:
+            可对齐的字符串，可能为空
+        """
+        if unidecode is not None:
+            word = unidecode(word)
+        return ''.join(char for char in word.lower() if char in self._dictionary)
+
+    def _emission(self, audio: np.ndarray):
+        import torch
+
+        chunk = EMISSION_CHUNK_S * SAMPLE_RATE
+        bounds = list(range(0, len(audio), chunk))
+        if len(bounds) > 1 and len(audio) - bounds[-1] < EMISSION_MIN_TAIL_S * SAMPLE_RATE:
+            bounds.pop()
+        bounds.append(len(audio))
+        emissions = []
+        with torch.inference_mode():
+            for first, last in zip(bounds, bounds[1:]):
+                piece = audio[first:last]
+                if len(piece) < _RECEPTIVE_FIELD_SAMPLES:
+                    # 整段音频比感受野还短（只有一块）：补零后只得到一帧
+                    piece = np.pad(piece, (0, _RECEPTIVE_FIELD_SAMPLES - len(piece)))
+                waveform = torch.from_numpy(np.ascontiguousarray(piece)).unsqueeze(0).to(self.device)
+                emission, _ = self._model(waveform)
+                emissions.append(emission[0].cpu())
+        return emissions[0] if len(emissions) == 1 else torch.cat(emissions)
+
+    def align_words(self, audio: np.ndarray, words: List[str], offset_ms: int = 0) -> Tuple[List[Optional[int]], List[Optional[int]]]:
+        """
+        将一组单词对齐到一段音频
+
+        Args:
+            audio: 16kHz单声道音频
+            words: 单词列表
+            offset_ms: 这段音频在整个文件中的起始时间（毫秒）
+
+        Returns:
+            (开始时间列表, 结束时间列表)，单位毫秒；无法对齐的单词为None
+        """
+        self._load()
+        starts: List[Optional[int]] = [None] * len(words)
+        ends: List[Optional[int]] = [None] * len(words)
+        normalized = [self.normalize_word(word) for word in words]
+        alignable = [i for i, word in enumerate(normalized) if word]
+        if not alignable or len(audio) == 0:
+            return starts, ends
+
+        emission = self._emission(audio)
+        tokens = [[self._dictionary[char] for char in normalized[i]] for i in alignable]
+        if sum(len(word_tokens) for word_tokens in tokens) > emission.size(0):
+            # 音频太短，无法容纳所有字符
+            return starts, ends
+
+        ms_per_frame = len(audio) / emission.size(0) / SAMPLE_RATE * 1000
+        for i, spans in zip(alignable, self._aligner(emission, tokens)):
+            starts[i] = offset_ms + int(spans[0].start * ms_per_frame)
+            ends[i] = offset_ms + int(spans[-1].end * ms_per_frame)
+        return starts, ends
+
+    def align(self, media_file: str, subs: SSAFile, audio: Optional[np.ndarray] = None) -> WordTimings:
+        """
+        对齐字幕中每个句子的单词，返回真实的词级时间戳
+
+        Args:
+            media_file: 媒体文件路径
+            subs: 句子级字幕（来自任意后端）
+            audio: 已解码的16kHz音频（可选，None则从media_file解码）
+
+        Returns:
+            WordTimings（segments为字幕事件序号）
+        """
+        if audio is None:
+            audio = load_audio(media_file)
+        padding = int(SEGMENT_PADDING_S * SAMPLE_RATE)
+
+        timings = WordTimings()
+        for segment_index, event in enumerate(subs):
+            words = event.plaintext.split()
+            if not words:
+                continue
+
+            first = max(event.start * SAMPLE_RATE // 1000 - padding, 0)
+            last = min(event.end * SAMPLE_RATE // 1000 + padding, len(audio))
+            try:
+                starts, ends = self.align_words(audio[first:last], words, offset_ms=first * 1000 // SAMPLE_RATE)
+            except Exception as e:
+                logger.warning(f"⚠️  对齐失败 [{event.start}ms - {event.end}ms]: {e}，使用均分时间")
+                starts, ends = [None] * len(words), [None] * len(words)
+            _fill_unaligned(starts, ends, event.start, event.end)
+
+            for word, start, end in zip(words, starts, ends):
+                timings.append(word, start, end, segment_index)
+
+        return timings
+
+    def align_lyrics(self, media_file: str, lyrics: str, audio: Optional[np.ndarray] = None) -> WordTimings:
+        """
+        将已知歌词对齐到整首歌（不需要语音识别）
+
+        Args:
+            media_file: 媒体文件路径
+            lyrics: 歌词文本，每行一句
+            audio: 已解码的16kHz音频（可选，None则从media_file解码）
+
+        Returns:
+            WordTimings（segments为歌词行号）
+        """
+        start_time = time.time()
+        if audio is None:
+            audio = load_audio(media_file)
+        lines = parse_lyrics(lyrics)
+        words = [word for line in lines for word in line]
+        segments = [index for index, line in enumerate(lines) for _ in line]
+
+        try:
+            starts, ends = self.align_words(audio, words)
+        except Exception as e:
+            logger.warning(f"⚠️  歌词对齐失败: {media_file}: {e}，使用均分时间")
+            starts, ends = [None] * len(words), [None] * len(words)
+        else:
+            if all(start is None for start in starts):
+                logger.warning(f"⚠️  歌词无法对齐到音频: {media_file}，使用均分时间")
+        _fill_unaligned(starts, ends, 0, len(audio) * 1000 // SAMPLE_RATE)
+
+        timings = WordTimings()
+        for word, start, end, segment in zip(words, starts, ends, segments):
+            timings.append(word, start, end, segment)
+        logger.info(f"🎯 歌词对齐完成: {len(words)} 个单词, {len(lines)} 行, "
+                    f"耗时 {time.time() - start_time:.1f}s")
+        return timings
+
+
+@lru_cache(maxsize=4)
+def get_forced_aligner(device: str = 'cpu') -> ForcedAligner:
+    """
+    返回进程内共享的对齐器（模型只加载一次）
+
+    Args:
+        device: 运行设备
+
+    Returns:
+        ForcedAligner
+    """
+    return ForcedAligner(device=device)
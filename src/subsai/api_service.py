@@ -7,20 +7,25 @@ Batch Processing Backend Service for Subsai Karaoke
 整合现有的卡拉OK生成功能，提供批量处理接口
 """
 
+import io
 import os
 import sys
 import json
+import ffmpeg
 import asyncio
+import functools
 import uuid
 import shutil
 import logging
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from tempfile import NamedTemporaryFile
 
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
@@ -28,8 +33,22 @@ from pydantic import BaseModel
 # 导入subsai卡拉OK功能
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from subsai import SubsAI, Tools
-from subsai.karaoke_generator import create_karaoke_subtitles
-from subsai.karaoke_styles import get_style_names
+from subsai.karaoke_generator import KaraokeGenerator
+from subsai.alignment import get_forced_aligner
+from subsai.word_timings import attach_word_timings, get_word_timings
+from subsai.karaoke_styles import get_style_names, get_all_styles, get_style
+from subsai import fonts
+from subsai.mezzanine_cache import MezzanineCache
+from subsai.job_store import JobStore, JobHeartbeat, TERMINAL_STATUSES
+from subsai.cancellation import CancellationToken, JobCancelled
+from subsai.worker_pool import StageSlots, ModelPool
+from subsai.disk_cache import make_cache_key
+from subsai.upload_store import UploadStore, UPLOAD_CHUNK_SIZE
+from subsai.result_cache import ResultCache, dump_transcript, load_transcript
+from subsai.job_events import JobEventHub, ALL_JOBS
+from subsai.admission import (AdmissionController, CostModel, PRIORITY_CLASSES, DEFAULT_PRIORITY,
+                              cost_model_key, estimate_finish_s)
+from subsai import metrics
 
 # 配置日志
 logging.basicConfig(
@@ -61,6 +80,7 @@ UPLOAD_DIR = WEBAPP_DIR / "uploads"
 OUTPUT_DIR = WEBAPP_DIR / "outputs"
 STATIC_DIR = WEBAPP_DIR / "static"
 TEMPLATE_DIR = WEBAPP_DIR / "templates"
+CACHE_DIR = WEBAPP_DIR / "cache"
 
 # 默认配置文件路径
 DEFAULT_CONFIG_PATH = BASE_DIR / "linto-ai-whisper-timestamped_configs.json"
@@ -69,13 +89,110 @@ DEFAULT_CONFIG_PATH = BASE_DIR / "linto-ai-whisper-timestamped_configs.json"
 for dir_path in [UPLOAD_DIR, OUTPUT_DIR, STATIC_DIR, TEMPLATE_DIR]:
     dir_path.mkdir(parents=True, exist_ok=True)
 
+# 中间片缓存（缩放/裁剪后的源视频，用于同一视频换样式重复渲染）
+MEZZANINE_CACHE_MAX_GB = float(os.environ.get("SUBSAI_MEZZANINE_CACHE_GB", "20"))
+mezzanine_cache = MezzanineCache(CACHE_DIR / "mezzanine", max_size_gb=MEZZANINE_CACHE_MAX_GB)
+
+# 结果缓存：相同视频+相同转录配置复用字幕，完全相同的请求直接复用成品视频
+RENDER_CACHE_MAX_GB = float(os.environ.get("SUBSAI_RENDER_CACHE_GB", "50"))
+result_cache = ResultCache(CACHE_DIR / "results", render_max_size_gb=RENDER_CACHE_MAX_GB)
+# 参与渲染缓存键的配置项（截止时间只影响编码预设的选择，见 process_video_file）
+KARAOKE_CACHE_FIELDS = ('style_name', 'words_per_line', 'fontsize', 'vertical_margin', 'custom_font',
+                        'custom_colors', 'use_font_metrics')
+ENCODE_CACHE_FIELDS = ('aspect_ratio', 'crf', 'preset', 'enable_uniqueness', 'uniqueness_seed')
+
+# 输出形式：video 烧录成品视频；subtitles 只输出SRT字幕；karaoke 只输出卡拉OK ASS字幕（都不经过编码阶段）
+OUTPUT_MODES = ('video', 'subtitles', 'karaoke')
+# 每个任务在输出目录下保存各文件的转录结果，之后可以不重新转录直接烧录
+JOB_TRANSCRIPT_DIR = '.transcripts'
+# /api/transcribe?wait=true 轮询任务状态的间隔（秒）
+TRANSCRIBE_WAIT_POLL_S = 0.5
+# /api/transcribe?wait=true 最长等待时间（秒），超时后返回任务ID，客户端改为轮询或订阅
+TRANSCRIBE_WAIT_MAX_S = float(os.environ.get("SUBSAI_TRANSCRIBE_WAIT_MAX_S", "300"))
+
 # 挂载静态文件和输出目录
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 app.mount("/outputs", StaticFiles(directory=str(OUTPUT_DIR)), name="outputs")
 
-# 全局状态管理
-jobs: Dict[str, Dict[str, Any]] = {}
-active_websockets: List[WebSocket] = []
+# 任务存储（SQLite WAL，重启后保留，多个uvicorn worker共享）
+JOB_DB_PATH = Path(os.environ.get("SUBSAI_JOB_DB", str(WEBAPP_DIR / "jobs.db")))
+JOB_LEASE_S = float(os.environ.get("SUBSAI_JOB_LEASE_S", "60"))  # 心跳超时后任务由其他worker接管
+JOB_TTL_HOURS = float(os.environ.get("SUBSAI_JOB_TTL_HOURS", "72"))  # 已结束任务的保留时间
+JOB_POLL_INTERVAL_S = 2.0
+job_store = JobStore(JOB_DB_PATH, lease_seconds=JOB_LEASE_S)
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+# 新任务提交后唤醒本进程的worker，其他进程的任务靠轮询发现
+job_wakeup = asyncio.Event()
+# 本进程正在执行的任务 {job_id: asyncio.Task}
+running_jobs: Dict[str, asyncio.Task] = {}
+# 本进程正在执行的任务的取消标记 {job_id: CancellationToken}
+job_tokens: Dict[str, CancellationToken] = {}
+# 取消时先terminate ffmpeg，超时后kill
+FFMPEG_TERMINATE_TIMEOUT_S = 5.0
+
+# 上传文件按SHA-256去重存储，file_id -> 路径的索引与任务共用数据库
+upload_store = UploadStore(UPLOAD_DIR, JOB_DB_PATH)
+
+# 分阶段工作槽：每个阶段的并发数固定，一个文件编码时下一个文件可以同时转录
+ASR_SLOTS = int(os.environ.get("SUBSAI_ASR_SLOTS", "1"))
+KARAOKE_SLOTS = int(os.environ.get("SUBSAI_KARAOKE_SLOTS", "2"))
+ENCODE_SLOTS = int(os.environ.get("SUBSAI_ENCODE_SLOTS", "2"))
+MAX_ACTIVE_JOBS = int(os.environ.get("SUBSAI_MAX_ACTIVE_JOBS", "4"))  # 本进程同时执行的任务数
+JOB_PIPELINE_DEPTH = int(os.environ.get("SUBSAI_JOB_PIPELINE_DEPTH", "3"))  # 单个任务同时在途的文件数
+MODEL_POOL_SIZE = int(os.environ.get("SUBSAI_MODEL_POOL_SIZE", str(ASR_SLOTS)))
+stage_slots = {
+    'asr': StageSlots('asr', ASR_SLOTS),
+    'karaoke': StageSlots('karaoke', KARAOKE_SLOTS),
+    'encode': StageSlots('encode', ENCODE_SLOTS),
+}
+# 转录模型按 (模型名, 配置) 复用，不再每个任务加载一次
+model_pool = ModelPool(max_models=MODEL_POOL_SIZE)
+
+# 准入控制：提交时探测媒体时长，按实测的转录/编码实时率估算成本。
+# 新任务的预计完成时间超过 MAX_BACKLOG_S 时拒绝（429）或按请求延后；
+# 单个客户端排队中的工作量（槽秒数）不超过 MAX_CLIENT_BACKLOG_S（0 表示不限制）
+MAX_BACKLOG_S = float(os.environ.get("SUBSAI_MAX_BACKLOG_S", "14400"))
+MAX_CLIENT_BACKLOG_S = float(os.environ.get("SUBSAI_MAX_CLIENT_BACKLOG_S", "7200"))
+cost_model = CostModel()
+admission = AdmissionController({'asr': ASR_SLOTS, 'encode': ENCODE_SLOTS}, MAX_BACKLOG_S,
+                                MAX_CLIENT_BACKLOG_S or None)
+
+# 转录、卡拉OK生成、烧录等阻塞/CPU密集的步骤在专用线程池中执行，事件循环只负责HTTP和WebSocket
+# 线程数至少等于各阶段槽数之和，槽被占用时不会再因线程不足而排队
+PROCESSING_THREADS = max(int(os.environ.get("SUBSAI_PROCESSING_THREADS", "2")),
+                         sum(slots.capacity for slots in stage_slots.values()) + 1)
+processing_executor = ThreadPoolExecutor(max_workers=PROCESSING_THREADS, thread_name_prefix="subsai-process")
+
+# WebSocket推送：按任务订阅，只推送变化的字段，每个连接最多约4次/秒
+WS_MIN_INTERVAL_S = float(os.environ.get("SUBSAI_WS_MIN_INTERVAL_S", "0.25"))
+# 轮询任务数据库的间隔（秒）：其他worker处理的任务的进度由此推送给本进程的WebSocket连接
+WS_POLL_INTERVAL_S = float(os.environ.get("SUBSAI_WS_POLL_INTERVAL_S", "1.0"))
+job_events = JobEventHub(min_interval=WS_MIN_INTERVAL_S)
+
+# 服务指标（/metrics，Prometheus文本格式）
+registry = metrics.Registry()
+METRIC_QUEUE_DEPTH = registry.gauge('subsai_queue_depth', 'Jobs waiting to be claimed')
+METRIC_JOBS = registry.gauge('subsai_jobs', 'Jobs in the store by status', ['status'])
+METRIC_ACTIVE_JOBS = registry.gauge('subsai_worker_active_jobs', 'Jobs running in this process')
+METRIC_SLOTS_BUSY = registry.gauge('subsai_stage_slots_busy', 'Busy stage slots', ['stage'])
+METRIC_SLOTS_WAITING = registry.gauge('subsai_stage_slots_waiting', 'Files waiting for a stage slot', ['stage'])
+METRIC_STAGE_SECONDS = registry.histogram('subsai_stage_duration_seconds', 'Duration of a processing stage per file',
+                                          ['stage'])
+METRIC_RTF = registry.histogram('subsai_transcribe_realtime_factor', 'Transcription time divided by media duration',
+                                ['model'], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8))
+METRIC_ENCODE_FPS = registry.histogram('subsai_encode_fps', 'ffmpeg burn-in encode speed in frames per second',
+                                       buckets=(5, 10, 25, 50, 100, 200, 400, 800))
+METRIC_FILES = registry.counter('subsai_files_total', 'Processed files by result', ['result'])
+METRIC_MODEL_POOL = registry.counter('subsai_model_pool_total', 'Model pool lookups by outcome', ['outcome'])
+METRIC_RESULT_CACHE = registry.counter('subsai_result_cache_total', 'Result cache lookups', ['kind', 'outcome'])
+METRIC_UPLOAD_BYTES = registry.counter('subsai_upload_bytes_total', 'Bytes received by the upload endpoints')
+METRIC_UPLOADS = registry.counter('subsai_uploads_total', 'Completed uploads', ['deduplicated'])
+METRIC_UPLOAD_THROUGHPUT = registry.histogram('subsai_upload_throughput_bytes_per_second',
+                                              'Upload write throughput per request',
+                                              buckets=(1e6, 5e6, 1e7, 5e7, 1e8, 2.5e8, 5e8, 1e9))
+METRIC_RSS = registry.gauge('subsai_process_resident_memory_bytes', 'Resident memory of this process')
+METRIC_ADMISSIONS = registry.counter('subsai_admissions_total', 'Admission decisions for submitted jobs', ['action'])
+METRIC_BACKLOG = registry.gauge('subsai_queue_backlog_seconds', 'Estimated time to drain pending and running jobs')
 
 # 加载默认配置
 def load_default_config() -> Dict[str, Any]:
@@ -102,6 +219,22 @@ class ProcessConfig(BaseModel):
     whisper_model_type: Optional[str] = None  # Whisper模型类型 (base, small, medium, large-v2, large-v3, large-v3-turbo)
     custom_font: Optional[str] = None  # 自定义字体名称
     custom_colors: Optional[Dict[str, str]] = None  # 自定义颜色 {"primary": "#FFFFFF", "highlight": "#FFD700"}
+    use_mezzanine_cache: bool = False  # 缓存缩放/裁剪后的中间片，加速同一视频的重复渲染
+    deadline_minutes: Optional[float] = None  # 任务截止时间（自创建起的分钟数），设置后自动选择能按时完成的编码预设
+    use_font_metrics: bool = False  # 自动换行时按字体真实字形宽度计算（需要fontTools）
+    word_alignment: bool = False  # 对句子级后端（whisper.cpp、OpenAI API等）的结果做强制对齐，得到真实的词级时间戳
+    lyrics: Optional[str] = None  # 已知歌词（每行一句，任务只能有一个文件），设置后跳过语音识别，只做强制对齐
+    use_result_cache: bool = True  # 复用相同视频的转录结果和相同参数的成品视频
+    enable_uniqueness: bool = True  # 视频唯一性处理（微调色彩、噪声、编码参数和元数据）
+    uniqueness_seed: Optional[int] = None  # 唯一性随机种子；不设置时，启用结果缓存则由渲染缓存键派生（相同请求得到相同成品），否则每次随机
+    output_mode: str = "video"  # 输出形式，见 OUTPUT_MODES
+    stream_transcript: bool = False  # 通过WebSocket推送字幕：逐段解码的后端每解码一段推送一次，每个文件转录完成后推送全部片段
+    transcript_job_id: Optional[str] = None  # 复用该任务保存的转录结果，不再转录（由 /api/jobs/{id}/burn 设置）
+
+
+class UploadSessionRequest(BaseModel):
+    name: str  # 原始文件名
+    size: Optional[int] = None  # 文件总字节数（完成时校验）
 
 
 class JobStatus(BaseModel):
@@ -112,244 +245,692 @@ class JobStatus(BaseModel):
     total_files: int = 0
     processed_files: int = 0
     failed_files: int = 0
+    transcript_cache_hits: int = 0
+    render_cache_hits: int = 0
     output_files: List[Dict[str, Any]] = []
     error: Optional[str] = None
+    estimated_finish_at: Optional[str] = None
     created_at: str
     updated_at: str
 
 
-# WebSocket连接管理
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+def update_job_status(job_id: str, **kwargs):
+    """更新任务状态"""
+    job_store.update(job_id, **kwargs)
+
+
+async def broadcast_job_update(job_id: str):
+    """把任务的变化推送给订阅者（只排队，不等待发送；字段与 job_event_poller 发布的相同）"""
+    job = await run_io(job_store.get_event_state, job_id)
+    if job is not None:
+        job_events.publish(job_id, job)
+
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+async def run_blocking(func, *args, **kwargs):
+    """在处理线程池中执行阻塞函数，不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(processing_executor, functools.partial(func, *args, **kwargs))
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
+async def run_stage(stage: str, func, *args, **kwargs):
+    """在处理线程池中执行一个处理阶段，并记录耗时"""
+    start = time.perf_counter()
+    try:
+        return await run_blocking(func, *args, **kwargs)
+    finally:
+        METRIC_STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def probe_media_duration(media_file: str) -> Optional[float]:
+    """用ffprobe读取媒体时长（秒），失败时返回None"""
+    try:
+        return float(ffmpeg.probe(media_file)['format']['duration'])
+    except (ffmpeg.Error, KeyError, ValueError) as e:
+        logger.warning(f"无法读取媒体时长 {media_file}: {e}")
+        return None
+
+
+async def run_io(func, *args, **kwargs):
+    """在默认线程池中执行阻塞的文件IO（上传写入/哈希），不占用处理线程"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+async def run_ffmpeg(cmd: List[str], pass_fds=(), env: Optional[Dict[str, str]] = None,
+                     cancel_token: Optional[CancellationToken] = None):
+    """
+    通过asyncio子进程运行ffmpeg
+
+    Args:
+        cmd: ffmpeg命令
+        pass_fds: 需要传给子进程的文件描述符（内存中的ASS字幕）
+        env: 环境变量
+        cancel_token: 取消标记，取消时先terminate，FFMPEG_TERMINATE_TIMEOUT_S 秒后仍未退出则kill
+
+    Returns:
+        (返回码, stderr字节)
+
+    Raises:
+        JobCancelled: ffmpeg因取消被终止
+    """
+    process = await asyncio.create_subprocess_exec(*cmd,
+                                                   stdin=asyncio.subprocess.DEVNULL,
+                                                   stdout=asyncio.subprocess.DEVNULL,
+                                                   stderr=asyncio.subprocess.PIPE,
+                                                   pass_fds=pass_fds,
+                                                   env=env)
+    if cancel_token is None:
+        _, stderr = await process.communicate()
+        return process.returncode, stderr
+
+    loop = asyncio.get_running_loop()
+    cancelled = asyncio.Event()
+    remove_callback = cancel_token.add_callback(lambda: loop.call_soon_threadsafe(cancelled.set))
+    try:
+        communicate = asyncio.ensure_future(process.communicate())
+        cancel_wait = asyncio.ensure_future(cancelled.wait())
+        await asyncio.wait({communicate, cancel_wait}, return_when=asyncio.FIRST_COMPLETED)
+        cancel_wait.cancel()
+        if not communicate.done():
+            logger.info(f"⏹️ 终止ffmpeg (pid {process.pid})")
+            process.terminate()
             try:
-                await connection.send_json(message)
-            except:
-                pass
+                await asyncio.wait_for(asyncio.shield(communicate), timeout=FFMPEG_TERMINATE_TIMEOUT_S)
+            except asyncio.TimeoutError:
+                process.kill()
+                await communicate
+            raise JobCancelled(cancel_token.reason)
+        _, stderr = communicate.result()
+        return process.returncode, stderr
+    finally:
+        # 一个任务会运行多次ffmpeg（中间片、试编码、最终编码），每次结束后注销回调
+        remove_callback()
+
+
+def loop_ffmpeg_runner(loop: asyncio.AbstractEventLoop, cancel_token: Optional[CancellationToken] = None):
+    """
+    返回给 `Tools.burn_karaoke_subtitles` 使用的ffmpeg运行器：烧录在处理线程中进行，
+    ffmpeg子进程（中间片、试编码和最终编码）则交给事件循环管理，线程只等待结果
+    """
+    def runner(cmd, pass_fds, env):
+        return asyncio.run_coroutine_threadsafe(run_ffmpeg(cmd, pass_fds, env, cancel_token), loop).result()
+    return runner
+
+
+def resolve_model_config(config: ProcessConfig) -> Dict[str, Any]:
+    """根据处理配置构建Whisper模型配置"""
+    if config.whisper_model_type:
+        # 用户指定了模型类型，动态构建配置
+        model_config = DEFAULT_WHISPER_CONFIG.copy()
+        model_config['model_type'] = config.whisper_model_type
+        logger.info(f"使用用户指定的Whisper模型: {config.whisper_model_type}")
+    elif config.whisper_config:
+        # 使用用户提供的完整配置
+        model_config = config.whisper_config
+        logger.info(f"使用用户提供的Whisper配置")
+    else:
+        # 使用默认配置
+        model_config = DEFAULT_WHISPER_CONFIG
+        logger.info(f"使用默认Whisper配置")
+    return model_config
+
+
+def transcribe_with_pool(model_name: str, model_config: Dict[str, Any], media_file: str,
+                         cancel_token: Optional[CancellationToken] = None, segment_callback=None):
+    """从模型池取出（或加载）模型并转录，模型用完后放回池中供其他任务复用"""
+    key = make_cache_key(model_name, model_config)
+    model = model_pool.acquire(key, lambda: SubsAI.create_model(model_name, model_config=model_config))
+    try:
+        return SubsAI.transcribe(media_file, model, cancel_token=cancel_token, segment_callback=segment_callback)
+    finally:
+        model_pool.release(key, model)
 
 
-manager = ConnectionManager()
+def job_transcript_path(job_id: str, index: int) -> Path:
+    """任务中第index个文件保存的转录结果路径"""
+    return OUTPUT_DIR / job_id / JOB_TRANSCRIPT_DIR / f"{index}.json"
 
 
-def update_job_status(job_id: str, **kwargs):
-    """更新任务状态"""
-    if job_id in jobs:
-        jobs[job_id].update(kwargs)
-        jobs[job_id]['updated_at'] = datetime.now().isoformat()
+def save_job_transcript(job_id: str, index: int, subs):
+    """保存任务中一个文件的转录结果（含词级时间戳）"""
+    path = job_transcript_path(job_id, index)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(dump_transcript(subs))
 
 
-async def broadcast_job_update(job_id: str):
-    """广播任务更新"""
-    if job_id in jobs:
-        await manager.broadcast({
-            'type': 'job_update',
+def write_text_output(job_id: str, filename: str, text: str) -> Dict[str, Any]:
+    """
+    把字幕文本写入任务输出目录
+
+    Args:
+        job_id: 任务ID
+        filename: 输出文件名
+        text: 字幕内容
+
+    Returns:
+        输出文件信息
+    """
+    output_path = OUTPUT_DIR / job_id / filename
+    output_path.write_text(text, encoding='utf-8')
+    return {
+        'name': filename,
+        'url': f'/outputs/{job_id}/{filename}',
+        'size': os.path.getsize(output_path)
+    }
+
+
+def build_karaoke_ass(subs, config: ProcessConfig) -> Tuple[str, int]:
+    """
+    生成卡拉OK字幕的ASS文本
+
+    Args:
+        subs: 转录结果
+        config: 处理配置
+
+    Returns:
+        (ASS文本, 字幕事件数)
+    """
+    fonts.validate_style_fonts([get_style(config.style_name, fontname=config.custom_font)])
+
+    # 提取自定义颜色参数
+    primary_color = None
+    secondary_color = None
+    if config.custom_colors:
+        primary_color = config.custom_colors.get('primary')
+        secondary_color = config.custom_colors.get('highlight')
+
+    # 计算视频宽度（用于自动换行）
+    max_line_width_px = None
+    if config.aspect_ratio and config.aspect_ratio.lower() != 'original':
+        try:
+            # 常见宽高比对应的宽度（基于1080p高度）
+            aspect_widths = {
+                '16:9': 1920,
+                '9:16': 607,
+                '4:3': 1440,
+                '1:1': 1080,
+                '21:9': 2520
+            }
+            max_line_width_px = aspect_widths.get(config.aspect_ratio, 1920)
+            logger.info(f"根据宽高比 {config.aspect_ratio} 计算视频宽度: {max_line_width_px}px，将启用自动换行")
+        except Exception as e:
+            logger.warning(f"计算视频宽度失败: {e}，将不限制行宽")
+            max_line_width_px = None
+
+    generator = KaraokeGenerator(
+        style_name=config.style_name,
+        words_per_line=config.words_per_line,
+        fontsize=config.fontsize,
+        vertical_margin=config.vertical_margin,
+        fontname=config.custom_font,
+        primary_color=primary_color,
+        secondary_color=secondary_color,
+        max_line_width_px=max_line_width_px,
+        use_font_metrics=config.use_font_metrics,
+        # 歌词模式：词级时间戳的片段就是歌词行，卡拉OK行不跨歌词行
+        break_on_segments=bool(config.lyrics)
+    )
+    # 直接写出ASS文本，不创建pysubs2事件对象
+    karaoke_ass = io.StringIO()
+    event_count = generator.write_ass(subs, karaoke_ass)
+    return karaoke_ass.getvalue(), event_count
+
+
+async def process_video_file(job_id: str, index: int, video_path: Path, config: ProcessConfig,
+                             model_config: Dict[str, Any], job: Dict[str, Any],
+                             total_files: int, cancel_token: CancellationToken) -> Optional[Dict[str, Any]]:
+    """
+    处理单个视频：转录（ASR槽） -> 卡拉OK字幕（karaoke槽） -> 烧录（encode槽）
+
+    每个阶段开始前、转录的解码窗口之间和ffmpeg运行期间检查取消标记。
+    只要字幕的输出形式（subtitles/karaoke）在对应阶段完成后立即返回，不占用编码槽。
+
+    Args:
+        job_id: 任务ID
+        index: 文件在任务中的序号
+        video_path: 视频路径
+        config: 处理配置
+        model_config: Whisper模型配置
+        job: 任务记录（创建时间等）
+        total_files: 任务的文件总数
+        cancel_token: 任务的取消标记
+
+    Returns:
+        输出文件信息，失败时返回None
+
+    Raises:
+        JobCancelled: 任务被取消（未完成的输出已删除）
+    """
+    logger.info(f"[{index + 1}/{total_files}] 处理视频: {video_path.name}")
+    # 提交时探测的媒体时长（用于更新成本模型）
+    durations = job.get('media_durations') or []
+    media_duration = durations[index] if index < len(durations) else None
+
+    # 0. 复用已有的转录：指定任务保存的转录结果，或结果缓存（完全相同的请求直接复用成品，只换样式时复用字幕）
+    subs = None
+    render_key = None
+    uniqueness_seed = config.uniqueness_seed
+    if config.transcript_job_id:
+        try:
+            subs = await run_io(load_transcript, job_transcript_path(config.transcript_job_id, index))
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"读取任务 {config.transcript_job_id} 保存的转录结果失败: {video_path.name} ({e})")
+            return None
+    elif config.use_result_cache:
+        # 上传文件用上传时计算的完整SHA-256作键，其他路径才退回采样指纹
+        content_sha256 = await run_io(upload_store.content_sha256, video_path)
+        transcript_key = await run_io(result_cache.transcript_key, str(video_path),
+                                      'forced-alignment' if config.lyrics else config.model_name, model_config,
+                                      content_sha256, word_alignment=config.word_alignment, lyrics=config.lyrics)
+        render_key = result_cache.render_key(transcript_key,
+                                             {field: getattr(config, field) for field in KARAOKE_CACHE_FIELDS},
+                                             {field: getattr(config, field) for field in ENCODE_CACHE_FIELDS})
+        if config.enable_uniqueness and uniqueness_seed is None:
+            # 唯一性参数由渲染键派生：相同的请求得到相同的成品（可以缓存），换视频或参数则不同
+            uniqueness_seed = int(render_key[:8], 16)
+        cached_output = OUTPUT_DIR / job_id / f"{video_path.stem}_karaoke{video_path.suffix}"
+        if config.output_mode == 'video' and await run_io(result_cache.get_render, render_key, video_path.suffix,
+                                                          cached_output):
+            await run_io(job_store.increment, job_id, render_cache_hits=1)
+            # 成品来自缓存时也保存转录结果，供之后换样式烧录
+            cached_subs = await run_io(result_cache.get_transcript, transcript_key)
+            if cached_subs is not None:
+                await run_io(save_job_transcript, job_id, index, cached_subs)
+            logger.info(f"✅ 处理完成（渲染缓存）: {cached_output.name}")
+            return {
+                'name': cached_output.name,
+                'url': f'/outputs/{job_id}/{cached_output.name}',
+                'size': os.path.getsize(cached_output),
+                'encode': {'cached': True}
+            }
+        subs = await run_io(result_cache.get_transcript, transcript_key)
+        if subs is not None:
+            await run_io(job_store.increment, job_id, transcript_cache_hits=1)
+
+    # 1. 生成字幕
+    if subs is not None:
+        logger.info(f"步骤1: 复用已有的字幕 ({len(subs)} 个事件)")
+    else:
+        async with stage_slots['asr'].acquire():
+            cancel_token.raise_if_cancelled()
+            if config.lyrics:
+                logger.info(f"步骤1: 歌词强制对齐（跳过语音识别）...")
+                start = time.perf_counter()
+                word_timings = await run_stage('align', get_forced_aligner().align_lyrics, str(video_path),
+                                               config.lyrics)
+                subs = attach_word_timings(word_timings.to_ssafile(), word_timings)
+                cost_model.observe_transcribe('forced-alignment', media_duration, time.perf_counter() - start)
+            else:
+                logger.info(f"步骤1: 生成字幕...")
+                segment_callback = None
+                if config.stream_transcript:
+                    # 逐段解码的后端（faster-whisper）在处理线程中每解码一段就回调一次，转到事件循环中推送
+                    loop = asyncio.get_running_loop()
+
+                    def segment_callback(segment_start: int, segment_end: int, text: str):
+                        loop.call_soon_threadsafe(job_events.send_event, job_id, {
+                            'type': 'transcript_segment',
+                            'job_id': job_id,
+                            'index': index,
+                            'file': video_path.name,
+                            'segment': {'start': segment_start, 'end': segment_end, 'text': text}
+                        })
+                start = time.perf_counter()
+                subs = await run_stage('transcribe', transcribe_with_pool, config.model_name, model_config,
+                                       str(video_path), cancel_token, segment_callback)
+                elapsed = time.perf_counter() - start
+                if media_duration is None:
+                    media_duration = await run_io(probe_media_duration, str(video_path))
+                if media_duration:
+                    METRIC_RTF.observe(elapsed / media_duration, model=config.model_name)
+                    cost_model.observe_transcribe(cost_model_key(config.model_name, model_config), media_duration,
+                                                  elapsed)
+
+            if not subs or len(subs) == 0:
+                logger.error(f"字幕生成失败: {video_path.name}")
+                return None
+
+            logger.info(f"生成了 {len(subs)} 个字幕事件")
+
+            # 句子级后端没有词级时间戳：用强制对齐代替按句子均分
+            if config.word_alignment and get_word_timings(subs) is None:
+                cancel_token.raise_if_cancelled()
+                logger.info(f"步骤1b: 强制对齐词级时间戳...")
+                attach_word_timings(subs, await run_stage('align', get_forced_aligner().align, str(video_path), subs))
+
+            if config.use_result_cache:
+                await run_io(result_cache.put_transcript, transcript_key, subs)
+
+    await run_io(save_job_transcript, job_id, index, subs)
+    if config.stream_transcript:
+        job_events.send_event(job_id, {
+            'type': 'transcript',
             'job_id': job_id,
-            'data': jobs[job_id]
+            'index': index,
+            'file': video_path.name,
+            'segments': [{'start': event.start, 'end': event.end, 'text': event.plaintext} for event in subs]
         })
+    if config.output_mode == 'subtitles':
+        output = await run_io(write_text_output, job_id, f"{video_path.stem}.srt", subs.to_string('srt'))
+        logger.info(f"✅ 处理完成（字幕）: {output['name']}")
+        return output
+
+    # 2. 转换为卡拉OK字幕
+    async with stage_slots['karaoke'].acquire():
+        cancel_token.raise_if_cancelled()
+        logger.info(f"步骤2: 转换为卡拉OK字幕 (style: {config.style_name})...")
+        karaoke_ass, event_count = await run_stage('karaoke', build_karaoke_ass, subs, config)
+
+    if event_count == 0:
+        logger.error(f"卡拉OK字幕生成失败: {video_path.name}")
+        return None
+
+    logger.info(f"生成了 {event_count} 个卡拉OK字幕事件")
+
+    if config.output_mode == 'karaoke':
+        output = await run_io(write_text_output, job_id, f"{video_path.stem}_karaoke.ass", karaoke_ass)
+        logger.info(f"✅ 处理完成（卡拉OK字幕）: {output['name']}")
+        return output
+
+    # 3. 烧录到视频
+    async with stage_slots['encode'].acquire():
+        cancel_token.raise_if_cancelled()
+        logger.info(f"步骤3: 烧录字幕到视频 (CRF={config.crf}, preset={config.preset})...")
+        output_filename = f"{video_path.stem}_karaoke"
+
+        # 截止时间模式：剩余时间平均分配给剩余的视频
+        encode_deadline_s = None
+        if config.deadline_minutes is not None:
+            deadline_at = datetime.fromisoformat(job['created_at']) + timedelta(minutes=config.deadline_minutes)
+            remaining_s = (deadline_at - datetime.now()).total_seconds()
+            done_files = (await run_io(job_store.get, job_id, internal=True))['done_files']
+            remaining_files = max(total_files - len(done_files), 1)
+            encode_deadline_s = max(remaining_s, 1.0) / remaining_files
+        encode_report = {}
+        start = time.perf_counter()
+        try:
+            output_path = await run_stage(
+                'burn',
+                Tools.burn_karaoke_subtitles,
+                subs=karaoke_ass,
+                media_file=str(video_path),
+                output_filename=output_filename,
+                aspect_ratio=config.aspect_ratio,
+                crf=config.crf,
+                preset=config.preset,
+                enable_uniqueness=config.enable_uniqueness,
+                uniqueness_seed=uniqueness_seed,
+                mezzanine_cache=mezzanine_cache if config.use_mezzanine_cache else None,
+                deadline_s=encode_deadline_s,
+                encode_report=encode_report,
+                ffmpeg_runner=loop_ffmpeg_runner(asyncio.get_running_loop(), cancel_token)
+            )
+        except JobCancelled:
+            # 删除被终止的ffmpeg留下的半成品（输出写在源文件旁边）
+            partial_output = video_path.parent / f"{output_filename}{video_path.suffix}"
+            partial_output.unlink(missing_ok=True)
+            raise
+
+    if not os.path.exists(output_path):
+        logger.error(f"输出文件不存在: {output_path}")
+        return None
+
+    if encode_report.get('encode_fps'):
+        METRIC_ENCODE_FPS.observe(encode_report['encode_fps'])
+    if media_duration is None:
+        media_duration = await run_io(probe_media_duration, str(video_path))
+    cost_model.observe_encode(encode_report.get('preset', config.preset), media_duration,
+                              time.perf_counter() - start)
+
+    # 移动到job输出目录（可能跨文件系统复制）
+    final_output = OUTPUT_DIR / job_id / os.path.basename(output_path)
+    await run_blocking(shutil.move, output_path, str(final_output))
+    logger.info(f"✅ 处理完成: {final_output.name}")
+
+    # 截止时间模式可能换用了其他预设，这样的成品与缓存键描述的参数不符，不写入缓存
+    if render_key is not None and not encode_report.get('deadline_adjusted'):
+        await run_io(result_cache.put_render, render_key, final_output)
 
+    return {
+        'name': final_output.name,
+        'url': f'/outputs/{job_id}/{final_output.name}',
+        'size': os.path.getsize(final_output),
+        'encode': encode_report
+    }
+
+
+async def process_video_job(job_id: str, video_files: List[Path], config: ProcessConfig, done_files=(),
+                            cancel_token: Optional[CancellationToken] = None):
+    """
+    后台处理视频任务
+
+    文件以流水线方式处理：最多 JOB_PIPELINE_DEPTH 个文件同时在途，
+    一个文件编码时下一个文件已经在转录。
 
-async def process_video_job(job_id: str, video_files: List[Path], config: ProcessConfig):
-    """后台处理视频任务"""
+    Args:
+        job_id: 任务ID
+        video_files: 视频文件列表
+        config: 处理配置
+        done_files: 已处理完的文件序号（中断后续跑时跳过）
+        cancel_token: 取消标记，取消后未开始的文件不再处理，正在处理的文件尽快停止
+    """
+    cancel_token = cancel_token or CancellationToken()
     try:
-        # 更新任务状态
-        update_job_status(
-            job_id,
-            status='processing',
-            total_files=len(video_files),
-            progress=0
-        )
+        done = set(done_files)
+        # 更新任务状态（状态已在领取时设为processing，这里不再写入，避免覆盖刚写入的cancelled）
+        await run_io(update_job_status,
+                     job_id,
+                     total_files=len(video_files),
+                     progress=int((len(done) / len(video_files)) * 100))
         await broadcast_job_update(job_id)
+        job = await run_io(job_store.get, job_id, internal=True)
+        if done:
+            logger.info(f"续跑任务 {job_id}: 跳过已完成的 {len(done)} 个文件")
 
         # 创建任务输出目录
         job_output_dir = OUTPUT_DIR / job_id
         job_output_dir.mkdir(exist_ok=True)
 
-        # 初始化SubsAI
-        subs_ai = SubsAI()
-        tools = Tools()
-
-        # 构建Whisper模型配置
-        if config.whisper_model_type:
-            # 用户指定了模型类型，动态构建配置
-            model_config = DEFAULT_WHISPER_CONFIG.copy()
-            model_config['model_type'] = config.whisper_model_type
-            logger.info(f"使用用户指定的Whisper模型: {config.whisper_model_type}")
-        elif config.whisper_config:
-            # 使用用户提供的完整配置
-            model_config = config.whisper_config
-            logger.info(f"使用用户提供的Whisper配置")
+        if config.transcript_job_id:
+            logger.info(f"复用任务 {config.transcript_job_id} 的转录结果，跳过语音识别")
+            model_config = None
+        elif config.lyrics:
+            # 歌词模式只需要对齐模型，不加载语音识别模型
+            logger.info(f"使用提供的歌词，跳过语音识别模型")
+            model_config = None
         else:
-            # 使用默认配置
-            model_config = DEFAULT_WHISPER_CONFIG
-            logger.info(f"使用默认Whisper配置")
+            model_config = resolve_model_config(config)
+            logger.info(f"Whisper配置详情: {model_config}")
 
-        logger.info(f"Whisper配置详情: {model_config}")
-        model = subs_ai.create_model(config.model_name, model_config=model_config)
+        output_files = job['output_files']
+        pipeline = asyncio.Semaphore(JOB_PIPELINE_DEPTH)
 
-        # 处理每个视频
-        output_files = []
-        for i, video_path in enumerate(video_files):
-            try:
-                update_job_status(
-                    job_id,
-                    current_file=video_path.name,
-                    progress=int((i / len(video_files)) * 100)
-                )
+        async def run_file(index: int, video_path: Path):
+            async with pipeline:
+                if cancel_token.cancelled or await run_io(job_store.get, job_id) is None:
+                    return
+                await run_io(update_job_status, job_id, current_file=video_path.name)
                 await broadcast_job_update(job_id)
-
-                logger.info(f"[{i+1}/{len(video_files)}] 处理视频: {video_path.name}")
-
-                # 1. 生成字幕
-                logger.info(f"步骤1: 生成字幕...")
-                subs = subs_ai.transcribe(str(video_path), model)
-
-                if not subs or len(subs) == 0:
-                    logger.error(f"字幕生成失败: {video_path.name}")
-                    update_job_status(
-                        job_id,
-                        failed_files=jobs[job_id]['failed_files'] + 1
-                    )
-                    await broadcast_job_update(job_id)
-                    continue
-
-                logger.info(f"生成了 {len(subs)} 个字幕事件")
-
-                # 2. 转换为卡拉OK字幕
-                logger.info(f"步骤2: 转换为卡拉OK字幕 (style: {config.style_name})...")
-
-                # 提取自定义颜色参数
-                primary_color = None
-                secondary_color = None
-                if config.custom_colors:
-                    primary_color = config.custom_colors.get('primary')
-                    secondary_color = config.custom_colors.get('highlight')
-
-                # 计算视频宽度（用于自动换行）
-                max_line_width_px = None
-                if config.aspect_ratio and config.aspect_ratio.lower() != 'original':
-                    try:
-                        # 常见宽高比对应的宽度（基于1080p高度）
-                        aspect_widths = {
-                            '16:9': 1920,
-                            '9:16': 607,
-                            '4:3': 1440,
-                            '1:1': 1080,
-                            '21:9': 2520
-                        }
-                        max_line_width_px = aspect_widths.get(config.aspect_ratio, 1920)
-                        logger.info(f"根据宽高比 {config.aspect_ratio} 计算视频宽度: {max_line_width_px}px，将启用自动换行")
-                    except Exception as e:
-                        logger.warning(f"计算视频宽度失败: {e}，将不限制行宽")
-                        max_line_width_px = None
-
-                karaoke_subs = create_karaoke_subtitles(
-                    subs=subs,
-                    style_name=config.style_name,
-                    words_per_line=config.words_per_line,
-                    fontsize=config.fontsize,
-                    vertical_margin=config.vertical_margin,
-                    fontname=config.custom_font,
-                    primary_color=primary_color,
-                    secondary_color=secondary_color,
-                    max_line_width_px=max_line_width_px
-                )
-
-                if not karaoke_subs or len(karaoke_subs) == 0:
-                    logger.error(f"卡拉OK字幕生成失败: {video_path.name}")
-                    update_job_status(
-                        job_id,
-                        failed_files=jobs[job_id]['failed_files'] + 1
-                    )
-                    await broadcast_job_update(job_id)
-                    continue
-
-                logger.info(f"生成了 {len(karaoke_subs)} 个卡拉OK字幕事件")
-
-                # 3. 烧录到视频
-                logger.info(f"步骤3: 烧录字幕到视频 (CRF={config.crf}, preset={config.preset})...")
-                output_filename = f"{video_path.stem}_karaoke"
-                output_path = tools.burn_karaoke_subtitles(
-                    subs=karaoke_subs,
-                    media_file=str(video_path),
-                    output_filename=output_filename,
-                    aspect_ratio=config.aspect_ratio,
-                    crf=config.crf,
-                    preset=config.preset
-                )
-
-                if os.path.exists(output_path):
-                    # 移动到job输出目录
-                    final_output = job_output_dir / os.path.basename(output_path)
-                    shutil.move(output_path, str(final_output))
-
-                    logger.info(f"✅ 处理完成: {final_output.name}")
-
-                    # 记录输出文件
-                    output_files.append({
-                        'name': final_output.name,
-                        'url': f'/outputs/{job_id}/{final_output.name}',
-                        'size': os.path.getsize(final_output)
-                    })
-
-                    update_job_status(
-                        job_id,
-                        processed_files=jobs[job_id]['processed_files'] + 1,
-                        output_files=output_files
-                    )
+                try:
+                    output = await process_video_file(job_id, index, video_path, config, model_config, job,
+                                                      len(video_files), cancel_token)
+                except JobCancelled:
+                    logger.info(f"⏹️ 已停止处理: {video_path.name}")
+                    return
+                except Exception as e:
+                    logger.error(f"处理视频失败 {video_path.name}: {str(e)}")
+                    import traceback
+                    traceback.print_exc()
+                    output = None
+
+                # 记录续跑位置：进程中断后只处理未完成的文件
+                done.add(index)
+                METRIC_FILES.inc(result='succeeded' if output is not None else 'failed')
+                if output is not None:
+                    output_files.append(output)
+                    await run_io(job_store.increment, job_id, processed_files=1)
+                    # 写库在线程池中进行，传副本以免其他文件同时追加
+                    await run_io(update_job_status, job_id, output_files=list(output_files))
                 else:
-                    logger.error(f"输出文件不存在: {output_path}")
-                    update_job_status(
-                        job_id,
-                        failed_files=jobs[job_id]['failed_files'] + 1
-                    )
-
+                    await run_io(job_store.increment, job_id, failed_files=1)
+                await run_io(update_job_status, job_id, done_files=sorted(done),
+                             progress=int((len(done) / len(video_files)) * 100))
                 await broadcast_job_update(job_id)
 
-            except Exception as e:
-                logger.error(f"处理视频失败 {video_path.name}: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                update_job_status(
-                    job_id,
-                    failed_files=jobs[job_id]['failed_files'] + 1
-                )
-                await broadcast_job_update(job_id)
-                continue
+        await asyncio.gather(*(run_file(i, video_path) for i, video_path in enumerate(video_files) if i not in done))
+
+        if await run_io(job_store.get, job_id) is None:
+            logger.info(f"任务已被删除，停止处理: {job_id}")
+            return
+
+        if cancel_token.cancelled:
+            # 取消接口已写入cancelled；租约丢失时任务属于其他worker，都不会再写入
+            await run_io(job_store.finish, job_id, WORKER_ID, 'cancelled', current_file=None)
+            await broadcast_job_update(job_id)
+            logger.info(f"⏹️ 任务已停止: {job_id} ({cancel_token.reason})")
+            return
 
-        # 任务完成
-        update_job_status(
-            job_id,
-            status='completed',
-            progress=100,
-            current_file=None
-        )
+        # 任务完成（只在仍持有任务时写入，与同时到达的取消请求互斥）
+        if not await run_io(job_store.finish, job_id, WORKER_ID, 'completed', progress=100, current_file=None):
+            logger.info(f"任务状态已被取消或由其他worker接管，不标记为完成: {job_id}")
+            await broadcast_job_update(job_id)
+            return
         await broadcast_job_update(job_id)
 
         logger.info(f"✅ 任务完成: {job_id}")
-        logger.info(f"成功: {jobs[job_id]['processed_files']}, 失败: {jobs[job_id]['failed_files']}")
+        job = await run_io(job_store.get, job_id)
+        if job is not None:
+            logger.info(f"成功: {job['processed_files']}, 失败: {job['failed_files']}")
 
     except Exception as e:
         logger.error(f"任务执行失败 {job_id}: {str(e)}")
         import traceback
         traceback.print_exc()
-        update_job_status(
-            job_id,
-            status='failed',
-            error=str(e)
-        )
+        await run_io(job_store.finish, job_id, WORKER_ID, 'failed', error=str(e))
         await broadcast_job_update(job_id)
 
 
+async def watch_cancellation(job_id: str, cancel_token: CancellationToken):
+    """轮询任务状态：任务被取消或删除（可能由其他进程处理请求）时触发取消标记"""
+    while not cancel_token.cancelled:
+        await asyncio.sleep(JOB_POLL_INTERVAL_S)
+        job = await run_io(job_store.get, job_id)
+        if job is None:
+            cancel_token.cancel('deleted')
+        elif job['status'] == 'cancelled':
+            cancel_token.cancel('cancelled')
+
+
+async def run_claimed_job(job: Dict[str, Any]):
+    """执行已领取的任务，期间保持心跳"""
+    job_id = job['job_id']
+    logger.info(f"领取任务: {job_id} (worker {WORKER_ID})")
+    cancel_token = job_tokens[job_id] = CancellationToken()
+    watcher = asyncio.create_task(watch_cancellation(job_id, cancel_token))
+    try:
+        with JobHeartbeat(job_store, job_id, WORKER_ID, cancel_token):
+            await process_video_job(job_id,
+                                    [Path(path) for path in job['video_files']],
+                                    ProcessConfig(**job['config']),
+                                    done_files=job['done_files'],
+                                    cancel_token=cancel_token)
+    finally:
+        watcher.cancel()
+        job_tokens.pop(job_id, None)
+
+
+async def promote_deferred_jobs() -> int:
+    """
+    把准入控制延后的任务放入队列（按优先级和提交顺序，直到积压达到上限）
+
+    Returns:
+        放入队列的任务数
+    """
+    jobs = await run_io(job_store.list_queued)
+    promoted = 0
+    for job in jobs:
+        if job['status'] != 'deferred':
+            continue
+        if not admission.can_start(jobs, job):
+            break
+        job['status'] = 'pending'
+        await run_io(update_job_status, job['job_id'], status='pending')
+        await broadcast_job_update(job['job_id'])
+        logger.info(f"▶️ 延后的任务进入队列: {job['job_id']}")
+        promoted += 1
+    return promoted
+
+
+async def job_worker():
+    """
+    领取并执行队列中的任务（每个进程一个，多个进程通过原子领取共享队列）
+
+    最多同时执行 MAX_ACTIVE_JOBS 个任务，各任务的文件共享分阶段的工作槽。
+    """
+    while True:
+        job = None
+        if len(running_jobs) < MAX_ACTIVE_JOBS:
+            try:
+                await promote_deferred_jobs()
+                job = await run_io(job_store.claim, WORKER_ID)
+            except Exception as e:
+                logger.error(f"领取任务失败: {e}")
+        if job is None:
+            job_wakeup.clear()
+            try:
+                await asyncio.wait_for(job_wakeup.wait(), timeout=JOB_POLL_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        job_id = job['job_id']
+        running_jobs[job_id] = asyncio.create_task(run_claimed_job(job))
+        # 任务结束后立即唤醒worker领取下一个任务
+        running_jobs[job_id].add_done_callback(lambda _, job_id=job_id: (running_jobs.pop(job_id, None),
+                                                                           job_wakeup.set()))
+
+
+def prune_expired_jobs() -> int:
+    """删除超过保留时间的已结束任务及其输出文件"""
+    job_ids = job_store.prune(JOB_TTL_HOURS * 3600)
+    for job_id in job_ids:
+        shutil.rmtree(OUTPUT_DIR / job_id, ignore_errors=True)
+    if job_ids:
+        logger.info(f"🗑️ 清理了 {len(job_ids)} 个过期任务")
+    return len(job_ids)
+
+
+async def job_pruner():
+    """定期清理过期任务"""
+    loop = asyncio.get_event_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, prune_expired_jobs)
+        except Exception as e:
+            logger.error(f"清理过期任务失败: {e}")
+        await asyncio.sleep(3600)
+
+
+async def job_event_poller():
+    """定期读取数据库中有变化的任务并推送，使连接到本进程的客户端也能收到其他worker处理的任务进度"""
+    last_seen = datetime.now().isoformat()
+    while True:
+        await asyncio.sleep(WS_POLL_INTERVAL_S)
+        topics = job_events.followed_jobs()
+        if not topics:
+            last_seen = datetime.now().isoformat()
+            continue
+        try:
+            jobs = await run_io(job_store.list_updated_since, last_seen,
+                                None if ALL_JOBS in topics else topics)
+        except Exception as e:
+            logger.error(f"轮询任务更新失败: {e}")
+            continue
+        for job in jobs:
+            last_seen = max(last_seen, job['updated_at'])
+            job_events.publish(job['job_id'], job)
+
+
 # API端点
 @app.get("/")
 async def root():
@@ -370,27 +951,72 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus文本格式的服务指标（队列、阶段耗时、实时率、编码速度、上传、内存）"""
+    counts = await run_io(job_store.count_by_status)
+    queued = await run_io(job_store.list_queued)
+    METRIC_JOBS.clear()
+    for status, count in counts.items():
+        METRIC_JOBS.set(count, status=status)
+    METRIC_QUEUE_DEPTH.set(counts.get('pending', 0))
+    METRIC_BACKLOG.set(estimate_finish_s([job for job in queued if job['status'] != 'deferred'], admission.slots))
+    METRIC_ACTIVE_JOBS.set(len(running_jobs))
+    for name, slots in stage_slots.items():
+        stats = slots.stats()
+        METRIC_SLOTS_BUSY.set(stats['busy'], stage=name)
+        METRIC_SLOTS_WAITING.set(stats['waiting'], stage=name)
+    pool_stats = model_pool.stats()
+    for outcome in ('hits', 'loads', 'evictions'):
+        METRIC_MODEL_POOL.set_total(pool_stats[outcome], outcome=outcome)
+    for key, value in result_cache.counters.items():
+        kind, outcome = key.split('_')
+        METRIC_RESULT_CACHE.set_total(value, kind=kind, outcome=outcome)
+    rss = metrics.process_rss_bytes()
+    if rss is not None:
+        METRIC_RSS.set(rss)
+    return PlainTextResponse(registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/api/workers")
+async def worker_stats():
+    """本进程的工作槽利用率、模型池统计和正在执行的任务"""
+    return {
+        "worker_id": WORKER_ID,
+        "max_active_jobs": MAX_ACTIVE_JOBS,
+        "active_jobs": sorted(running_jobs),
+        "stages": {name: slots.stats() for name, slots in stage_slots.items()},
+        "model_pool": model_pool.stats(),
+        "result_cache": result_cache.stats(),
+        "websockets": job_events.stats(),
+        "cost_model": cost_model.stats(),
+        "processing_threads": PROCESSING_THREADS
+    }
+
+
+def record_upload(size: int, elapsed: float):
+    """记录上传字节数和写入吞吐量"""
+    if size <= 0:
+        return
+    METRIC_UPLOAD_BYTES.inc(size)
+    METRIC_UPLOAD_THROUGHPUT.observe(size / max(elapsed, 1e-6))
+
+
 @app.post("/api/upload")
 async def upload_videos(files: List[UploadFile] = File(...)):
     """上传视频文件"""
     uploaded_files = []
 
     for file in files:
-        # 生成唯一文件名
-        file_id = str(uuid.uuid4())
-        file_ext = os.path.splitext(file.filename)[1]
-        save_path = UPLOAD_DIR / f"{file_id}{file_ext}"
-
-        # 保存文件
-        with open(save_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        uploaded_files.append({
-            'id': file_id,
-            'name': file.filename,
-            'path': str(save_path),
-            'size': os.path.getsize(save_path)
-        })
+        # 分块写入并计算SHA-256（在线程池中执行），相同内容只保存一份
+        try:
+            start = time.perf_counter()
+            uploaded = await run_io(upload_store.ingest, file.file, file.filename)
+            record_upload(uploaded['size'], time.perf_counter() - start)
+            METRIC_UPLOADS.inc(deduplicated=str(uploaded['deduplicated']).lower())
+            uploaded_files.append(uploaded)
+        finally:
+            await file.close()
 
     logger.info(f"上传了 {len(uploaded_files)} 个文件")
     return {
@@ -400,89 +1026,328 @@ async def upload_videos(files: List[UploadFile] = File(...)):
     }
 
 
-@app.post("/api/process")
-async def start_process(
-    background_tasks: BackgroundTasks,
-    file_ids: List[str],
-    config: ProcessConfig
-):
-    """启动处理任务"""
+@app.post("/api/uploads")
+async def create_upload_session(request: UploadSessionRequest):
+    """开始可续传的分块上传（大文件），之后用 PUT 按偏移发送数据块"""
+    return await run_io(upload_store.create_session, request.name, request.size)
 
-    # 验证文件
-    video_files = []
-    for file_id in file_ids:
-        # 查找上传的文件
-        matching_files = list(UPLOAD_DIR.glob(f"{file_id}.*"))
-        if matching_files:
-            video_files.append(matching_files[0])
 
-    if not video_files:
-        raise HTTPException(status_code=400, detail="没有找到有效的视频文件")
+@app.get("/api/uploads/{upload_id}")
+async def get_upload_session(upload_id: str):
+    """查询分块上传进度，断线后从 received 处续传"""
+    session = await run_io(upload_store.get_session, upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="上传会话不存在")
+    return session
+
+
+@app.put("/api/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request):
+    """
+    写入一个数据块（请求体为原始字节）
+
+    offset 必须等于服务端已接收的字节数，否则返回409和当前进度。
+    """
+    session = await run_io(upload_store.get_session, upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="上传会话不存在")
+    if offset != session['received']:
+        raise HTTPException(status_code=409, detail={'message': "偏移不一致", 'received': session['received']})
 
-    # 创建任务
+    # 边接收边写盘，内存中最多缓存一个块
+    buffer = bytearray()
+    start_offset, start = offset, time.perf_counter()
+    try:
+        async for data in request.stream():
+            buffer.extend(data)
+            if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                offset = await run_io(upload_store.append, upload_id, offset, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            offset = await run_io(upload_store.append, upload_id, offset, bytes(buffer))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail={'message': str(e), 'received': offset})
+    finally:
+        record_upload(offset - start_offset, time.perf_counter() - start)
+    return {'upload_id': upload_id, 'received': offset}
+
+
+@app.post("/api/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    """完成分块上传，返回与 /api/upload 相同格式的文件信息"""
+    try:
+        uploaded = await run_io(upload_store.complete, upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="上传会话不存在")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    METRIC_UPLOADS.inc(deduplicated=str(uploaded['deduplicated']).lower())
+    logger.info(f"分块上传完成: {uploaded['name']} ({uploaded['size'] / (1024 * 1024):.1f} MB)")
+    return uploaded
+
+
+def client_identity(request: Request) -> str:
+    """提交任务的客户端：X-Client-Id 请求头，没有时使用客户端地址"""
+    return request.headers.get('X-Client-Id') or (request.client.host if request.client else 'unknown')
+
+
+def job_cost_key(config: ProcessConfig) -> Optional[str]:
+    """任务转录阶段的成本统计键，复用已有转录时返回None"""
+    if config.transcript_job_id:
+        return None
+    if config.lyrics:
+        return 'forced-alignment'
+    return cost_model_key(config.model_name, resolve_model_config(config))
+
+
+async def submit_job(video_files: List[Path], config: ProcessConfig, client_id: str,
+                     priority: str = DEFAULT_PRIORITY, defer: bool = False) -> Dict[str, Any]:
+    """
+    估算成本、做准入决策，然后创建任务并唤醒worker
+
+    Args:
+        video_files: 视频文件列表
+        config: 处理配置
+        client_id: 提交任务的客户端
+        priority: 优先级类别，见 PRIORITY_CLASSES
+        defer: 超出容量时延后任务而不是拒绝
+
+    Returns:
+        {'job_id', 'status', 'eta_seconds', 'estimated_finish_at'}
+
+    Raises:
+        HTTPException: 参数无效（400，包括多个文件共用一份歌词），或超出容量/客户端份额（429，带 Retry-After）
+    """
+    if config.output_mode not in OUTPUT_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的输出形式: {config.output_mode}，可选 {list(OUTPUT_MODES)}")
+    if priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"不支持的优先级: {priority}，可选 {list(PRIORITY_CLASSES)}")
+    if config.lyrics and len(video_files) > 1:
+        # 一份歌词只对应一首歌，不能对齐到任务中的每个文件
+        raise HTTPException(status_code=400, detail="提供歌词时每个任务只能包含一个媒体文件")
+
+    durations = list(await asyncio.gather(*(run_io(probe_media_duration, str(path)) for path in video_files)))
+    cost = cost_model.estimate(durations, job_cost_key(config),
+                               config.preset if config.output_mode == 'video' else None)
+    decision = admission.decide(await run_io(job_store.list_queued), cost, client_id, PRIORITY_CLASSES[priority],
+                                allow_defer=defer)
+    METRIC_ADMISSIONS.inc(action=decision['action'])
+
+    if decision['action'] == 'reject':
+        retry_after_s = max(int(decision['retry_after_s']) + 1, 1)
+        if decision['reason'] == 'client_share':
+            detail = f"该客户端排队中的任务过多，请约 {retry_after_s} 秒后重试"
+        else:
+            detail = f"服务繁忙：新任务预计需要 {int(decision['eta_s'])} 秒才能完成，请约 {retry_after_s} 秒后重试"
+        logger.info(f"🚫 拒绝任务 (客户端 {client_id}, {decision['reason']}): 预计成本 {sum(cost):.0f} 槽秒")
+        raise HTTPException(status_code=429, detail=detail, headers={'Retry-After': str(retry_after_s)})
+
+    status = 'deferred' if decision['action'] == 'defer' else 'pending'
+    estimated_finish_at = (datetime.now() + timedelta(seconds=decision['eta_s'])).isoformat()
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {
+    await run_io(job_store.create, job_id, video_files, config.dict(), status=status,
+                 client_id=client_id,
+                 priority=PRIORITY_CLASSES[priority],
+                 media_durations=durations,
+                 estimated_asr_s=cost[0],
+                 estimated_encode_s=cost[1],
+                 estimated_finish_at=estimated_finish_at)
+    if status == 'pending':
+        job_wakeup.set()
+    logger.info(f"创建任务: {job_id}, 共 {len(video_files)} 个视频 (输出: {config.output_mode}, "
+                f"优先级: {priority}, 状态: {status}, 预计 {decision['eta_s']:.0f} 秒后完成)")
+    return {
         'job_id': job_id,
-        'status': 'pending',
-        'progress': 0,
-        'current_file': None,
-        'total_files': len(video_files),
-        'processed_files': 0,
-        'failed_files': 0,
-        'output_files': [],
-        'error': None,
-        'created_at': datetime.now().isoformat(),
-        'updated_at': datetime.now().isoformat()
+        'status': status,
+        'eta_seconds': round(decision['eta_s']),
+        'estimated_finish_at': estimated_finish_at
     }
 
-    # 添加后台任务
-    background_tasks.add_task(
-        process_video_job,
-        job_id,
-        video_files,
-        config
-    )
 
-    logger.info(f"创建任务: {job_id}, 共 {len(video_files)} 个视频")
+def resolve_uploaded_files(file_ids: List[str]) -> List[Path]:
+    """按上传索引查找文件，没有有效文件时返回400"""
+    video_files = []
+    for file_id in file_ids:
+        video_path = upload_store.resolve(file_id)
+        if video_path is not None:
+            video_files.append(video_path)
+
+    if not video_files:
+        raise HTTPException(status_code=400, detail="没有找到有效的视频文件")
+    return video_files
+
+
+@app.post("/api/process")
+async def start_process(
+    file_ids: List[str],
+    config: ProcessConfig,
+    request: Request,
+    priority: str = DEFAULT_PRIORITY,
+    defer: bool = False
+):
+    """
+    启动处理任务
+
+    Args:
+        file_ids: 上传文件ID
+        config: 处理配置
+        priority: 优先级类别（interactive、normal、batch）
+        defer: 超出容量时延后任务（状态为deferred，容量空出后自动进入队列），默认直接返回429
+    """
+    video_files = await run_io(resolve_uploaded_files, file_ids)
+    submitted = await submit_job(video_files, config, client_identity(request), priority, defer)
     return {
         'success': True,
-        'job_id': job_id,
+        **submitted,
         'message': f'已创建处理任务，共{len(video_files)}个视频'
     }
 
 
+@app.post("/api/transcribe")
+async def start_transcribe(
+    file_ids: List[str],
+    config: ProcessConfig,
+    request: Request,
+    wait: bool = False,
+    wait_timeout: float = TRANSCRIBE_WAIT_MAX_S,
+    priority: str = DEFAULT_PRIORITY
+):
+    """
+    只生成字幕，不烧录视频
+
+    输出形式默认为SRT字幕（output_mode=subtitles），也可以指定 karaoke 得到卡拉OK ASS字幕。
+    转录结果保存在任务中，之后可通过 /api/jobs/{job_id}/burn 直接烧录。
+
+    Args:
+        file_ids: 上传文件ID
+        config: 处理配置
+        wait: 是否等待任务结束后再返回（返回任务详情，含输出文件）
+        wait_timeout: 最长等待时间（秒，不超过 TRANSCRIBE_WAIT_MAX_S），超时后返回任务ID和当前状态
+        priority: 优先级类别（interactive、normal、batch）
+    """
+    if config.output_mode == 'video':
+        config.output_mode = 'subtitles'
+    video_files = await run_io(resolve_uploaded_files, file_ids)
+    submitted = await submit_job(video_files, config, client_identity(request), priority)
+    job_id = submitted['job_id']
+
+    if not wait:
+        return {
+            'success': True,
+            **submitted,
+            'message': f'已创建转录任务，共{len(video_files)}个视频'
+        }
+
+    deadline = time.monotonic() + min(max(wait_timeout, 0.0), TRANSCRIBE_WAIT_MAX_S)
+    while True:
+        job = await run_io(job_store.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="任务已被删除")
+        if job['status'] in TERMINAL_STATUSES:
+            return job
+        if time.monotonic() >= deadline:
+            return {
+                'success': True,
+                **submitted,
+                'status': job['status'],
+                'timed_out': True,
+                'message': f'等待超时，任务仍在处理，请通过 /api/jobs/{job_id} 或 WebSocket 获取结果'
+            }
+        await asyncio.sleep(TRANSCRIBE_WAIT_POLL_S)
+
+
 @app.get("/api/jobs/{job_id}")
 async def get_job_status(job_id: str):
     """获取任务状态"""
-    if job_id not in jobs:
+    job = await run_io(job_store.get, job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="任务不存在")
 
-    return jobs[job_id]
+    return job
 
 
 @app.get("/api/jobs")
-async def list_jobs():
-    """列出所有任务"""
+async def list_jobs(limit: int = 50, offset: int = 0, status: Optional[str] = None):
+    """分页列出任务摘要（不含输出文件列表，详情见 /api/jobs/{job_id}）"""
+    limit = max(1, min(limit, 500))
+    job_summaries, total = await run_io(job_store.list_jobs, limit=limit, offset=max(offset, 0), status=status)
     return {
-        'jobs': list(jobs.values()),
-        'count': len(jobs)
+        'jobs': job_summaries,
+        'count': total,
+        'limit': limit,
+        'offset': offset
+    }
+
+
+@app.post("/api/jobs/{job_id}/burn")
+async def burn_job(job_id: str, request: Request, config: Optional[ProcessConfig] = None,
+                   priority: str = DEFAULT_PRIORITY, defer: bool = False):
+    """
+    用已完成任务保存的转录结果创建烧录任务，不重新转录
+
+    Args:
+        job_id: 已完成的任务ID
+        config: 要修改的配置项（样式、画质等），未设置的项沿用原任务
+        priority: 优先级类别（interactive、normal、batch）
+        defer: 超出容量时延后任务，默认直接返回429
+    """
+    source = await run_io(job_store.get, job_id, internal=True)
+    if source is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if source['status'] != 'completed':
+        raise HTTPException(status_code=409, detail=f"任务尚未完成: {source['status']}")
+
+    video_files = [Path(path) for path in source['video_files']]
+    missing = [path.name for path in video_files if not path.exists()]
+    if missing:
+        raise HTTPException(status_code=410, detail=f"源视频已不存在: {', '.join(missing)}")
+
+    overrides = config.dict(exclude_unset=True) if config is not None else {}
+    burn_config = ProcessConfig(**{**source['config'], **overrides,
+                                   'output_mode': 'video', 'transcript_job_id': job_id})
+    submitted = await submit_job(video_files, burn_config, client_identity(request), priority, defer)
+    return {
+        'success': True,
+        **submitted,
+        'message': f'已创建烧录任务，共{len(video_files)}个视频'
     }
 
 
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """取消等待中或处理中的任务，已完成的输出文件保留"""
+    # 条件更新：与worker写入结束状态互斥，刚完成的任务不会再被标记为取消
+    if not await run_io(job_store.cancel, job_id):
+        job = await run_io(job_store.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="任务不存在")
+        raise HTTPException(status_code=409, detail=f"任务已结束: {job['status']}")
+
+    if job_id in job_tokens:
+        job_tokens[job_id].cancel('cancelled')
+    await broadcast_job_update(job_id)
+
+    logger.info(f"⏹️ 取消任务: {job_id}")
+    return {'success': True, 'message': '任务已取消'}
+
+
 @app.delete("/api/jobs/{job_id}")
 async def delete_job(job_id: str):
     """删除任务"""
-    if job_id not in jobs:
+    # 删除任务记录
+    if not await run_io(job_store.delete, job_id):
         raise HTTPException(status_code=404, detail="任务不存在")
+    job_events.publish(job_id, None)
+
+    # 停止本进程中正在运行的处理（其他进程的worker轮询时发现任务已删除）
+    if job_id in job_tokens:
+        job_tokens[job_id].cancel('deleted')
 
     # 删除输出文件
     job_output_dir = OUTPUT_DIR / job_id
     if job_output_dir.exists():
         shutil.rmtree(job_output_dir)
 
-    # 删除任务记录
-    del jobs[job_id]
-
     return {'success': True, 'message': '任务已删除'}
 
 
@@ -502,11 +1367,15 @@ async def get_styles():
 
     for style_id in style_names:
         info = style_descriptions.get(style_id, {'name': style_id.capitalize(), 'description': ''})
+        fontname = get_style(style_id).get_fontname()
         styles.append({
             'id': style_id,
             'name': info['name'],
             'description': info['description'],
-            'recommended': style_id == 'classic'
+            'recommended': style_id == 'classic',
+            'fontname': fontname,
+            # fc-match 是子进程调用，不能阻塞事件循环
+            'font_available': await run_io(fonts.resolve_font, fontname) is not None
         })
 
     return {'styles': styles}
@@ -537,18 +1406,41 @@ async def get_config():
 
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket端点，用于实时推送任务进度"""
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, jobs: Optional[str] = None):
+    """
+    WebSocket端点，用于实时推送任务进度
+
+    连接时可用 ?jobs=id1,id2 指定订阅的任务（默认 * 订阅全部任务的摘要），
+    之后可发送 {"action": "subscribe" | "unsubscribe", "job_ids": [...]} 调整订阅。
+    订阅单个任务时先收到一条完整快照（job_snapshot），之后只收到变化的字段（job_update）。
+    """
+    await websocket.accept()
+    topics = [topic for topic in (jobs or ALL_JOBS).split(',') if topic]
+    subscriber = job_events.connect(websocket.send_json, topics)
     try:
         while True:
-            # 保持连接
             data = await websocket.receive_text()
-            # 可以处理客户端发来的消息
             if data == "ping":
-                await websocket.send_json({"type": "pong"})
+                subscriber.queue_control({"type": "pong"})
+                continue
+            try:
+                message = json.loads(data)
+                action = message.get('action')
+                job_ids = [str(job_id) for job_id in message.get('job_ids', [])]
+            except (ValueError, AttributeError, TypeError):
+                continue
+            if action == 'subscribe':
+                subscriber.topics.update(job_ids)
+                for job_id in job_ids:
+                    job = await run_io(job_store.get, job_id) if job_id != ALL_JOBS else None
+                    if job is not None:
+                        subscriber.queue_control({'type': 'job_snapshot', 'job_id': job_id, 'data': job})
+            elif action == 'unsubscribe':
+                subscriber.topics.difference_update(job_ids)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
+    finally:
+        job_events.disconnect(subscriber)
 
 
 @app.on_event("startup")
@@ -562,13 +1454,26 @@ async def startup_event():
     print(f"🌐 API文档: http://localhost:8001/docs")
     print(f"🎨 Web界面: http://localhost:8001")
     print(f"📝 默认配置: {DEFAULT_CONFIG_PATH}")
+    print(f"🔤 字体目录: {fonts.FONTS_DIR}")
     print("=" * 60)
 
+    # 预热fontconfig缓存并检查各样式字体，避免首次烧录时扫描字体
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, fonts.warm_font_cache)
+    await loop.run_in_executor(None, fonts.validate_style_fonts, get_all_styles().values())
+
+    # 启动任务队列worker（会接管上次中断的任务）和过期任务清理
+    print(f"🗃️ 任务数据库: {JOB_DB_PATH} (worker {WORKER_ID})")
+    asyncio.create_task(job_worker())
+    asyncio.create_task(job_pruner())
+    asyncio.create_task(job_event_poller())
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时的清理"""
     logger.info("服务正在关闭...")
+    processing_executor.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+协作式取消
+Cooperative Cancellation Tokens
+
+A `CancellationToken` is shared between the code that wants to stop a job and the
+code doing the work. Long running steps check it at safe points (between decoding
+windows, between chunks, while waiting for ffmpeg) and raise `JobCancelled`, so
+cancellation never leaves a thread or a subprocess behind.
+"""
+
+import functools
+import threading
+from typing import Callable, List, Optional
+
+
+class JobCancelled(Exception):
+    """正在执行的任务被取消"""
+
+
+class CancellationToken:
+    """
+    线程安全的取消标记
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = 'cancelled'):
+        """
+        请求取消（重复调用无副作用）
+
+        Args:
+            reason: 取消原因
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        注册取消时调用的函数；已取消时立即调用
+
+        Args:
+            callback: 取消时调用的函数
+
+        Returns:
+            注销函数，等待的操作结束后调用，避免长期存在的标记上积累回调（可重复调用）
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return functools.partial(self._remove_callback, callback)
+        callback()
+        return lambda: None
+
+    def _remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def raise_if_cancelled(self):
+        """
+        已取消时抛出 :class:`JobCancelled`
+
+        Raises:
+            JobCancelled: 已请求取消
+        """
+        if self._event.is_set():
+            raise JobCancelled(self.reason)
@@ -34,6 +34,7 @@ import pathlib
 
 from subsai import SubsAI, Tools
 from subsai.utils import available_translation_models, available_subs_formats
+from subsai.karaoke_styles import get_style_names
 
 subs_ai = SubsAI()
 tools = Tools()
@@ -62,6 +63,17 @@ def _handle_configs(model_configs_arg: str):
     return json.loads(model_configs_arg)
 
 
+def _output_file(file: pathlib.Path, destination_folder, output_suffix, subs_format) -> pathlib.Path:
+    if destination_folder is not None:
+        folder = pathlib.Path(destination_folder).absolute()
+        if not folder.exists():
+            print(f"[+] Creating folder: {folder}".encode('utf-8'))
+            os.makedirs(folder, exist_ok=True)
+    else:
+        folder = file.parent
+    return folder / (file.stem + (output_suffix or '') + '.' + subs_format)
+
+
 def run(media_file_arg: List[str],
         model_name,
         model_configs,
@@ -71,9 +83,16 @@ def run(media_file_arg: List[str],
         translation_configs,
         translation_source_lang,
         translation_target_lang,
-        output_suffix
+        output_suffix,
+        lyrics_file=None,
+        karaoke_style='classic'
         ):
     files = _handle_media_file(media_file_arg)
+    if lyrics_file is not None:
+        if len(files) > 1:
+            print(f"[*] Error: --lyrics applies to a single media file, got {len(files)} files")
+            return
+        return run_lyrics(files, lyrics_file, destination_folder, output_suffix, karaoke_style)
     model_configs = _handle_configs(model_configs)
     print(f"[-] Model name: {model_name}")
     print(f"[-] Model configs: {'defaults' if model_configs == {} else model_configs}")
@@ -87,17 +106,7 @@ def run(media_file_arg: List[str],
             print(f"[*] Error: {file} does not exist -> continue".encode('utf-8'))
             continue
         subs = subs_ai.transcribe(file, model)
-        if destination_folder is not None:
-            folder = pathlib.Path(destination_folder).absolute()
-            if not folder.exists():
-                print(f"[+] Creating folder: {folder}".encode('utf-8'))
-                os.makedirs(folder, exist_ok=True)
-        else:
-            folder = file.parent
-        if output_suffix is not None:
-            file_name = folder / (file.stem + output_suffix + '.' + subs_format)
-        else:
-            file_name = folder / (file.stem + '.' + subs_format)
+        file_name = _output_file(file, destination_folder, output_suffix, subs_format)
 
         if translation_model is not None:
             if tr_model is None:
@@ -115,6 +124,38 @@ def run(media_file_arg: List[str],
     print('DONE!')
 
 
+def run_lyrics(files: List[pathlib.Path],
+               lyrics_file,
+               destination_folder,
+               output_suffix,
+               karaoke_style):
+    """
+    Karaoke subtitles from known lyrics: the lyrics are force-aligned to the audio,
+    no transcription model is loaded. One lyrics file belongs to one song, so `files` holds a single file.
+    """
+    from subsai.alignment import get_forced_aligner
+    from subsai.karaoke_generator import KaraokeGenerator
+
+    with open(lyrics_file, 'r', encoding='utf-8') as f:
+        lyrics = f.read()
+    print(f"[-] Lyrics: {lyrics_file}".encode('utf-8'))
+    print(f"[-] Karaoke style: {karaoke_style}")
+    print(f"---")
+    aligner = get_forced_aligner()
+    # karaoke lines never span two lyric lines
+    generator = KaraokeGenerator(style_name=karaoke_style, break_on_segments=True)
+    for file in files:
+        print(f"[+] Aligning lyrics to: {file}".encode('utf-8'))
+        if not file.exists():
+            print(f"[*] Error: {file} does not exist -> continue".encode('utf-8'))
+            continue
+        word_timings = aligner.align_lyrics(str(file), lyrics)
+        file_name = _output_file(file, destination_folder, output_suffix, 'ass')
+        generator.generate_to_file(word_timings, file_name)
+        print(f"[+] Karaoke subtitles saved to: {file_name}".encode('utf-8'))
+    print('DONE!')
+
+
 def main():
     start_time = time.time()
     print(__header__)
@@ -145,6 +186,12 @@ def main():
                         help="JSON configuration (path to a json file or a direct "
                              "string)")
     parser.add_argument('-os', '--output-suffix', default=None, help="Name of the subtitles output file, (In batch processing, this will be used as a suffix to the media filename)")
+    parser.add_argument('-l', '--lyrics', default=None,
+                        help="Text file with the known lyrics (one line per sung line) of a single media file. Skips "
+                             "transcription: the lyrics are force-aligned to the audio and saved as karaoke ASS "
+                             "subtitles")
+    parser.add_argument('-ks', '--karaoke-style', default='classic',
+                        help=f"Karaoke style used with --lyrics, available styles: {get_style_names()}")
 
     args = parser.parse_args()
 
@@ -157,7 +204,9 @@ def main():
         translation_configs=args.translation_configs,
         translation_source_lang=args.translation_source_lang,
         translation_target_lang=args.translation_target_lang,
-        output_suffix=args.output_suffix)
+        output_suffix=args.output_suffix,
+        lyrics_file=args.lyrics,
+        karaoke_style=args.karaoke_style)
 
     end_time = time.time()
     elapsed_time = end_time - start_time
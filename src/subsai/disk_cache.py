@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+磁盘缓存
+Content-addressed Disk Cache
+
+This module provides a small content-addressed on-disk cache with a disk budget.
+Entries are plain files; the least recently used ones are evicted first.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# 指纹采样块大小（头部/中部/尾部各读取一块）
+FINGERPRINT_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def file_fingerprint(path: Union[str, Path], block_size: int = FINGERPRINT_BLOCK_SIZE) -> str:
+    """
+    计算媒体文件的内容指纹
+
+    只读取文件头部、中部和尾部各一块数据，加上文件大小，
+    对多GB视频也能在毫秒级完成，且文件被复制/重命名后指纹不变。
+
+    Args:
+        path: 文件路径
+        block_size: 每块采样的字节数
+
+    Returns:
+        十六进制SHA-256指纹
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    digest = hashlib.sha256()
+    digest.update(str(size).encode())
+
+    with open(path, 'rb') as f:
+        if size <= block_size * 3:
+            digest.update(f.read())
+        else:
+            for offset in (0, size // 2 - block_size // 2, size - block_size):
+                f.seek(offset)
+                digest.update(f.read(block_size))
+
+    return digest.hexdigest()
+
+
+def make_cache_key(*parts: Any) -> str:
+    """
+    由任意可JSON序列化的部件生成缓存键
+
+    Args:
+        parts: 组成缓存键的部件（如指纹、滤镜参数、配置字典）
+
+    Returns:
+        十六进制SHA-256缓存键
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """
+    基于内容寻址的磁盘缓存
+
+    每个条目是 ``<cache_dir>/<key[:2]>/<key><suffix>`` 形式的普通文件，
+    写入先落到临时目录再原子重命名，命中时刷新mtime，
+    超出磁盘预算时按mtime从旧到新淘汰。
+    """
+
+    TMP_DIR_NAME = 'tmp'
+
+    def __init__(self, cache_dir: Union[str, Path], max_size_bytes: int):
+        """
+        初始化磁盘缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_size_bytes: 磁盘预算（字节）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = int(max_size_bytes)
+        self._lock = threading.Lock()
+        (self.cache_dir / self.TMP_DIR_NAME).mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, key: str, suffix: str = '') -> Path:
+        """返回缓存条目的最终路径（不保证存在）"""
+        return self.cache_dir / key[:2] / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str = '') -> Optional[Path]:
+        """
+        查找缓存条目
+
+        Args:
+            key: 缓存键
+            suffix: 文件后缀
+
+        Returns:
+            命中时返回条目路径，否则返回None
+        """
+        path = self.path_for(key, suffix)
+        try:
+            # 刷新mtime，作为LRU淘汰依据
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def temp_path(self, suffix: str = '') -> Path:
+        """返回一个位于缓存临时目录中的新路径，用于写入待提交的条目"""
+        return self.cache_dir / self.TMP_DIR_NAME / f"{uuid.uuid4().hex}{suffix}"
+
+    def commit(self, temp_path: Union[str, Path], key: str, suffix: str = '') -> Optional[Path]:
+        """
+        将临时文件原子地提交为缓存条目，并按预算执行淘汰
+
+        超过整个磁盘预算的条目不会提交（否则会淘汰所有其他条目后仍然超出预算），
+        临时文件被删除。
+
+        Args:
+            temp_path: 由 :meth:`temp_path` 得到并已写入完成的文件
+            key: 缓存键
+            suffix: 文件后缀
+
+        Returns:
+            缓存条目路径，条目超过磁盘预算时返回None
+        """
+        size = os.path.getsize(temp_path)
+        if size > self.max_size_bytes:
+            self.discard(temp_path)
+            logger.warning(f"⚠️  缓存条目 {key[:12]} ({size / (1024 * 1024):.1f} MB) 超过磁盘预算 "
+                           f"({self.max_size_bytes / (1024 * 1024):.1f} MB)，不缓存")
+            return None
+        final_path = self.path_for(key, suffix)
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, final_path)
+        self.evict(keep=final_path)
+        return final_path
+
+    def put_bytes(self, key: str, data: bytes, suffix: str = '') -> Optional[Path]:
+        """将字节内容写入缓存（超过磁盘预算时不写入，返回None）"""
+        temp_path = self.temp_path(suffix)
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        return self.commit(temp_path, key, suffix)
+
+    def discard(self, temp_path: Union[str, Path]):
+        """删除未提交的临时文件"""
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+
+    def _entries(self):
+        for sub_dir in self.cache_dir.iterdir():
+            if not sub_dir.is_dir() or sub_dir.name == self.TMP_DIR_NAME:
+                continue
+            for entry in sub_dir.iterdir():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry, stat
+
+    def total_size(self) -> int:
+        """返回当前缓存占用的字节数"""
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """
+        按磁盘预算淘汰最久未使用的条目
+
+        Args:
+            keep: 不参与淘汰的条目（通常是刚提交的条目）
+
+        Returns:
+            释放的字节数
+        """
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda item: item[1].st_mtime)
+            total = sum(stat.st_size for _, stat in entries)
+            freed = 0
+            for entry, stat in entries:
+                if total <= self.max_size_bytes:
+                    break
+                if keep is not None and entry == keep:
+                    continue
+                try:
+                    entry.unlink()
+                except FileNotFoundError:
+                    continue
+                total -= stat.st_size
+                freed += stat.st_size
+                logger.info(f"🗑️ 缓存淘汰: {entry.name} ({stat.st_size / (1024 * 1024):.1f} MB)")
+            return freed
+
+
+class StripedLocks:
+    """
+    按缓存键分配的固定数量的锁（锁分段）
+
+    同一个键总是对应同一把锁，锁的数量不随键的数量增长。
+    不同的键偶尔共用一把锁，只会让它们串行执行。
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def for_key(self, key: str) -> threading.Lock:
+        """返回键对应的锁（键为 :func:`make_cache_key` 生成的十六进制字符串）"""
+        return self._locks[int(key[:8], 16) % len(self._locks)]
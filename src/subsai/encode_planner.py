@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+编码截止时间规划
+Deadline-aware Encoder Preset Planning
+
+Picks the slowest (best compression) x264/x265 preset that still finishes an encode
+within a wall-clock budget. Encode speed comes from a per-host calibration table,
+or from a short probe encode of the first seconds of the video when no entry exists.
+"""
+
+import json
+import logging
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 从快到慢排列的x264/x265预设
+X264_PRESETS: List[str] = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast',
+                           'medium', 'slow', 'slower', 'veryslow']
+
+# 各预设相对medium的编码速度倍数（经验值，仅在标定表缺少该预设时使用）
+X264_PRESET_SPEED: Dict[str, float] = {
+    'ultrafast': 8.0,
+    'superfast': 6.0,
+    'veryfast': 4.0,
+    'faster': 2.2,
+    'fast': 1.6,
+    'medium': 1.0,
+    'slow': 0.6,
+    'slower': 0.3,
+    'veryslow': 0.12,
+}
+
+PLANNABLE_CODECS = ('libx264', 'libx265')
+
+DEFAULT_CALIBRATION_FILE = Path(os.environ.get(
+    'SUBSAI_ENCODE_CALIBRATION_FILE',
+    Path.home() / '.cache' / 'subsai' / 'encode_calibration.json'
+))
+
+# 同一进程中每次烧录都会新建标定表实例，读-改-写按文件路径加锁
+_calibration_locks: Dict[Path, threading.Lock] = {}
+_calibration_locks_guard = threading.Lock()
+
+
+def _calibration_lock(path: Path) -> threading.Lock:
+    """返回标定文件路径对应的进程级锁"""
+    with _calibration_locks_guard:
+        return _calibration_locks.setdefault(path.resolve(), threading.Lock())
+
+
+def pixel_bucket(width: int, height: int) -> str:
+    """将分辨率归入以0.5百万像素为步长的桶，作为标定表的键"""
+    return f"{round(width * height / 500_000) * 0.5:.1f}MP"
+
+
+def get_frame_rate(metadata: dict) -> Optional[float]:
+    """
+    从ffprobe视频流信息中获取平均帧率
+
+    Args:
+        metadata: ffprobe返回的视频流字典
+
+    Returns:
+        帧率，无法确定时返回None
+    """
+    try:
+        num, den = map(int, metadata.get('avg_frame_rate', '0/0').split('/'))
+        return num / den
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def get_total_frames(metadata: dict) -> Optional[int]:
+    """
+    从ffprobe视频流信息中获取总帧数
+
+    Args:
+        metadata: ffprobe返回的视频流字典
+
+    Returns:
+        总帧数，无法确定时返回None
+    """
+    if str(metadata.get('nb_frames', '')).isdigit():
+        return int(metadata['nb_frames'])
+    frame_rate = get_frame_rate(metadata)
+    if frame_rate is None or 'duration' not in metadata:
+        return None
+    return int(float(metadata['duration']) * frame_rate)
+
+
+class EncodeCalibration:
+    """
+    按主机保存的编码速度标定表
+
+    表结构: {hostname: {"<codec>|<preset>|<pixel_bucket>": fps}}，
+    每次实际编码后以指数滑动平均更新。
+    """
+
+    def __init__(self, path: Path = DEFAULT_CALIBRATION_FILE, smoothing: float = 0.3):
+        self.path = Path(path)
+        self.smoothing = smoothing
+        self.host = socket.gethostname()
+        self._lock = _calibration_lock(self.path)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def _key(codec: str, preset: str, bucket: str) -> str:
+        return f"{codec}|{preset}|{bucket}"
+
+    def get(self, codec: str, preset: str, bucket: str) -> Optional[float]:
+        """返回本机该编码器/预设/分辨率下的编码帧率，没有记录时返回None"""
+        return self._load().get(self.host, {}).get(self._key(codec, preset, bucket))
+
+    def update(self, codec: str, preset: str, bucket: str, fps: float):
+        """
+        以指数滑动平均记录一次实测编码帧率
+
+        每次写入使用唯一的临时文件再原子替换，并发的写入者（其他进程）不会互相覆盖临时文件。
+
+        Raises:
+            OSError: 标定文件无法写入
+        """
+        with self._lock:
+            table = self._load()
+            host_table = table.setdefault(self.host, {})
+            key = self._key(codec, preset, bucket)
+            previous = host_table.get(key)
+            host_table[key] = fps if previous is None else previous + self.smoothing * (fps - previous)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(table, f, indent=2)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                Path(temp_path).unlink(missing_ok=True)
+                raise
+
+
+def measure_encode_fps(ffmpeg_cmd: List[str], frames: int, pass_fds=(), env: dict = None,
+                       ffmpeg_runner=None) -> float:
+    """
+    运行一次试编码并返回实测帧率
+
+    Args:
+        ffmpeg_cmd: 只编码前几秒并输出到null的ffmpeg命令
+        frames: 试编码覆盖的帧数
+        pass_fds: 传给子进程的文件描述符（如内存字幕）
+        env: 子进程环境变量（可选）
+        ffmpeg_runner: 可选的ffmpeg运行器 `(cmd, pass_fds, env) -> (returncode, stderr_bytes)`，
+                       用于可取消的执行，默认使用 subprocess.run
+
+    Returns:
+        编码帧率（fps）
+
+    Raises:
+        subprocess.CalledProcessError: 试编码失败
+    """
+    start_time = time.monotonic()
+    if ffmpeg_runner is None:
+        subprocess.run(ffmpeg_cmd, capture_output=True, check=True, pass_fds=pass_fds, env=env)
+    else:
+        returncode, stderr = ffmpeg_runner(ffmpeg_cmd, pass_fds, env)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, ffmpeg_cmd, stderr=stderr)
+    return frames / max(time.monotonic() - start_time, 1e-3)
+
+
+def plan_preset(deadline_s: float,
+                total_frames: int,
+                codec: str,
+                bucket: str,
+                calibration: EncodeCalibration,
+                measure: Callable[[str], float],
+                probe_preset: str = 'veryfast',
+                safety_margin: float = 0.85) -> dict:
+    """
+    选择能在截止时间内完成的最慢预设
+
+    Args:
+        deadline_s: 编码可用的时间预算（秒）
+        total_frames: 需要编码的总帧数
+        codec: 视频编码器（libx264/libx265）
+        bucket: 分辨率桶（见 :func:`pixel_bucket`）
+        calibration: 编码速度标定表
+        measure: 试编码函数 measure(preset) -> fps，仅在标定表缺少数据时调用，耗时从时间预算中扣除
+        probe_preset: 试编码使用的预设
+        safety_margin: 只使用预算的这一比例，为预测误差留余量
+
+    Returns:
+        规划结果 {"preset", "predicted_s", "estimated_fps", "fps_source", "probe_s"}
+    """
+    estimates = {preset: calibration.get(codec, preset, bucket) for preset in X264_PRESETS}
+    fps_source = 'calibration'
+    probe_s = 0.0
+
+    if any(fps is None for fps in estimates.values()):
+        reference_preset = next((p for p in X264_PRESETS if estimates[p] is not None), None)
+        if reference_preset is None:
+            reference_preset = probe_preset
+            probe_start = time.monotonic()
+            reference_fps = measure(probe_preset)
+            probe_s = time.monotonic() - probe_start
+            fps_source = 'probe'
+            logger.info(f"⏱️ 试编码 ({probe_preset}): {reference_fps:.1f} fps")
+        else:
+            reference_fps = estimates[reference_preset]
+        for preset, fps in estimates.items():
+            if fps is None:
+                estimates[preset] = reference_fps * X264_PRESET_SPEED[preset] / X264_PRESET_SPEED[reference_preset]
+
+    # 试编码已经用掉了一部分截止时间
+    budget = max(deadline_s - probe_s, 0.0) * safety_margin
+    chosen = X264_PRESETS[0]
+    for preset in X264_PRESETS:
+        if total_frames / estimates[preset] <= budget:
+            chosen = preset
+
+    return {
+        'preset': chosen,
+        'predicted_s': round(total_frames / estimates[chosen], 1),
+        'estimated_fps': round(estimates[chosen], 1),
+        'fps_source': fps_source,
+        'probe_s': round(probe_s, 1),
+    }
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+字体管理
+Managed Fonts Directory and Persistent fontconfig Cache
+
+libass resolves `fontname` through fontconfig. On a fresh container the first `ass=`
+render spends seconds building the fontconfig cache, and every ffmpeg launch scans
+system font directories again. This module manages a dedicated fonts directory
+(passed to the filter with `fontsdir=`) and a fontconfig configuration whose cache
+lives in a persistent directory that is built once at install or startup.
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+FONTS_DIR = Path(os.environ.get('SUBSAI_FONTS_DIR', Path.home() / '.local' / 'share' / 'subsai' / 'fonts'))
+FONTCONFIG_CACHE_DIR = Path(os.environ.get('SUBSAI_FONTCONFIG_CACHE', Path.home() / '.cache' / 'subsai' / 'fontconfig'))
+FONTCONFIG_FILE = FONTCONFIG_CACHE_DIR / 'fonts.conf'
+
+# 自有缓存目录放在最前面，fontconfig会把新生成的缓存写入第一个可写的cachedir
+FONTS_CONF_TEMPLATE = """<?xml version="1.0"?>
+<!DOCTYPE fontconfig SYSTEM "fonts.dtd">
+<fontconfig>
+  <cachedir>{cache_dir}</cachedir>
+  <dir>{fonts_dir}</dir>
+  <include ignore_missing="yes">/etc/fonts/fonts.conf</include>
+</fontconfig>
+"""
+
+
+def ensure_fontconfig() -> Path:
+    """
+    创建字体目录并写入subsai专用的fontconfig配置
+
+    Returns:
+        fonts.conf 路径
+    """
+    FONTS_DIR.mkdir(parents=True, exist_ok=True)
+    FONTCONFIG_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    content = FONTS_CONF_TEMPLATE.format(cache_dir=FONTCONFIG_CACHE_DIR, fonts_dir=FONTS_DIR)
+    if not FONTCONFIG_FILE.exists() or FONTCONFIG_FILE.read_text(encoding='utf-8') != content:
+        FONTCONFIG_FILE.write_text(content, encoding='utf-8')
+    return FONTCONFIG_FILE
+
+
+def ffmpeg_env() -> Dict[str, str]:
+    """
+    返回运行ffmpeg时使用的环境变量（指向subsai的fontconfig配置）
+
+    Returns:
+        环境变量字典
+    """
+    env = dict(os.environ)
+    env['FONTCONFIG_FILE'] = str(ensure_fontconfig())
+    return env
+
+
+def warm_font_cache(force: bool = False) -> bool:
+    """
+    预先构建持久化的fontconfig缓存（安装或启动时调用一次）
+
+    Args:
+        force: 是否强制重建缓存
+
+    Returns:
+        是否成功构建（系统没有fc-cache时返回False）
+    """
+    fc_cache = shutil.which('fc-cache')
+    if fc_cache is None:
+        logger.warning("⚠️  未找到fc-cache，跳过字体缓存预热")
+        return False
+    cmd = [fc_cache, '-f'] if force else [fc_cache]
+    try:
+        subprocess.run(cmd, env=ffmpeg_env(), capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        logger.warning(f"⚠️  字体缓存预热失败: {e.stderr.decode('utf-8', errors='ignore')}")
+        return False
+    clear_font_cache()
+    logger.info(f"🔤 字体缓存已就绪: {FONTCONFIG_CACHE_DIR}")
+    return True
+
+
+# 字体名称 -> 字体文件（解析成功的字体）
+_resolved_fonts: Dict[str, str] = {}
+# 无法解析的字体名称 -> 当时字体目录的mtime；字体目录变化（放入新字体）后重新解析。
+# 有界，避免每个未知的字体名称都常驻内存
+_unresolved_fonts: 'OrderedDict[str, Optional[int]]' = OrderedDict()
+UNRESOLVED_FONTS_MAX = 256
+_unresolved_fonts_lock = threading.Lock()
+
+
+def clear_font_cache():
+    """清空字体解析结果（安装字体或重建fontconfig缓存后调用）"""
+    with _unresolved_fonts_lock:
+        _resolved_fonts.clear()
+        _unresolved_fonts.clear()
+
+
+def _fonts_dir_stamp() -> Optional[int]:
+    try:
+        return FONTS_DIR.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def resolve_font(fontname: str) -> Optional[str]:
+    """
+    检查字体名称能否被fontconfig精确解析（而不是回退到其他字体）
+
+    解析成功和失败的结果都会缓存；失败的结果在字体目录发生变化后失效。
+    fc-match不可用或执行失败时不缓存。
+
+    Args:
+        fontname: 字体名称（如 "Microsoft YaHei"）
+
+    Returns:
+        字体文件路径，无法解析时返回None
+    """
+    font_file = _resolved_fonts.get(fontname)
+    if font_file is not None:
+        return font_file
+    stamp = _fonts_dir_stamp()
+    with _unresolved_fonts_lock:
+        if fontname in _unresolved_fonts and _unresolved_fonts[fontname] == stamp:
+            _unresolved_fonts.move_to_end(fontname)
+            return None
+
+    try:
+        font_file = _match_font(fontname)
+    except OSError as e:
+        logger.debug(f"fc-match 无法解析字体 '{fontname}': {e}")
+        return None
+
+    with _unresolved_fonts_lock:
+        if font_file is not None:
+            _resolved_fonts[fontname] = font_file
+            _unresolved_fonts.pop(fontname, None)
+        else:
+            # 首次解析时才创建字体目录，这时以创建后的mtime为准
+            _unresolved_fonts[fontname] = stamp if stamp is not None else _fonts_dir_stamp()
+            _unresolved_fonts.move_to_end(fontname)
+            while len(_unresolved_fonts) > UNRESOLVED_FONTS_MAX:
+                _unresolved_fonts.popitem(last=False)
+    return font_file
+
+
+def _match_font(fontname: str) -> Optional[str]:
+    """
+    用fc-match查找字体
+
+    Returns:
+        字体文件路径；fontconfig回退到其他字体时返回None
+
+    Raises:
+        OSError: fc-match不存在或执行失败
+    """
+    fc_match = shutil.which('fc-match')
+    if fc_match is None:
+        raise FileNotFoundError('fc-match not found')
+    result = subprocess.run([fc_match, '-f', '%{family}\n%{file}', fontname],
+                            env=ffmpeg_env(), capture_output=True)
+    if result.returncode != 0:
+        raise OSError(f"fc-match exited with {result.returncode}: "
+                      f"{result.stderr.decode('utf-8', errors='ignore').strip()}")
+    families, _, font_file = result.stdout.decode('utf-8', errors='ignore').partition('\n')
+    if fontname.lower() not in (family.strip().lower() for family in families.split(',')):
+        return None
+    return font_file.strip() or None
+
+
+def validate_style_fonts(styles: Iterable) -> Dict[str, Optional[str]]:
+    """
+    检查每个卡拉OK样式的字体是否可以解析
+
+    Args:
+        styles: KaraokeStyle实例的集合
+
+    Returns:
+        {字体名称: 字体文件路径或None}
+    """
+    resolved = {}
+    for style in styles:
+        fontname = style.get_fontname()
+        if fontname in resolved:
+            continue
+        resolved[fontname] = resolve_font(fontname)
+        if resolved[fontname] is None:
+            logger.warning(f"⚠️  字体 '{fontname}' 无法解析，libass将回退到其他字体。"
+                           f"可将字体文件放入 {FONTS_DIR}")
+    return resolved
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+任务事件推送
+Per-job Event Subscriptions for WebSocket Clients
+
+Clients subscribe to the jobs they display (or to ``*`` for all jobs) and receive
+only the fields that changed since the last update. Updates are coalesced per
+connection and sent by a per-connection task at most a few times per second, so a
+newer progress frame replaces an older one that was not sent yet. One slow client
+therefore never delays the others, and a client whose send times out or fails is
+dropped.
+
+Each uvicorn worker has its own hub, and a job is processed by whichever worker
+claimed it. Every worker therefore also polls the shared job store for rows whose
+``updated_at`` moved (see :meth:`subsai.job_store.JobStore.list_updated_since`) and
+publishes those jobs too, so a client sees a job's progress no matter which
+worker holds its WebSocket. Per-segment ``send_event`` messages are only delivered
+by the worker that runs the job.
+"""
+
+import asyncio
+import itertools
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+
+from subsai.job_store import TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# 订阅全部任务的主题
+ALL_JOBS = '*'
+# 订阅全部任务时不推送的大字段（客户端按需通过 /api/jobs/{id} 获取）
+SUMMARY_EXCLUDED_FIELDS = {'output_files'}
+# 区分“字段不存在”和“值为None”
+_MISSING = object()
+# 记住最近结束的任务数（结束状态已推送过，轮询再读到时不重复推送）
+FINISHED_JOBS_REMEMBERED = 4096
+
+
+class Subscriber:
+    """
+    一个WebSocket连接：订阅的主题、待发送的合并增量和有界的控制消息队列
+    """
+
+    def __init__(self,
+                 send: Callable[[Dict[str, Any]], Awaitable[None]],
+                 min_interval: float = 0.25,
+                 max_control_messages: int = 32,
+                 send_timeout: float = 10.0):
+        """
+        初始化订阅者
+
+        Args:
+            send: 发送一条JSON消息的协程函数（如 ``websocket.send_json``）
+            min_interval: 两次推送增量之间的最小间隔（秒）
+            max_control_messages: 控制消息（快照、pong）队列长度，溢出时丢弃最旧的
+            send_timeout: 单条消息的发送超时（秒），超时视为连接已失效
+        """
+        self.id: Optional[int] = None
+        self.send = send
+        self.min_interval = min_interval
+        self.send_timeout = send_timeout
+        self.topics: Set[str] = set()
+        # job_id -> 尚未发送的合并增量（新值覆盖旧值）
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.control = deque(maxlen=max_control_messages)
+        self.sent = 0
+        self.coalesced = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+
+    def wants(self, job_id: str) -> bool:
+        return job_id in self.topics or ALL_JOBS in self.topics
+
+    def queue_delta(self, job_id: str, delta: Dict[str, Any]):
+        """合并一个任务的增量，等待下一次推送"""
+        if job_id not in self.topics:
+            delta = {k: v for k, v in delta.items() if k not in SUMMARY_EXCLUDED_FIELDS}
+            if not delta:
+                return
+        if job_id in self.pending:
+            self.coalesced += 1
+            self.pending[job_id].update(delta)
+        else:
+            self.pending[job_id] = dict(delta)
+        self._wakeup.set()
+
+    def queue_control(self, message: Dict[str, Any]):
+        """加入一条立即发送的控制消息"""
+        self.control.append(message)
+        self._wakeup.set()
+
+    async def _send(self, message: Dict[str, Any]):
+        await asyncio.wait_for(self.send(message), timeout=self.send_timeout)
+        self.sent += 1
+
+    async def run(self, on_dead: Callable[['Subscriber'], None]):
+        """发送循环：先发控制消息，再发合并后的增量，然后按最小间隔休眠"""
+        try:
+            while not self.closed:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self.control:
+                    await self._send(self.control.popleft())
+                if self.pending:
+                    pending, self.pending = self.pending, {}
+                    for job_id, delta in pending.items():
+                        await self._send({'type': 'job_update', 'job_id': job_id, 'delta': True, 'data': delta})
+                    await asyncio.sleep(self.min_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"WebSocket推送失败，断开连接: {e}")
+            on_dead(self)
+
+    def start(self, on_dead: Callable[['Subscriber'], None]):
+        self._task = asyncio.create_task(self.run(on_dead))
+
+    def close(self):
+        self.closed = True
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+
+class JobEventHub:
+    """
+    按任务ID分发增量更新
+    """
+
+    def __init__(self, min_interval: float = 0.25, send_timeout: float = 10.0):
+        """
+        初始化事件中心
+
+        Args:
+            min_interval: 每个连接两次推送之间的最小间隔（秒）
+            send_timeout: 单条消息的发送超时（秒）
+        """
+        self.min_interval = min_interval
+        self.send_timeout = send_timeout
+        self.subscribers: Dict[int, Subscriber] = {}
+        # 每个任务最近一次发布的状态，用于计算增量
+        self._last_state: Dict[str, Dict[str, Any]] = {}
+        # 已结束的任务 -> 推送结束状态时的 updated_at（有界，先进先出）
+        self._finished: 'OrderedDict[str, str]' = OrderedDict()
+        self._ids = itertools.count()
+        self.published = 0
+
+    def connect(self, send: Callable[[Dict[str, Any]], Awaitable[None]],
+                topics: Iterable[str] = ()) -> Subscriber:
+        """
+        注册一个连接并启动其发送任务
+
+        Args:
+            send: 发送JSON消息的协程函数
+            topics: 初始订阅的任务ID（或 ``*``）
+
+        Returns:
+            Subscriber
+        """
+        subscriber = Subscriber(send, self.min_interval, send_timeout=self.send_timeout)
+        subscriber.topics.update(topics)
+        subscriber.id = next(self._ids)
+        self.subscribers[subscriber.id] = subscriber
+        subscriber.start(self.disconnect)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber):
+        """移除连接（重复调用无副作用）"""
+        subscriber.close()
+        self.subscribers.pop(subscriber.id, None)
+
+    def followed_jobs(self) -> Set[str]:
+        """返回所有连接订阅的任务ID（含 ``*``），没有连接时为空集合"""
+        topics = set()
+        for subscriber in self.subscribers.values():
+            topics.update(subscriber.topics)
+        return topics
+
+    def publish(self, job_id: str, job: Optional[Dict[str, Any]]):
+        """
+        发布任务的最新状态，只把变化的字段推送给订阅者
+
+        Args:
+            job_id: 任务ID
+            job: 任务的公开字段；None 表示任务已删除
+        """
+        if job is None:
+            self._last_state.pop(job_id, None)
+            self._finished.pop(job_id, None)
+            delta = {'deleted': True}
+        else:
+            finished_at = self._finished.get(job_id)
+            if finished_at is not None and (not job.get('updated_at') or job['updated_at'] <= finished_at):
+                # 结束状态已推送过（本进程发布后轮询又读到同一行）
+                return
+            last = self._last_state.get(job_id, {})
+            if job.get('updated_at') and last.get('updated_at') and job['updated_at'] < last['updated_at']:
+                # 轮询读到的状态可能比本进程刚发布的状态旧
+                return
+            delta = {key: value for key, value in job.items() if last.get(key, _MISSING) != value}
+            if job.get('status') in TERMINAL_STATUSES:
+                # 任务已结束，不再需要增量基准，只记住结束时间
+                self._last_state.pop(job_id, None)
+                self._finished[job_id] = job.get('updated_at') or ''
+                self._finished.move_to_end(job_id)
+                while len(self._finished) > FINISHED_JOBS_REMEMBERED:
+                    self._finished.popitem(last=False)
+            else:
+                self._last_state[job_id] = dict(job)
+        if not delta:
+            return
+        self.published += 1
+        for subscriber in list(self.subscribers.values()):
+            if subscriber.wants(job_id):
+                subscriber.queue_delta(job_id, delta)
+
+    def send_event(self, job_id: str, message: Dict[str, Any]):
+        """
+        向明确订阅了该任务的连接推送一条事件（如刚转录完成的字幕片段），不做合并；
+        订阅全部任务（``*``）的连接不接收
+
+        Args:
+            job_id: 任务ID
+            message: JSON消息
+        """
+        for subscriber in list(self.subscribers.values()):
+            if job_id in subscriber.topics:
+                subscriber.queue_control(message)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回连接数、发布次数和被合并（未单独发送）的帧数"""
+        return {
+            'connections': len(self.subscribers),
+            'published': self.published,
+            'sent': sum(subscriber.sent for subscriber in self.subscribers.values()),
+            'coalesced': sum(subscriber.coalesced for subscriber in self.subscribers.values()),
+        }
+
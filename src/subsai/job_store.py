@@ -0,0 +1,466 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+任务存储与队列
+Durable Job Store and Queue for the Batch Service
+
+Jobs live in a SQLite database in WAL mode, so they survive restarts and can be
+shared by several uvicorn workers on one host. Workers take jobs with an atomic
+claim and keep them alive with a heartbeat. A job whose worker stopped
+heartbeating is claimed again and resumes with the files that were not yet
+finished. Finished jobs are pruned after a TTL.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from subsai.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+# 任务的公开字段（REST接口和WebSocket返回的内容）
+PUBLIC_FIELDS = ['job_id', 'status', 'progress', 'current_file', 'total_files', 'processed_files',
+                 'failed_files', 'transcript_cache_hits', 'render_cache_hits', 'output_files', 'error',
+                 'estimated_finish_at', 'created_at', 'updated_at']
+# 列表接口只返回摘要，不包含输出文件列表
+SUMMARY_FIELDS = [field for field in PUBLIC_FIELDS if field != 'output_files'] + ['output_count']
+# 推送给WebSocket的任务状态：本进程发布和轮询发布必须是同一组字段，否则增量在两者之间来回变化
+EVENT_FIELDS = PUBLIC_FIELDS + ['output_count']
+# 以JSON文本保存的字段
+JSON_FIELDS = {'output_files', 'video_files', 'config', 'done_files', 'media_durations'}
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+# 列名 -> 列定义；新增列在打开旧数据库时自动补上
+COLUMNS = {
+    'job_id': 'TEXT PRIMARY KEY',
+    'status': "TEXT NOT NULL DEFAULT 'pending'",
+    'progress': 'INTEGER NOT NULL DEFAULT 0',
+    'current_file': 'TEXT',
+    'total_files': 'INTEGER NOT NULL DEFAULT 0',
+    'processed_files': 'INTEGER NOT NULL DEFAULT 0',
+    'failed_files': 'INTEGER NOT NULL DEFAULT 0',
+    'transcript_cache_hits': 'INTEGER NOT NULL DEFAULT 0',  # 复用缓存字幕的文件数
+    'render_cache_hits': 'INTEGER NOT NULL DEFAULT 0',  # 直接复用缓存成品的文件数
+    'output_files': "TEXT NOT NULL DEFAULT '[]'",
+    'output_count': 'INTEGER NOT NULL DEFAULT 0',
+    'error': 'TEXT',
+    'created_at': 'TEXT NOT NULL',
+    'updated_at': 'TEXT NOT NULL',
+    # 内部字段
+    'video_files': "TEXT NOT NULL DEFAULT '[]'",
+    'config': "TEXT NOT NULL DEFAULT '{}'",
+    'done_files': "TEXT NOT NULL DEFAULT '[]'",  # 已处理完的文件序号（断点续跑，文件可能乱序完成）
+    'attempts': 'INTEGER NOT NULL DEFAULT 0',
+    'worker_id': 'TEXT',
+    'heartbeat_at': 'REAL',
+    'finished_at': 'REAL',
+    # 调度与准入控制
+    'client_id': 'TEXT',  # 提交任务的客户端（公平份额）
+    'priority': 'INTEGER NOT NULL DEFAULT 1',  # 优先级排序值，越小越先执行
+    'media_durations': "TEXT NOT NULL DEFAULT '[]'",  # 各文件的媒体时长（秒），提交时探测
+    'estimated_asr_s': 'REAL NOT NULL DEFAULT 0',  # 预计占用的转录槽秒数
+    'estimated_encode_s': 'REAL NOT NULL DEFAULT 0',  # 预计占用的编码槽秒数
+    'estimated_finish_at': 'TEXT',  # 提交时估计的完成时间
+}
+# 准入控制需要的字段
+QUEUE_FIELDS = ['job_id', 'status', 'priority', 'client_id', 'progress', 'estimated_asr_s', 'estimated_encode_s',
+                'created_at']
+
+
+class JobStore:
+    """
+    基于SQLite（WAL）的任务存储和队列
+
+    每个线程使用独立的连接；领取任务在 ``BEGIN IMMEDIATE`` 事务中完成，
+    多个进程同时领取时同一任务只会被一个进程拿到。
+    """
+
+    def __init__(self, db_path: Union[str, Path], lease_seconds: float = 60.0, max_attempts: int = 3):
+        """
+        初始化任务存储
+
+        Args:
+            db_path: 数据库文件路径
+            lease_seconds: 心跳超时（秒），超时后任务可被其他进程重新领取
+            max_attempts: 任务最多被领取的次数，超过后标记为失败（避免反复崩溃的任务无限重试）
+        """
+        self.db_path = Path(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None：自动提交，需要事务时显式 BEGIN
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        columns = ', '.join(f"{name} {definition}" for name, definition in COLUMNS.items())
+        conn.execute(f"CREATE TABLE IF NOT EXISTS jobs ({columns})")
+        existing = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+        for name, definition in COLUMNS.items():
+            if name not in existing:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs(updated_at)')
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        job = {}
+        for field in fields or row.keys():
+            value = row[field]
+            job[field] = json.loads(value) if field in JSON_FIELDS and value is not None else value
+        return job
+
+    def create(self, job_id: str, video_files: List[str], config: Dict[str, Any], status: str = 'pending',
+               **fields) -> Dict[str, Any]:
+        """
+        创建任务
+
+        Args:
+            job_id: 任务ID
+            video_files: 视频文件路径列表
+            config: 处理配置（可JSON序列化）
+            status: 初始状态（pending，或准入控制延后的 deferred）
+            fields: 其他字段（客户端、优先级、成本估计等）
+
+        Returns:
+            任务的公开字段
+        """
+        unknown = set(fields) - set(COLUMNS)
+        if unknown:
+            raise KeyError(f"Unknown job fields: {sorted(unknown)}")
+        now = datetime.now().isoformat()
+        fields.update(job_id=job_id, status=status, total_files=len(video_files), created_at=now, updated_at=now,
+                      video_files=[str(path) for path in video_files], config=config)
+        values = [json.dumps(value, ensure_ascii=False, default=str) if name in JSON_FIELDS else value
+                  for name, value in fields.items()]
+        self._connection().execute(
+            f"INSERT INTO jobs ({', '.join(fields)}) VALUES ({', '.join('?' for _ in fields)})", values)
+        return self.get(job_id)
+
+    def get(self, job_id: str, internal: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        读取任务
+
+        Args:
+            job_id: 任务ID
+            internal: 是否包含内部字段（配置、文件列表、续跑位置等）
+
+        Returns:
+            任务字典，不存在时返回None
+        """
+        row = self._connection().execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        return self._row_to_dict(row, None if internal else PUBLIC_FIELDS)
+
+    def get_event_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取推送给WebSocket的任务状态（EVENT_FIELDS，与 :meth:`list_updated_since` 相同）
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            任务状态，不存在时返回None
+        """
+        row = self._connection().execute(f"SELECT {', '.join(EVENT_FIELDS)} FROM jobs WHERE job_id = ?",
+                                         (job_id,)).fetchone()
+        return None if row is None else self._row_to_dict(row)
+
+    def update(self, job_id: str, **fields) -> bool:
+        """
+        更新任务字段（同时刷新updated_at；进入终止状态时记录完成时间）
+
+        Args:
+            job_id: 任务ID
+            fields: 要更新的字段
+
+        Returns:
+            任务是否存在
+        """
+        return self._update_where(job_id, '', (), fields)
+
+    def finish(self, job_id: str, worker_id: str, status: str, **fields) -> bool:
+        """
+        由执行任务的worker写入结束状态（completed/failed/cancelled）
+
+        只有任务仍是 processing 且由该worker持有时才写入：已被取消、删除或
+        在租约过期后被其他worker接管的任务保持原状态。
+
+        Args:
+            job_id: 任务ID
+            worker_id: 领取者ID
+            status: 结束状态
+            fields: 同时更新的其他字段
+
+        Returns:
+            是否写入（False 表示该worker已不再持有任务）
+        """
+        return self._update_where(job_id, "AND status = 'processing' AND worker_id = ?", (worker_id,),
+                                  dict(fields, status=status))
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消尚未结束的任务（与 :meth:`finish` 互斥：两者只有一个能生效）
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            是否取消（任务不存在或已结束时为False）
+        """
+        placeholders = ', '.join('?' for _ in TERMINAL_STATUSES)
+        return self._update_where(job_id, f"AND status NOT IN ({placeholders})", TERMINAL_STATUSES,
+                                  {'status': 'cancelled', 'current_file': None})
+
+    def _update_where(self, job_id: str, condition: str, condition_params: Iterable[Any],
+                      fields: Dict[str, Any]) -> bool:
+        unknown = set(fields) - set(COLUMNS)
+        if unknown:
+            raise KeyError(f"Unknown job fields: {sorted(unknown)}")
+        fields['updated_at'] = datetime.now().isoformat()
+        if 'output_files' in fields:
+            fields['output_count'] = len(fields['output_files'])
+        if fields.get('status') in TERMINAL_STATUSES:
+            fields['finished_at'] = time.time()
+        values = [json.dumps(value, ensure_ascii=False, default=str) if name in JSON_FIELDS else value
+                  for name, value in fields.items()]
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        cursor = self._connection().execute(f"UPDATE jobs SET {assignments} WHERE job_id = ? {condition}",
+                                            (*values, job_id, *condition_params))
+        return cursor.rowcount > 0
+
+    def increment(self, job_id: str, **deltas: int) -> bool:
+        """
+        原子地累加计数字段（如 processed_files=1）
+
+        Args:
+            job_id: 任务ID
+            deltas: 字段 -> 增量
+
+        Returns:
+            任务是否存在
+        """
+        unknown = set(deltas) - set(COLUMNS)
+        if unknown:
+            raise KeyError(f"Unknown job fields: {sorted(unknown)}")
+        assignments = ', '.join(f"{name} = {name} + ?" for name in deltas)
+        cursor = self._connection().execute(
+            f"UPDATE jobs SET {assignments}, updated_at = ? WHERE job_id = ?",
+            (*deltas.values(), datetime.now().isoformat(), job_id))
+        return cursor.rowcount > 0
+
+    def delete(self, job_id: str) -> bool:
+        """删除任务记录，返回任务是否存在"""
+        cursor = self._connection().execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+        return cursor.rowcount > 0
+
+    def list_jobs(self, limit: int = 50, offset: int = 0, status: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        分页列出任务摘要（按创建时间倒序，不包含输出文件列表）
+
+        Args:
+            limit: 每页数量
+            offset: 偏移量
+            status: 只列出该状态的任务（可选）
+
+        Returns:
+            (任务摘要列表, 符合条件的任务总数)
+        """
+        where, params = ('WHERE status = ?', (status,)) if status else ('', ())
+        conn = self._connection()
+        total = conn.execute(f"SELECT COUNT(*) FROM jobs {where}", params).fetchone()[0]
+        rows = conn.execute(f"SELECT {', '.join(SUMMARY_FIELDS)} FROM jobs {where} "
+                            f"ORDER BY created_at DESC LIMIT ? OFFSET ?", (*params, limit, offset)).fetchall()
+        return [self._row_to_dict(row) for row in rows], total
+
+    def list_updated_since(self, since: str, job_ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        列出 updated_at 晚于 since 的任务（各进程的事件中心据此获取其他worker写入的变化）
+
+        Args:
+            since: ISO时间（上次查询到的最大 updated_at）
+            job_ids: 只列出这些任务，None 表示全部任务
+
+        Returns:
+            任务状态列表（EVENT_FIELDS，与 :meth:`get_event_state` 相同），按 updated_at 排序
+        """
+        where, params = 'updated_at > ?', [since]
+        if job_ids is not None:
+            job_ids = list(job_ids)
+            if not job_ids:
+                return []
+            where += f" AND job_id IN ({', '.join('?' for _ in job_ids)})"
+            params.extend(job_ids)
+        rows = self._connection().execute(
+            f"SELECT {', '.join(EVENT_FIELDS)} FROM jobs WHERE {where} ORDER BY updated_at",
+            params)
+        return [self._row_to_dict(row) for row in rows]
+
+    def list_queued(self, statuses=('pending', 'processing', 'deferred')) -> List[Dict[str, Any]]:
+        """
+        列出未结束任务的调度字段（准入控制估算积压用）
+
+        Args:
+            statuses: 要列出的状态
+
+        Returns:
+            任务列表（QUEUE_FIELDS），按优先级和创建时间排序
+        """
+        placeholders = ', '.join('?' for _ in statuses)
+        rows = self._connection().execute(
+            f"SELECT {', '.join(QUEUE_FIELDS)} FROM jobs WHERE status IN ({placeholders}) "
+            f"ORDER BY priority, created_at", tuple(statuses))
+        return [self._row_to_dict(row) for row in rows]
+
+    def count_by_status(self) -> Dict[str, int]:
+        """返回各状态的任务数量"""
+        rows = self._connection().execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status')
+        return {row['status']: row['n'] for row in rows}
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        原子地领取下一个任务
+
+        心跳已超时的处理中任务（断点续跑）最先；其余待处理任务按优先级排序，
+        同一优先级中正在处理的任务最少的客户端优先（公平份额），最后按创建时间。
+
+        Args:
+            worker_id: 领取者ID
+
+        Returns:
+            任务（包含内部字段），没有可领取的任务时返回None
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT job_id, attempts FROM jobs "
+                "WHERE status = 'pending' OR (status = 'processing' AND (heartbeat_at IS NULL OR heartbeat_at < ?)) "
+                "ORDER BY status = 'pending', priority, "
+                "(SELECT COUNT(*) FROM jobs AS running "
+                " WHERE running.status = 'processing' AND running.client_id IS jobs.client_id), "
+                "created_at LIMIT 1", (now - self.lease_seconds,)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            if row['attempts'] >= self.max_attempts:
+                conn.execute("UPDATE jobs SET status = 'failed', error = ?, worker_id = NULL, finished_at = ?, "
+                             "updated_at = ? WHERE job_id = ?",
+                             (f"任务被中断 {row['attempts']} 次，已放弃", now, datetime.now().isoformat(),
+                              row['job_id']))
+                conn.execute('COMMIT')
+                logger.warning(f"⚠️  任务 {row['job_id']} 重试次数过多，标记为失败")
+                return self.claim(worker_id)
+            conn.execute("UPDATE jobs SET status = 'processing', worker_id = ?, heartbeat_at = ?, "
+                         "attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                         (worker_id, now, datetime.now().isoformat(), row['job_id']))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return self.get(row['job_id'], internal=True)
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """
+        刷新任务心跳
+
+        Args:
+            job_id: 任务ID
+            worker_id: 领取者ID
+
+        Returns:
+            是否仍持有该任务（任务被删除或被其他进程接管时为False）
+        """
+        cursor = self._connection().execute(
+            "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND worker_id = ? AND status = 'processing'",
+            (time.time(), job_id, worker_id))
+        return cursor.rowcount > 0
+
+    def prune(self, ttl_seconds: float) -> List[str]:
+        """
+        删除完成时间早于TTL的已结束任务
+
+        Args:
+            ttl_seconds: 已结束任务的保留时间（秒）
+
+        Returns:
+            被删除的任务ID列表（调用方负责清理输出文件）
+        """
+        conn = self._connection()
+        cutoff = time.time() - ttl_seconds
+        placeholders = ', '.join('?' for _ in TERMINAL_STATUSES)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            job_ids = [row['job_id'] for row in conn.execute(
+                f"SELECT job_id FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+                (*TERMINAL_STATUSES, cutoff))]
+            conn.executemany('DELETE FROM jobs WHERE job_id = ?', [(job_id,) for job_id in job_ids])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return job_ids
+
+
+class JobHeartbeat:
+    """
+    在后台线程中定期刷新任务心跳（不依赖事件循环，转录阻塞时心跳也不会中断）
+
+    心跳没有更新到任务（租约过期后被其他worker接管、被取消或删除）时触发取消标记，
+    本worker停止处理，避免两个worker同时处理同一任务。
+
+    用法::
+
+        with JobHeartbeat(store, job_id, worker_id, cancel_token):
+            ...
+    """
+
+    def __init__(self, store: JobStore, job_id: str, worker_id: str,
+                 cancel_token: Optional[CancellationToken] = None, interval: Optional[float] = None):
+        self.store = store
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.cancel_token = cancel_token
+        self.interval = interval if interval is not None else store.lease_seconds / 3
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{job_id[:8]}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.store.heartbeat(self.job_id, self.worker_id):
+                    if self.cancel_token is not None and not self._stop.is_set():
+                        logger.warning(f"⚠️  任务 {self.job_id} 已不属于本worker，停止处理")
+                        self.cancel_token.cancel('lease_lost')
+                    return
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️  任务心跳失败 {self.job_id}: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
@@ -8,6 +8,7 @@ Karaoke Batch Video Processor
 This module provides batch processing capabilities for generating karaoke videos.
 """
 
+import io
 import os
 import json
 import logging
@@ -17,8 +18,10 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
 from subsai import SubsAI, Tools
+from subsai.alignment import get_forced_aligner
 from subsai.karaoke_generator import KaraokeGenerator
 from subsai.karaoke_styles import get_all_styles
+from subsai.word_timings import attach_word_timings, get_word_timings
 
 __author__ = "Claude Code Assistant"
 __copyright__ = "Copyright 2025"
@@ -47,7 +50,8 @@ class KaraokeBatchProcessor:
                  model_config: Optional[Dict[str, Any]] = None,
                  style_name: str = "classic",
                  words_per_line: int = 10,
-                 max_workers: int = 1):
+                 max_workers: int = 1,
+                 word_alignment: bool = False):
         """
         初始化批量处理器
 
@@ -57,12 +61,14 @@ class KaraokeBatchProcessor:
             style_name: 卡拉OK样式名称
             words_per_line: 每行单词数
             max_workers: 最大并行处理数（建议设为1，避免显存不足）
+            word_alignment: 对没有词级时间戳的转录结果做强制对齐（可配合whisper.cpp等更快的句子级后端使用）
         """
         self.model_name = model_name
         self.model_config = model_config or self._get_default_config()
         self.style_name = style_name
         self.words_per_line = words_per_line
         self.max_workers = max_workers
+        self.word_alignment = word_alignment
 
         self.subs_ai = SubsAI()
         self.tools = Tools()
@@ -168,6 +174,10 @@ class KaraokeBatchProcessor:
             if not subs or len(subs) == 0:
                 raise Exception("转录失败，未生成字幕")
 
+            if self.word_alignment and get_word_timings(subs) is None:
+                logger.info(f"  强制对齐词级时间戳...")
+                attach_word_timings(subs, get_forced_aligner().align(str(video_path), subs))
+
             logger.info(f"  转录完成，生成 {len(subs)} 个字幕事件")
 
             # 2. 转换为卡拉OK格式
@@ -179,19 +189,21 @@ class KaraokeBatchProcessor:
                 style_name=self.style_name,
                 words_per_line=self.words_per_line
             )
-            karaoke_subs = generator.generate(subs)
+            # 直接写出ASS文本，不创建pysubs2事件对象
+            karaoke_ass = io.StringIO()
+            event_count = generator.write_ass(subs, karaoke_ass)
 
-            if not karaoke_subs or len(karaoke_subs) == 0:
+            if event_count == 0:
                 raise Exception("卡拉OK字幕生成失败")
 
-            logger.info(f"  生成 {len(karaoke_subs)} 个卡拉OK字幕事件")
+            logger.info(f"  生成 {event_count} 个卡拉OK字幕事件")
 
             # 3. 保存ASS字幕文件
             output_path = Path(output_dir)
             output_path.mkdir(parents=True, exist_ok=True)
 
             ass_file = output_path / f"{video_path.stem}_karaoke.ass"
-            karaoke_subs.save(str(ass_file))
+            ass_file.write_text(karaoke_ass.getvalue(), encoding='utf-8')
             logger.info(f"  ASS字幕保存至: {ass_file}")
 
             # 4. 烧录字幕到视频（使用专用卡拉OK烧录方法）
@@ -202,7 +214,7 @@ class KaraokeBatchProcessor:
             output_video = str(output_path / f"{video_path.stem}_karaoke{video_path.suffix}")
 
             merged_video = self.tools.burn_karaoke_subtitles(
-                subs=karaoke_subs,
+                subs=karaoke_ass.getvalue(),
                 media_file=str(video_path),
                 output_filename=output_video.replace(video_path.suffix, '')
             )
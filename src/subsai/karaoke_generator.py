@@ -9,22 +9,47 @@ This module converts word-level transcription results into ASS format with karao
 """
 
 import re
-from typing import List, Dict, Any, Optional
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Iterator, Optional, TextIO, Tuple, Union
+import numpy as np
 from pysubs2 import SSAFile, SSAEvent
+from pysubs2.substation import SubstationFormat
 from subsai.karaoke_styles import KaraokeStyle, get_style, STYLE_NAMES
+from subsai.text_metrics import get_width_provider
+from subsai.word_timings import WORD_TIMINGS_ATTR, WordTimings, get_word_timings, subs_signature
 
 __author__ = "Claude Code Assistant"
 __copyright__ = "Copyright 2025"
 __license__ = "GPLv3"
 
 
+class _WrapLayout:
+    """自动换行布局：单词宽度、空格宽度和每行的换行位置（按对象身份比较，用作缓存键）"""
+
+    __slots__ = ('widths', 'space_width', 'breaks')
+
+    def __init__(self, widths: np.ndarray, space_width: float, breaks: Optional[List[List[int]]]):
+        self.widths = widths
+        self.space_width = space_width
+        self.breaks = breaks
+
+
 class KaraokeGenerator:
     """
     卡拉OK字幕生成器
 
     将词级时间戳转换为带\\k标签的ASS格式卡拉OK字幕
+
+    生成过程分为几个阶段（提取词级时间戳、分行、\\k标签、换行位置），每个阶段的结果按其
+    依赖的参数缓存。通过 :meth:`update` 修改参数后再次生成时，只重新计算受影响的阶段。
     """
 
+    # 只影响ASS样式的参数
+    STYLE_PARAMS = ('style_name', 'fontsize', 'vertical_margin', 'fontname', 'primary_color', 'secondary_color')
+    # 影响分行和换行的参数
+    LAYOUT_PARAMS = ('words_per_line', 'max_line_duration_ms', 'max_line_width_px', 'use_font_metrics',
+                     'break_on_segments')
+
     def __init__(self,
                  style_name: str = "classic",
                  words_per_line: int = 10,
@@ -34,7 +59,9 @@ class KaraokeGenerator:
                  fontname: Optional[str] = None,
                  primary_color: Optional[str] = None,
                  secondary_color: Optional[str] = None,
-                 max_line_width_px: Optional[int] = None):
+                 max_line_width_px: Optional[int] = None,
+                 use_font_metrics: bool = False,
+                 break_on_segments: bool = False):
         """
         初始化卡拉OK生成器
 
@@ -48,9 +75,11 @@ class KaraokeGenerator:
             primary_color: 自定义基础颜色 Hex格式如"#FFFFFF"（可选）
             secondary_color: 自定义高亮颜色 Hex格式如"#FFD700"（可选）
             max_line_width_px: 单行最大宽度（像素），用于自动换行（可选，None则不限制）
+            use_font_metrics: 自动换行时按字体文件中的真实字形宽度计算（需要fontTools），否则按字符类别估算
+            break_on_segments: 在词级时间戳的片段边界处强制换行（歌词模式下片段即歌词行，卡拉OK行不跨歌词行）
         """
-        self.style: KaraokeStyle = get_style(
-            style_name,
+        self._style_params = dict(
+            style_name=style_name,
             fontsize=fontsize,
             vertical_margin=vertical_margin,
             fontname=fontname,
@@ -60,86 +89,135 @@ class KaraokeGenerator:
         self.words_per_line = max(1, min(20, words_per_line))
         self.max_line_duration_ms = max_line_duration_ms
         self.max_line_width_px = max_line_width_px
-
-    def _extract_word_timings(self, subs: SSAFile) -> List[Dict[str, Any]]:
+        self.use_font_metrics = use_font_metrics
+        self.break_on_segments = break_on_segments
+        # 各阶段的中间结果 {阶段: (键, 结果)}
+        self._stage_cache: Dict[str, Tuple[Any, Any]] = {}
+        self._build_style()
+
+    def _build_style(self):
+        """根据样式参数创建样式和宽度提供者"""
+        params = dict(self._style_params)
+        self.style: KaraokeStyle = get_style(params.pop('style_name'), **params)
+        # 同一(字体, 字号)共享宽度提供者，单词宽度缓存跨渲染复用
+        self._width_provider = get_width_provider(self.style.get_fontname(), self.style.get_fontsize(),
+                                                  self.use_font_metrics)
+
+    def update(self, **params) -> 'KaraokeGenerator':
         """
-        从SSAFile中提取词级时间戳信息
+        修改生成参数，保留仍然有效的中间结果
+
+        只修改样式、颜色或边距时，下次生成只替换样式和\\k标签；修改 words_per_line 或
+        max_line_duration_ms 时重新分行；修改字体、字号或 max_line_width_px 时只重新计算换行位置。
 
         Args:
-            subs: pysubs2 SSAFile对象（来自whisper-timestamped）
+            **params: 与构造函数相同的参数
 
         Returns:
-            词级时间戳列表: [{"word": str, "start": int, "end": int}, ...]
+            self
         """
-        words = []
-
-        for event in subs:
-            # whisper-timestamped生成的字幕通常每行一句话
-            # 我们需要分割成单词
-            text = event.text.strip()
-            if not text:
-                continue
+        unknown = set(params).difference(self.STYLE_PARAMS, self.LAYOUT_PARAMS)
+        if unknown:
+            raise TypeError(f"Unknown KaraokeGenerator parameters: {', '.join(sorted(unknown))}")
+
+        style_params = {key: value for key, value in params.items() if key in self.STYLE_PARAMS}
+        if style_params or 'use_font_metrics' in params:
+            self._style_params.update(style_params)
+            self.use_font_metrics = params.get('use_font_metrics', self.use_font_metrics)
+            self._build_style()
+        if 'words_per_line' in params:
+            self.words_per_line = max(1, min(20, params['words_per_line']))
+        if 'max_line_duration_ms' in params:
+            self.max_line_duration_ms = params['max_line_duration_ms']
+        if 'max_line_width_px' in params:
+            self.max_line_width_px = params['max_line_width_px']
+        if 'break_on_segments' in params:
+            self.break_on_segments = params['break_on_segments']
+        return self
+
+    def _cached(self, stage: str, key: tuple, compute: Callable[[], Any]) -> Any:
+        """
+        返回某个阶段的缓存结果，键变化时重新计算（每个阶段只保留最近一次结果）
 
-            # 简单按空格分割单词（后续可优化为更智能的分词）
-            word_list = text.split()
-            if not word_list:
-                continue
+        Args:
+            stage: 阶段名称
+            key: 该阶段依赖的输入和参数（对象按身份比较）
+            compute: 计算函数
 
-            # 计算每个单词的时长（均分）
-            total_duration = event.end - event.start
-            word_duration = total_duration / len(word_list)
+        Returns:
+            该阶段的结果
+        """
+        entry = self._stage_cache.get(stage)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        value = compute()
+        self._stage_cache[stage] = (key, value)
+        return value
+
+    def _extract_word_timings(self, subs: SSAFile) -> WordTimings:
+        """
+        从SSAFile中提取词级时间戳信息
 
-            for i, word in enumerate(word_list):
-                word_start = event.start + int(i * word_duration)
-                word_end = event.start + int((i + 1) * word_duration)
+        后端挂载了词级时间戳（见 :func:`subsai.word_timings.attach_word_timings`）时直接使用，
+        否则按空格分词并在事件时长内均分。
 
-                words.append({
-                    "word": word,
-                    "start": word_start,
-                    "end": word_end
-                })
+        Args:
+            subs: pysubs2 SSAFile对象（来自whisper-timestamped）
 
-        return words
+        Returns:
+            WordTimings对象
+        """
+        timings = get_word_timings(subs)
+        if timings is not None:
+            return timings
+        return WordTimings.from_ssafile(subs)
 
-    def _group_words_by_lines(self, words: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    def _group_words_by_lines(self, words: WordTimings) -> List[Tuple[int, int]]:
         """
         将单词按行分组
 
+        对每个单词用NumPy一次性算出"以它开头的行在哪里结束"（单词数上限、时长上限，
+        以及 break_on_segments 时的片段边界），然后沿着行首链式跳转，Python循环只按行数执行。
+
         Args:
-            words: 词级时间戳列表
+            words: 词级时间戳
 
         Returns:
-            分组后的单词列表（每个元素是一行的单词列表）
+            每行单词的索引范围 [(起始索引, 结束索引), ...]（左闭右开）
         """
-        if not words:
+        count = len(words)
+        if not count:
             return []
 
-        lines = []
-        current_line = []
-        current_line_start = words[0]["start"]
+        if self.words_per_line == 1:
+            return [(i, i + 1) for i in range(count)]
 
-        for word in words:
-            # 检查是否需要换行
-            should_break = False
+        positions = np.arange(count)
+        starts = np.asarray(words.starts, dtype=np.int64)
+        ends = np.asarray(words.ends, dtype=np.int64)
+        window = self.words_per_line - 1
 
-            # 条件1: 当前行单词数达到上限
-            if len(current_line) >= self.words_per_line:
-                should_break = True
+        # 行首之后最多 words_per_line-1 个候选单词，超出末尾的位置用极小值填充
+        padded_ends = np.concatenate([ends[1:], np.full(window, np.iinfo(np.int64).min // 2)])
+        candidates = np.lib.stride_tricks.sliding_window_view(padded_ends, window)[:count]
 
-            # 条件2: 当前行持续时间超过上限
-            if current_line and (word["end"] - current_line_start) > self.max_line_duration_ms:
-                should_break = True
+        # 条件2: 行持续时间超过上限；条件1: 单词数达到上限
+        too_long = candidates > (starts + self.max_line_duration_ms)[:, None]
+        offsets = np.where(too_long.any(axis=1), too_long.argmax(axis=1) + 1, self.words_per_line)
+        next_begin = np.minimum(positions + offsets, count)
 
-            if should_break and current_line:
-                lines.append(current_line)
-                current_line = [word]
-                current_line_start = word["start"]
-            else:
-                current_line.append(word)
+        # 条件3: 行不跨越片段边界（下一个片段的第一个单词）
+        if self.break_on_segments:
+            segments = np.asarray(words.segments, dtype=np.int64)
+            boundaries = np.append(np.flatnonzero(segments[1:] != segments[:-1]) + 1, count)
+            next_begin = np.minimum(next_begin, boundaries[np.searchsorted(boundaries, positions, side='right')])
+        next_begin = next_begin.tolist()
 
-        # 添加最后一行
-        if current_line:
-            lines.append(current_line)
+        lines = []
+        begin = 0
+        while begin < count:
+            lines.append((begin, next_begin[begin]))
+            begin = next_begin[begin]
 
         return lines
 
@@ -153,69 +231,106 @@ class KaraokeGenerator:
         Returns:
             估算的宽度（像素）
         """
-        fontsize = self.style.get_fontsize()
-        width = 0.0
-
-        for char in text:
-            if '\u4e00' <= char <= '\u9fff':  # 中文字符
-                width += fontsize * 1.0
-            elif char == ' ':  # 空格
-                width += fontsize * 0.3
-            else:  # 英文和其他字符
-                width += fontsize * 0.6
+        return self._width_provider.text_width(text)
 
-        return width
-
-    def _create_karaoke_tags(self, words: List[Dict[str, Any]]) -> str:
+    def _word_widths(self, tokens: List[str]) -> np.ndarray:
         """
-        为一行单词创建卡拉OK标签（支持自动换行）
+        计算每个单词的宽度（宽度提供者带LRU缓存，相同的单词只计算一次）
 
         Args:
-            words: 单词列表（带时间戳）
+            tokens: 单词列表
 
         Returns:
-            带\\k标签的ASS格式文本（可能包含\\N换行符）
+            宽度数组（像素）
         """
-        if not words:
-            return ""
-
-        # 如果启用了自动换行，使用智能换行逻辑
-        if self.max_line_width_px and self.max_line_width_px > 0:
-            return self._create_karaoke_tags_with_wrap(words)
+        return np.fromiter(map(self._width_provider.text_width, tokens), dtype=np.float64, count=len(tokens))
 
-        # 原有逻辑：不换行
-        result = []
+    def _karaoke_pieces(self, words: WordTimings) -> List[str]:
+        """
+        为每个单词生成"\\k标签+单词"片段（相同时长的标签只生成一次）
 
-        for i, word in enumerate(words):
-            # 计算持续时间（厘秒，1秒=100厘秒）
-            duration_ms = word["end"] - word["start"]
-            duration_cs = max(1, duration_ms // 10)  # 至少1厘秒
+        Args:
+            words: 词级时间戳
 
-            # 生成\\k标签
-            karaoke_tag = self.style.get_karaoke_tags(duration_cs)
+        Returns:
+            片段列表，与单词一一对应
+        """
+        # 计算持续时间（厘秒，1秒=100厘秒），至少1厘秒
+        durations_cs = np.maximum(1, (np.asarray(words.ends, dtype=np.int64)
+                                      - np.asarray(words.starts, dtype=np.int64)) // 10)
+        unique_durations, tag_index = np.unique(durations_cs, return_inverse=True)
+        tags = [self.style.get_karaoke_tags(duration_cs) for duration_cs in unique_durations.tolist()]
+        return [tags[i] + token for i, token in zip(tag_index.tolist(), words.tokens)]
+
+    def _find_wrap_breaks(self,
+                          widths: np.ndarray,
+                          space_width: float,
+                          max_width: float,
+                          lines: List[Tuple[int, int]]) -> List[List[int]]:
+        """
+        计算每行需要换行（插入\\N）的单词位置
 
-            # 添加单词
-            result.append(f"{karaoke_tag}{word['word']}")
+        对所有行同时按 [单词, 空格, 单词, 空格, ...] 的顺序做累加（np.cumsum按行顺序累加，
+        与逐词累加的浮点结果完全一致），找到第一个超宽的单词；有换行的行从该单词重新累加，
+        循环次数等于一行中最多的换行次数。
 
-            # 在单词之间添加空格（最后一个单词除外）
-            if i < len(words) - 1:
-                result.append(" ")
+        Args:
+            widths: 每个单词的宽度
+            space_width: 空格宽度
+            max_width: 允许的最大行宽
+            lines: 每行单词的索引范围
 
-        return "".join(result)
+        Returns:
+            每行的换行位置列表（换行后第一个单词的索引）
+        """
+        line_bounds = np.array(lines, dtype=np.int64).reshape(-1, 2)
+        line_ends = line_bounds[:, 1]
+        sub_begins = line_bounds[:, 0].copy()
+        span = int((line_ends - sub_begins).max())
+        offsets = np.arange(span)
+
+        breaks = [[] for _ in lines]
+        rows = np.arange(len(lines))
+        while len(rows):
+            index = sub_begins[rows][:, None] + offsets
+            valid = index < line_ends[rows][:, None]
+            sequence = np.zeros((len(rows), 2 * span - 1))
+            sequence[:, 0::2] = np.where(valid, widths[np.minimum(index, len(widths) - 1)], 0.0)
+            sequence[:, 1::2] = np.where(valid[:, 1:], space_width, 0.0)
+            running = np.cumsum(sequence, axis=1)[:, 0::2]
 
-    def _create_karaoke_tags_with_wrap(self, words: List[Dict[str, Any]]) -> str:
+            # 检查是否需要换行（不是第一个单词，且加上新单词会超宽）
+            exceeds = (running > max_width) & valid
+            exceeds[:, 0] = False
+            has_break = exceeds.any(axis=1)
+            rows = rows[has_break]
+            sub_begins[rows] += exceeds[has_break].argmax(axis=1)
+            for row, break_index in zip(rows.tolist(), sub_begins[rows].tolist()):
+                breaks[row].append(break_index)
+
+        return breaks
+
+    def _create_karaoke_tags_with_wrap(self,
+                                       pieces: List[str],
+                                       widths: np.ndarray,
+                                       space_width: float,
+                                       begin: int,
+                                       end: int) -> str:
         """
-        为一行单词创建卡拉OK标签（带自动换行和居中对齐）
+        为一行单词创建卡拉OK标签（带自动换行和居中对齐），逐词计算
+
+        仅在存在零宽度单词时使用（此时换行后是否补空格取决于累计宽度，无法按行拼接）。
 
         Args:
-            words: 单词列表（带时间戳）
+            pieces: 每个单词的"\\k标签+单词"片段
+            widths: 每个单词的宽度
+            space_width: 空格宽度
+            begin: 本行第一个单词的索引
+            end: 本行最后一个单词之后的索引
 
         Returns:
             带\\k标签和\\N换行符的ASS格式文本，居中对齐
         """
-        if not words:
-            return ""
-
         # 添加底部居中对齐标签（左右居中，上下保持用户自定义距离）
         result = ["{\\an2}"]  # \an2 = 底部居中（水平居中，垂直位置保持距底部的距离）
 
@@ -223,38 +338,97 @@ class KaraokeGenerator:
         # 保留20%的边距（左右各10%）
         max_width = self.max_line_width_px * 0.8
 
-        for i, word in enumerate(words):
-            # 计算持续时间（厘秒，1秒=100厘秒）
-            duration_ms = word["end"] - word["start"]
-            duration_cs = max(1, duration_ms // 10)
-
-            # 生成\\k标签
-            karaoke_tag = self.style.get_karaoke_tags(duration_cs)
-
-            # 计算单词宽度（包括前面的空格）
-            word_text = word['word']
-            word_width = self._estimate_text_width(word_text)
-
+        for i in range(begin, end):
+            word_width = widths[i]
             # 如果不是第一个单词，需要加上空格的宽度
-            space_width = self._estimate_text_width(" ") if i > 0 else 0
+            word_space = space_width if i > begin else 0
 
             # 检查是否需要换行（不是第一个单词，且加上新单词会超宽）
-            if i > 0 and current_line_width + space_width + word_width > max_width:
-                # 换行
+            if i > begin and current_line_width + word_space + word_width > max_width:
                 result.append("\\N")
                 current_line_width = 0
 
             # 添加空格（除了第一个单词和换行后的第一个单词）
-            if i > 0 and current_line_width > 0:
+            if i > begin and current_line_width > 0:
                 result.append(" ")
-                current_line_width += space_width
+                current_line_width += word_space
 
-            # 添加单词
-            result.append(f"{karaoke_tag}{word_text}")
+            result.append(pieces[i])
             current_line_width += word_width
 
         return "".join(result)
 
+    def _render_lines(self, words: WordTimings, lines: List[Tuple[int, int]]) -> List[str]:
+        """
+        一次性生成所有行的卡拉OK文本（支持自动换行）
+
+        Args:
+            words: 词级时间戳
+            lines: 每行单词的索引范围
+
+        Returns:
+            每行带\\k标签的ASS格式文本（可能包含\\N换行符）
+        """
+        # \\k标签只取决于单词时长和样式的标签函数
+        pieces = self._cached('pieces', (words, len(words), type(self.style).get_karaoke_tags),
+                              lambda: self._karaoke_pieces(words))
+
+        # 不换行：单词之间用空格连接
+        if not (self.max_line_width_px and self.max_line_width_px > 0):
+            return self._cached('texts', (pieces, lines, None),
+                                lambda: [" ".join(pieces[begin:end]) for begin, end in lines])
+
+        # 换行位置只取决于分行、单词宽度（字体和字号）和行宽
+        layout = self._cached('wrap', (words, lines, self._width_provider, self.max_line_width_px),
+                              lambda: self._wrap_layout(words, lines))
+        return self._cached('texts', (pieces, lines, layout), lambda: self._wrap_texts(pieces, lines, layout))
+
+    def _wrap_layout(self, words: WordTimings, lines: List[Tuple[int, int]]) -> _WrapLayout:
+        """
+        计算自动换行所需的单词宽度和换行位置
+
+        Args:
+            words: 词级时间戳
+            lines: 每行单词的索引范围
+
+        Returns:
+            换行布局；存在零宽度单词时换行位置为None
+        """
+        widths = self._word_widths(words.tokens)
+        space_width = self._estimate_text_width(" ")
+        # 保留20%的边距（左右各10%）
+        max_width = self.max_line_width_px * 0.8
+
+        if space_width <= 0 or not (widths > 0).all():
+            return _WrapLayout(widths, space_width, None)
+        return _WrapLayout(widths, space_width, self._find_wrap_breaks(widths, space_width, max_width, lines))
+
+    def _wrap_texts(self,
+                    pieces: List[str],
+                    lines: List[Tuple[int, int]],
+                    layout: _WrapLayout) -> List[str]:
+        """
+        按换行位置拼接每行文本
+
+        Args:
+            pieces: 每个单词的"\\k标签+单词"片段
+            lines: 每行单词的索引范围
+            layout: :meth:`_wrap_layout` 的结果
+
+        Returns:
+            每行带\\k标签和\\N换行符的ASS格式文本，居中对齐
+        """
+        if layout.breaks is None:
+            return [self._create_karaoke_tags_with_wrap(pieces, layout.widths, layout.space_width, begin, end)
+                    for begin, end in lines]
+
+        texts = []
+        for (begin, end), line_breaks in zip(lines, layout.breaks):
+            bounds = [begin, *line_breaks, end]
+            # 添加底部居中对齐标签，换行后的第一个单词前不加空格
+            texts.append("{\\an2}" + "\\N".join(" ".join(pieces[a:b]) for a, b in zip(bounds, bounds[1:])))
+        return texts
+
     def generate(self, subs: SSAFile) -> SSAFile:
         """
         生成卡拉OK字幕
@@ -265,36 +439,71 @@ class KaraokeGenerator:
         Returns:
             带卡拉OK效果的SSAFile对象
         """
-        # 提取词级时间戳
-        words = self._extract_word_timings(subs)
+        return self.generate_from_word_timings(self._word_timings_for(subs))
 
-        if not words:
-            return SSAFile()
+    def _word_timings_for(self, source: Union[SSAFile, WordTimings]) -> WordTimings:
+        """
+        获取输入对应的词级时间戳
+
+        Args:
+            source: SSAFile对象或WordTimings
+
+        Returns:
+            WordTimings对象
+        """
+        if isinstance(source, WordTimings):
+            return source
+        # 提取词级时间戳（字幕内容或挂载的时间戳不变时复用上次的结果）
+        key = (subs_signature(source), getattr(source, WORD_TIMINGS_ATTR, None))
+        return self._cached('timings', key, lambda: self._extract_word_timings(source))
+
+    def _layout(self, words: WordTimings) -> Tuple[List[Tuple[int, int]], List[str]]:
+        """
+        计算所有行的单词范围和卡拉OK文本
+
+        Args:
+            words: 词级时间戳
 
+        Returns:
+            (每行单词的索引范围, 每行带\\k标签的文本)
+        """
         # 按行分组
-        lines = self._group_words_by_lines(words)
+        lines = self._cached('lines', (words, len(words), self.words_per_line, self.max_line_duration_ms,
+                                       self.break_on_segments),
+                             lambda: self._group_words_by_lines(words))
+        return lines, self._render_lines(words, lines)
+
+    def _style_name(self) -> str:
+        """ASS样式名称（使用样式的style_key）"""
+        return self.style.style_key if self.style.style_key else "Default"
+
+    def generate_from_word_timings(self, words: WordTimings) -> SSAFile:
+        """
+        直接从WordTimings生成卡拉OK字幕
+
+        Args:
+            words: 词级时间戳
+
+        Returns:
+            带卡拉OK效果的SSAFile对象
+        """
+        if not len(words):
+            return SSAFile()
+
+        lines, texts = self._layout(words)
 
         # 创建新的SSAFile
         karaoke_subs = SSAFile()
 
-        # 设置样式（使用样式的style_key）
-        style_name = self.style.style_key if self.style.style_key else "Default"
+        # 设置样式
+        style_name = self._style_name()
         karaoke_subs.styles[style_name] = self.style.get_ssa_style()
 
         # 为每行创建事件
-        for line_words in lines:
-            if not line_words:
-                continue
-
-            start_time = line_words[0]["start"]
-            end_time = line_words[-1]["end"]
-
-            # 生成带\\k标签的文本
-            karaoke_text = self._create_karaoke_tags(line_words)
-
+        for (begin, end), karaoke_text in zip(lines, texts):
             event = SSAEvent(
-                start=start_time,
-                end=end_time,
+                start=words.starts[begin],
+                end=words.ends[end - 1],
                 text=karaoke_text,
                 style=style_name
             )
@@ -303,53 +512,91 @@ class KaraokeGenerator:
 
         return karaoke_subs
 
-    def generate_from_word_list(self,
-                                words: List[Dict[str, Any]],
-                                merge_consecutive: bool = True) -> SSAFile:
+    def ass_header(self) -> str:
         """
-        直接从词级时间戳列表生成卡拉OK字幕
+        生成ASS文件头部（[Script Info]、[V4+ Styles] 和 [Events] 的Format行）
 
-        Args:
-            words: 词级时间戳列表 [{"word": str, "start": int, "end": int}, ...]
-            merge_consecutive: 是否合并连续的短单词
+        头部由pysubs2对一个只有样式、没有事件的SSAFile序列化得到，因此与
+        :meth:`generate` 的结果保存后的文件头完全一致。
 
         Returns:
-            带卡拉OK效果的SSAFile对象
+            ASS文件头部文本
         """
-        if not words:
-            return SSAFile()
+        header = SSAFile()
+        header.styles[self._style_name()] = self.style.get_ssa_style()
+        return header.to_string('ass')
 
-        # 按行分组
-        lines = self._group_words_by_lines(words)
+    def iter_ass_events(self, words: WordTimings) -> Iterator[str]:
+        """
+        逐行生成 Dialogue 行（格式与pysubs2一致，不创建SSAEvent对象）
 
-        # 创建新的SSAFile
-        karaoke_subs = SSAFile()
+        Args:
+            words: 词级时间戳
 
-        # 设置样式（使用样式的style_key）
-        style_name = self.style.style_key if self.style.style_key else "Default"
-        karaoke_subs.styles[style_name] = self.style.get_ssa_style()
+        Returns:
+            Dialogue行迭代器（每行以换行符结尾）
+        """
+        lines, texts = self._layout(words)
+        style_name = self._style_name()
+        ms_to_timestamp = SubstationFormat.ms_to_timestamp
+        starts, ends = words.starts, words.ends
+        for (begin, end), karaoke_text in zip(lines, texts):
+            yield (f"Dialogue: 0,{ms_to_timestamp(starts[begin])},{ms_to_timestamp(ends[end - 1])},"
+                   f"{style_name},,0,0,0,,{karaoke_text}\n")
+
+    def write_ass(self, source: Union[SSAFile, WordTimings], fp: TextIO) -> int:
+        """
+        将卡拉OK字幕直接以ASS格式写入文本流（文件、管道或StringIO）
 
-        # 为每行创建事件
-        for line_words in lines:
-            if not line_words:
-                continue
+        输出与 ``generate(subs).to_string('ass')`` 完全一致，但不创建pysubs2对象。
 
-            start_time = line_words[0]["start"]
-            end_time = line_words[-1]["end"]
+        Args:
+            source: 输入的SSAFile对象或WordTimings
+            fp: 可写的文本流
 
-            # 生成带\\k标签的文本
-            karaoke_text = self._create_karaoke_tags(line_words)
+        Returns:
+            写入的字幕事件数
+        """
+        words = self._word_timings_for(source)
+        if not len(words):
+            fp.write(SSAFile().to_string('ass'))
+            return 0
+
+        fp.write(self.ass_header())
+        count = 0
+        for line in self.iter_ass_events(words):
+            fp.write(line)
+            count += 1
+        return count
+
+    def generate_to_file(self, source: Union[SSAFile, WordTimings], path: Union[str, Path]) -> int:
+        """
+        生成卡拉OK字幕并直接保存为ASS文件
 
-            event = SSAEvent(
-                start=start_time,
-                end=end_time,
-                text=karaoke_text,
-                style=style_name
-            )
+        Args:
+            source: 输入的SSAFile对象或WordTimings
+            path: 输出文件路径
 
-            karaoke_subs.append(event)
+        Returns:
+            写入的字幕事件数
+        """
+        with open(path, 'w', encoding='utf-8') as fp:
+            return self.write_ass(source, fp)
 
-        return karaoke_subs
+    def generate_from_word_list(self,
+                                words: List[Dict[str, Any]],
+                                merge_consecutive: bool = True) -> SSAFile:
+        """
+        直接从词级时间戳列表生成卡拉OK字幕
+
+        Args:
+            words: 词级时间戳列表 [{"word": str, "start": int, "end": int}, ...]
+            merge_consecutive: 是否合并连续的短单词
+
+        Returns:
+            带卡拉OK效果的SSAFile对象
+        """
+        return self.generate_from_word_timings(WordTimings.from_word_list(words))
 
 
 def create_karaoke_subtitles(subs: SSAFile,
@@ -361,7 +608,8 @@ def create_karaoke_subtitles(subs: SSAFile,
                              fontname: Optional[str] = None,
                              primary_color: Optional[str] = None,
                              secondary_color: Optional[str] = None,
-                             max_line_width_px: Optional[int] = None) -> SSAFile:
+                             max_line_width_px: Optional[int] = None,
+                             use_font_metrics: bool = False) -> SSAFile:
     """
     便捷函数：创建卡拉OK字幕
 
@@ -376,6 +624,7 @@ def create_karaoke_subtitles(subs: SSAFile,
         primary_color: 自定义基础颜色 Hex格式如"#FFFFFF"（可选）
         secondary_color: 自定义高亮颜色 Hex格式如"#FFD700"（可选）
         max_line_width_px: 单行最大宽度（像素），用于自动换行和居中（可选，None则不换行）
+        use_font_metrics: 自动换行时按真实字形宽度计算（需要fontTools）
 
     Returns:
         带卡拉OK效果的SSAFile对象
@@ -389,7 +638,8 @@ def create_karaoke_subtitles(subs: SSAFile,
         fontname=fontname,
         primary_color=primary_color,
         secondary_color=secondary_color,
-        max_line_width_px=max_line_width_px
+        max_line_width_px=max_line_width_px,
+        use_font_metrics=use_font_metrics
     )
     return generator.generate(subs)
 
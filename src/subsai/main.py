@@ -16,10 +16,17 @@ You should have received a copy of the GNU General Public License along with
 this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
+import contextlib
+import json
 import os
 import pathlib
+import shutil
+import subprocess
 import tempfile
-from typing import Union, Dict
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, Union, Dict, List
 
 import ffmpeg
 import pysubs2
@@ -29,6 +36,9 @@ from subsai.configs import AVAILABLE_MODELS
 from subsai.models.abstract_model import AbstractModel
 from ffsubsync.ffsubsync import run, make_parser
 from subsai.utils import available_translation_models
+from subsai.subtitle_transport import SubtitleTransport
+from subsai.cancellation import CancellationToken
+from subsai import fonts
 
 __author__ = "abdeladim-s"
 __contact__ = "https://github.com/abdeladim-s"
@@ -36,6 +46,27 @@ __copyright__ = "Copyright 2023,"
 __license__ = "GPLv3"
 __github__ = "https://github.com/abdeladim/subsai"
 
+# ionice scheduling classes, see `man ionice`
+IO_PRIORITY_CLASSES = {
+    'idle': ['-c', '3'],
+    'best-effort': ['-c', '2', '-n', '7'],
+}
+
+
+def _io_priority_prefix(io_priority: str = None) -> list:
+    """
+    Returns the command prefix that runs a process with the given I/O priority
+
+    :param io_priority: one of :attr:`IO_PRIORITY_CLASSES` or None
+    :return: list of command arguments (empty if unsupported on this platform)
+    """
+    if io_priority is None:
+        return []
+    ionice = shutil.which('ionice')
+    if ionice is None:
+        return []
+    return [ionice, *IO_PRIORITY_CLASSES[io_priority]]
+
 
 class SubsAI:
     """
@@ -96,7 +127,11 @@ class SubsAI:
         return AVAILABLE_MODELS[model_name]['class'](model_config)
 
     @staticmethod
-    def transcribe(media_file: str, model: Union[AbstractModel, str], model_config: dict = {}) -> SSAFile:
+    def transcribe(media_file: str,
+                   model: Union[AbstractModel, str],
+                   model_config: dict = {},
+                   cancel_token: CancellationToken = None,
+                   segment_callback: Callable[[int, int, str], None] = None) -> SSAFile:
         """
         Takes the model instance (created by :func:`create_model`) or the model name.
         Returns a :class:`pysubs2.SSAFile` <https://pysubs2.readthedocs.io/en/latest/api-reference.html#ssafile-a-subtitle-file>`_
@@ -104,15 +139,35 @@ class SubsAI:
         :param media_file: path of the media file (video/audio)
         :param model: model instance or model name
         :param model_config: model configs' dict
+        :param cancel_token: optional :class:`subsai.cancellation.CancellationToken`. It is checked before and after
+            the transcription, and backends that support it check it between decoding windows or chunks.
+            Cancelling raises :class:`subsai.cancellation.JobCancelled`.
+        :param segment_callback: optional ``callback(start_ms, end_ms, text)``, called from the transcribing thread
+            for each segment as soon as it is decoded, by backends that decode segment by segment (faster-whisper).
+            Other backends never call it.
 
         :return: SSAFile: list of subtitles
         """
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
         if type(model) == str:
             stt_model = SubsAI.create_model(model, model_config)
         else:
             stt_model = model
         media_file = str(pathlib.Path(media_file).resolve())
-        return stt_model.transcribe(media_file)
+        if cancel_token is None and segment_callback is None:
+            return stt_model.transcribe(media_file)
+
+        stt_model.cancel_token = cancel_token
+        stt_model.segment_callback = segment_callback
+        try:
+            subs = stt_model.transcribe(media_file)
+        finally:
+            stt_model.cancel_token = None
+            stt_model.segment_callback = None
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        return subs
 
 
 class Tools:
@@ -244,6 +299,8 @@ class Tools:
     def merge_subs_with_video(subs: Dict[str, SSAFile],
                   media_file: str,
                   output_filename: str = None,
+                  probe: dict = None,
+                  io_priority: str = None,
                   **kwargs
                   ) -> str:
         """
@@ -262,28 +319,23 @@ class Tools:
         :param subs: dict with (lang,`SSAFile` object) key,value pairs
         :param media_file: path of the video media_file
         :param output_filename: Output file name (without the extension as it will be inferred from the media file)
+        :param probe: result of `ffmpeg.probe(media_file, select_streams="v")`, to avoid probing the file again
+        :param io_priority: run ffmpeg with a lower I/O priority, one of `IO_PRIORITY_CLASSES` ('idle', 'best-effort')
 
         :return: Absolute path of the output file
         """
         import logging
         logger = logging.getLogger(__name__)
 
-        metadata = ffmpeg.probe(media_file, select_streams="v")['streams'][0]
+        if probe is None:
+            probe = ffmpeg.probe(media_file, select_streams="v")
+        metadata = probe['streams'][0]
         assert metadata['codec_type'] == 'video', f'File {media_file} is not a video'
 
         logger.info(f"🎬 开始合并字幕到视频: {media_file}")
         logger.info(f"📝 字幕语言数量: {len(subs)}")
 
-        # 创建临时文件字典，存储文件路径而不是文件句柄
-        srtin_files = {}
-        for key in subs:
-            # 创建临时文件并立即关闭，只保留路径
-            temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.srt', delete=False, encoding='utf-8')
-            temp_file.close()
-            srtin_files[key] = temp_file.name
-            logger.info(f"📄 创建临时文件: {key} -> {temp_file.name}")
-
-        try:
+        with contextlib.ExitStack() as stack:
             in_file = pathlib.Path(media_file)
             if output_filename is not None:
                 # 保持输入文件的扩展名
@@ -314,27 +366,17 @@ class Tools:
 
             ffmpeg_subs_inputs = []
 
-            for i, lang in enumerate(srtin_files):
-                srtin = srtin_files[lang]
-
-                # 保存字幕到临时文件
-                logger.info(f"💾 保存字幕 '{lang}' 到: {srtin}")
-                subs[lang].save(srtin)
+            pass_fds = []
 
-                # 检查文件是否真的被写入
-                if os.path.exists(srtin):
-                    file_size = os.path.getsize(srtin)
-                    logger.info(f"✅ 字幕文件已创建，大小: {file_size} 字节")
+            for i, lang in enumerate(subs):
+                # 字幕只序列化一次，通过内存文件传给ffmpeg
+                transport = stack.enter_context(SubtitleTransport(subs[lang], 'srt', name=f"subs-{lang}"))
+                logger.info(f"📄 字幕 '{lang}': {transport.size} 字节 -> {transport.path}")
+                transport.log_preview(logger, 50)
 
-                    # 读取前100个字符用于调试
-                    with open(srtin, 'r', encoding='utf-8') as f:
-                        preview = f.read(100)
-                        logger.info(f"📖 文件内容预览: {preview[:50]}...")
-                else:
-                    logger.error(f"❌ 字幕文件不存在: {srtin}")
-
-                ffmpeg_subs_inputs.append(ffmpeg.input(srtin)['s'])
+                ffmpeg_subs_inputs.append(ffmpeg.input(transport.path, f='srt')['s'])
                 metadata_subs[f'metadata:s:s:{i}'] = "title=" + lang
+                pass_fds.extend(transport.pass_fds)
 
             output_file = str(out_file.resolve())
             input_ffmpeg = ffmpeg.input(video)
@@ -352,31 +394,144 @@ class Tools:
             output_ffmpeg = ffmpeg.overwrite_output(output_ffmpeg)
 
             # 打印ffmpeg命令用于调试
-            cmd = ffmpeg.compile(output_ffmpeg)
+            cmd = _io_priority_prefix(io_priority) + ffmpeg.compile(output_ffmpeg)
             logger.info(f"🎬 执行ffmpeg命令: {' '.join(cmd)}")
 
             # 捕获ffmpeg输出
             try:
-                stdout, stderr = ffmpeg.run(output_ffmpeg, capture_stdout=True, capture_stderr=True)
+                process = subprocess.run(cmd, capture_output=True, pass_fds=pass_fds)
+                if process.returncode != 0:
+                    raise ffmpeg.Error('ffmpeg', process.stdout, process.stderr)
                 logger.info(f"✅ ffmpeg执行成功")
-                if stderr:
-                    logger.debug(f"ffmpeg stderr: {stderr.decode('utf-8', errors='ignore')[-500:]}")
+                if process.stderr and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"ffmpeg stderr: {process.stderr.decode('utf-8', errors='ignore')[-500:]}")
             except ffmpeg.Error as e:
                 logger.error(f"❌ ffmpeg执行失败: {e.stderr.decode('utf-8', errors='ignore')}")
                 raise
 
-        finally:
-            # 清理临时字幕文件
-            for srtin_path in srtin_files.values():
-                if os.path.exists(srtin_path):
-                    logger.info(f"🗑️ 删除临时文件: {srtin_path}")
-                    os.unlink(srtin_path)
-
         logger.info(f"🎉 字幕合并完成: {out_file.resolve()}")
         return str(out_file.resolve())
 
     @staticmethod
-    def burn_karaoke_subtitles(subs: SSAFile,
+    def merge_subs_with_video_many(items: List[dict],
+                                   workers: int = 4,
+                                   manifest_file: str = None,
+                                   io_priority: str = 'best-effort') -> List[dict]:
+        """
+        Merges subtitles into many videos in parallel (remux only, see :func:`merge_subs_with_video`).
+        Every file runs in its own ffmpeg subprocess, at most `workers` at a time.
+        A failing file is recorded and does not abort the batch.
+
+        Example:
+        ```python
+            items = [
+                {'subs': {'English': 'a.en.srt', 'Arabic': 'a.ar.srt'}, 'media_file': 'a.mp4'},
+                {'subs': {'English': en_subs}, 'media_file': 'b.webm', 'output_filename': 'b-subs'},
+            ]
+            results = Tools.merge_subs_with_video_many(items, workers=8, manifest_file='remux.jsonl')
+        ```
+
+        :param items: list of dicts with the keys `subs` (dict of lang -> `SSAFile` object or subtitles file path),
+                      `media_file` and optionally `output_filename`
+        :param workers: maximum number of concurrent ffmpeg processes
+        :param manifest_file: JSON lines file where every finished file is recorded. Files already marked as done
+                              (and whose output still exists) are skipped, so an interrupted batch can be resumed.
+        :param io_priority: I/O priority of the ffmpeg processes, see `IO_PRIORITY_CLASSES`, None to keep the default
+
+        :return: list of result dicts (same order as `items`) with the keys `media_file`, `output_file`, `status`
+                 ('done', 'skipped' or 'failed'), `error`, `elapsed_s` and `mb_per_s`
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+
+        def _item_key(item: dict) -> str:
+            return f"{pathlib.Path(item['media_file']).resolve()}|{item.get('output_filename')}"
+
+        done = {}
+        if manifest_file is not None and os.path.exists(manifest_file):
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    # A crash mid-write leaves a truncated last line; such lines are re-processed
+                    try:
+                        record = json.loads(line)
+                        if record['status'] == 'done' and os.path.exists(record['output_file']):
+                            done[record['key']] = record
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.warning(f"⚠️  清单第 {line_number} 行无法解析，已跳过: {e!r}")
+            logger.info(f"📒 从清单恢复: {len(done)} 个文件已完成")
+
+        manifest_lock = threading.Lock()
+        probe_lock = threading.Lock()
+        probes = {}
+
+        def _probe(media_file: str) -> dict:
+            # 同一视频在一批中只探测一次：第一个线程探测，重复的路径等待同一个Future；
+            # 锁只保护字典，不同视频的探测并行进行
+            with probe_lock:
+                future = probes.get(media_file)
+                owner = future is None
+                if owner:
+                    future = probes[media_file] = Future()
+            if owner:
+                try:
+                    future.set_result(ffmpeg.probe(media_file, select_streams="v"))
+                except Exception as e:
+                    future.set_exception(e)
+            return future.result()
+
+        def _record(record: dict):
+            if manifest_file is None:
+                return
+            with manifest_lock:
+                with open(manifest_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+        def _merge(item: dict) -> dict:
+            media_file = str(pathlib.Path(item['media_file']).resolve())
+            record = {'key': _item_key(item), 'media_file': media_file, 'output_file': None,
+                      'status': 'failed', 'error': None, 'elapsed_s': None, 'mb_per_s': None}
+            start_time = time.monotonic()
+            try:
+                subs = {lang: pysubs2.load(s) if isinstance(s, (str, pathlib.Path)) else s
+                        for lang, s in item['subs'].items()}
+                record['output_file'] = Tools.merge_subs_with_video(subs,
+                                                                    media_file,
+                                                                    item.get('output_filename'),
+                                                                    probe=_probe(media_file),
+                                                                    io_priority=io_priority)
+                elapsed = time.monotonic() - start_time
+                size_mb = os.path.getsize(media_file) / (1024 * 1024)
+                record.update(status='done',
+                              elapsed_s=round(elapsed, 3),
+                              mb_per_s=round(size_mb / elapsed, 2) if elapsed > 0 else None)
+                logger.info(f"📦 {os.path.basename(media_file)}: {size_mb:.1f} MB in {elapsed:.2f}s "
+                            f"({record['mb_per_s']} MB/s)")
+            except Exception as e:
+                record.update(error=str(e), elapsed_s=round(time.monotonic() - start_time, 3))
+                logger.error(f"❌ 合并失败 {media_file}: {e}")
+            _record(record)
+            return record
+
+        results = [None] * len(items)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {}
+            for i, item in enumerate(items):
+                key = _item_key(item)
+                if key in done:
+                    results[i] = dict(done[key], status='skipped')
+                    continue
+                futures[executor.submit(_merge, item)] = i
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+        failed = sum(1 for r in results if r['status'] == 'failed')
+        logger.info(f"🎉 批量合并完成: {len(results) - failed} 成功/跳过, {failed} 失败")
+        return results
+
+    @staticmethod
+    def burn_karaoke_subtitles(subs: Union[SSAFile, str],
                                media_file: str,
                                output_filename: str = None,
                                video_codec: str = 'libx264',
@@ -385,7 +540,12 @@ class Tools:
                                aspect_ratio: str = None,
                                min_resolution: int = 1080,
                                enable_uniqueness: bool = True,
-                               uniqueness_index: int = 0) -> str:
+                               uniqueness_index: int = 0,
+                               uniqueness_seed: int = None,
+                               mezzanine_cache=None,
+                               deadline_s: float = None,
+                               encode_report: dict = None,
+                               ffmpeg_runner=None) -> str:
         """
         Uses ffmpeg to burn ASS karaoke subtitles into video as hardcoded subtitles.
         This method preserves ASS karaoke effects (\\k tags) and includes advanced features:
@@ -411,7 +571,8 @@ class Tools:
             )
         ```
 
-        :param subs: SSAFile object with ASS karaoke subtitles
+        :param subs: SSAFile object with ASS karaoke subtitles, or the already serialised ASS text
+                     (e.g. written by :meth:`subsai.karaoke_generator.KaraokeGenerator.write_ass`)
         :param media_file: path of the video file
         :param output_filename: Output file name (without extension)
         :param video_codec: Video codec for encoding (default: libx264)
@@ -421,16 +582,39 @@ class Tools:
         :param min_resolution: Minimum output height in pixels (default: 1080). Video will be upscaled if needed.
         :param enable_uniqueness: Enable video uniqueness processing to avoid platform batch detection (default: True)
         :param uniqueness_index: Index for batch processing to ensure different randomization per video (default: 0)
+        :param uniqueness_seed: Optional seed for the uniqueness randomization. The same seed and index give the same
+                                parameters (reproducible output); None draws new parameters on every call.
+        :param mezzanine_cache: Optional :class:`subsai.mezzanine_cache.MezzanineCache`. When given, the scaled/cropped
+                                source is cached so that re-renders with other styles only overlay subtitles and encode.
+        :param deadline_s: Optional wall-clock budget (seconds) for the encode. The slowest preset predicted to finish
+                           in time is used (overrides `preset`), based on the per-host calibration table or a short
+                           probe encode of the first seconds. Only supported for libx264/libx265.
+        :param encode_report: Optional dict that is filled with the chosen preset, whether the deadline replaced the
+                              requested preset (`deadline_adjusted`), the predicted and the actual encode time
+                              (seconds) and the encode fps
+        :param ffmpeg_runner: Optional callable `(cmd, pass_fds, env) -> (returncode, stderr_bytes)` that runs
+                              ffmpeg (mezzanine encode, deadline probe and final encode) instead of `subprocess.run`,
+                              e.g. on an asyncio event loop that terminates it when the job is cancelled
 
         :return: Absolute path of the output file
         """
         import logging
         import subprocess
+        from subsai.encode_planner import (
+            EncodeCalibration,
+            PLANNABLE_CODECS,
+            get_frame_rate,
+            get_total_frames,
+            measure_encode_fps,
+            pixel_bucket,
+            plan_preset
+        )
         from subsai.video_uniqueness import (
             calculate_uniqueness_params,
             get_resolution_scale_params,
             build_uniqueness_filters,
-            build_x264_params
+            build_x264_params,
+            escape_filter_value
         )
 
         logger = logging.getLogger(__name__)
@@ -477,7 +661,7 @@ class Tools:
         # Calculate uniqueness parameters if enabled
         uniqueness_params = None
         if enable_uniqueness:
-            uniqueness_params = calculate_uniqueness_params(media_file, uniqueness_index)
+            uniqueness_params = calculate_uniqueness_params(media_file, uniqueness_index, uniqueness_seed)
             logger.info(f"🎲 唯一性参数:")
             logger.info(f"  - CRF: {uniqueness_params['crf']}")
             logger.info(f"  - 预设: {uniqueness_params['preset']}")
@@ -599,26 +783,35 @@ class Tools:
                 logger.warning(f"⚠️  无效的宽高比格式 '{aspect_ratio}'，将使用原始尺寸: {e}")
                 crop_filter = None
 
-        # Create temporary ASS file
-        ass_temp = tempfile.NamedTemporaryFile(mode='w', suffix='.ass', delete=False, encoding='utf-8')
+        if crop_filter:
+            output_width, output_height = target_crop_width, target_crop_height
+        else:
+            output_width, output_height = scale_params['target_width'], scale_params['target_height']
+
+        # Use the cached geometry-normalised intermediate if available
+        source_file = media_file
+        if mezzanine_cache is not None and (scale_params['need_scale'] or crop_filter):
+            mezzanine_file = mezzanine_cache.get_or_create(
+                media_file,
+                scale_params['scale_filter'] if scale_params['need_scale'] else None,
+                crop_filter,
+                ffmpeg_runner=ffmpeg_runner
+            )
+            # None: the intermediate exceeds the cache budget, scale/crop the source in the final encode
+            if mezzanine_file is not None:
+                source_file = mezzanine_file
+                logger.info(f"🧱 使用中间片作为输入: {source_file}")
+                scale_params = dict(scale_params, need_scale=False)
+                crop_filter = None
+
+        # Serialise subtitles once as ASS (to preserve karaoke effects) and pass them in memory
+        with SubtitleTransport(subs, 'ass', name='karaoke-ass') as ass_transport:
+            logger.info(f"📄 ASS字幕: {ass_transport.size} 字节 -> {ass_transport.path}")
+            ass_transport.log_preview(logger, 150)
 
-        try:
-            # Save subtitles as ASS format to preserve karaoke effects
-            logger.info(f"📄 创建临时ASS文件: {ass_temp.name}")
-            subs.save(ass_temp.name)
-            ass_temp.close()
-
-            # 检查ASS文件
-            if os.path.exists(ass_temp.name):
-                file_size = os.path.getsize(ass_temp.name)
-                logger.info(f"✅ ASS文件已创建，大小: {file_size} 字节")
-
-                # 读取前200个字符用于调试
-                with open(ass_temp.name, 'r', encoding='utf-8') as f:
-                    preview = f.read(200)
-                    logger.info(f"📖 ASS文件内容预览:\n{preview[:150]}...")
-            else:
-                logger.error(f"❌ ASS文件不存在: {ass_temp.name}")
+            # Resolve fonts from the managed fonts dir with the pre-built fontconfig cache
+            ffmpeg_env = fonts.ffmpeg_env()
+            fontsdir = str(fonts.FONTS_DIR)
 
             in_file = pathlib.Path(media_file)
             if output_filename is not None:
@@ -635,7 +828,8 @@ class Tools:
                     uniqueness_params,
                     scale_params if scale_params['need_scale'] else None,
                     crop_filter,
-                    ass_temp.name
+                    ass_transport.path,
+                    fontsdir
                 )
             else:
                 # Use basic filter chain without uniqueness
@@ -644,15 +838,59 @@ class Tools:
                     filters.append(scale_params['scale_filter'])
                 if crop_filter:
                     filters.append(crop_filter)
-                filters.append(f"ass={ass_temp.name}")
+                filters.append(f"ass={escape_filter_value(ass_transport.path)}"
+                               f":fontsdir={escape_filter_value(fontsdir)}")
                 video_filter = ",".join(filters)
 
             logger.info(f"🎨 视频滤镜链: {video_filter}")
 
+            # Pick the slowest preset that still meets the deadline
+            total_frames = get_total_frames(metadata)
+            calibration = None
+            encode_plan = None
+            deadline_adjusted = False
+            if deadline_s is not None:
+                if video_codec not in PLANNABLE_CODECS or not total_frames:
+                    logger.warning(f"⚠️  无法为 {video_codec} 规划截止时间，使用预设: {preset}")
+                else:
+                    calibration = EncodeCalibration()
+                    probe_seconds = 5
+                    probe_frames = min(total_frames, int(probe_seconds * (get_frame_rate(metadata) or 25)))
+
+                    def _measure(probe_preset: str) -> float:
+                        probe_cmd = [
+                            '/usr/bin/ffmpeg',
+                            '-t', str(probe_seconds),
+                            '-i', source_file,
+                            '-vf', video_filter,
+                            '-c:v', video_codec,
+                            '-crf', str(crf),
+                            '-preset', probe_preset,
+                            '-an', '-f', 'null', '-'
+                        ]
+                        return measure_encode_fps(probe_cmd, probe_frames, pass_fds=ass_transport.pass_fds,
+                                                  env=ffmpeg_env, ffmpeg_runner=ffmpeg_runner)
+
+                    try:
+                        encode_plan = plan_preset(deadline_s,
+                                                  total_frames,
+                                                  video_codec,
+                                                  pixel_bucket(output_width, output_height),
+                                                  calibration,
+                                                  _measure)
+                    except (subprocess.CalledProcessError, OSError) as e:
+                        # A failed probe must not fail the encode itself: keep the requested preset
+                        logger.warning(f"⚠️  试编码失败，使用预设 {preset}: {e}")
+                    else:
+                        deadline_adjusted = encode_plan['preset'] != preset
+                        preset = encode_plan['preset']
+                        logger.info(f"⏱️ 截止时间 {deadline_s:.0f}s -> 预设 {preset}, "
+                                    f"预计耗时 {encode_plan['predicted_s']}s ({encode_plan['fps_source']})")
+
             # Construct ffmpeg command
             ffmpeg_cmd = [
                 '/usr/bin/ffmpeg',
-                '-i', media_file,
+                '-i', source_file,
                 '-vf', video_filter,
                 '-c:v', video_codec,
                 '-crf', str(crf),
@@ -694,13 +932,41 @@ class Tools:
 
             # Run ffmpeg
             try:
-                result = subprocess.run(
-                    ffmpeg_cmd,
-                    capture_output=True,
-                    check=True
-                )
+                encode_start = time.monotonic()
+                if ffmpeg_runner is None:
+                    subprocess.run(
+                        ffmpeg_cmd,
+                        capture_output=True,
+                        check=True,
+                        pass_fds=ass_transport.pass_fds,
+                        env=ffmpeg_env
+                    )
+                else:
+                    returncode, stderr = ffmpeg_runner(ffmpeg_cmd, ass_transport.pass_fds, ffmpeg_env)
+                    if returncode != 0:
+                        raise subprocess.CalledProcessError(returncode, ffmpeg_cmd, stderr=stderr)
+                encode_elapsed = time.monotonic() - encode_start
                 logger.info(f"✅ ffmpeg执行成功")
 
+                if encode_report is not None:
+                    encode_report.update(
+                        preset=preset,
+                        crf=crf,
+                        deadline_s=deadline_s,
+                        deadline_adjusted=deadline_adjusted,
+                        predicted_s=encode_plan['predicted_s'] if encode_plan else None,
+                        actual_s=round(encode_elapsed, 1),
+                        encode_fps=round(total_frames / encode_elapsed, 1) if total_frames else None
+                    )
+                if encode_plan is not None:
+                    logger.info(f"⏱️ 编码耗时: 预计 {encode_plan['predicted_s']}s, 实际 {encode_elapsed:.1f}s")
+                    try:
+                        calibration.update(video_codec, preset, pixel_bucket(output_width, output_height),
+                                           total_frames / encode_elapsed)
+                    except OSError as e:
+                        # The encode itself succeeded; only the speed sample is lost
+                        logger.warning(f"⚠️  无法更新编码标定表 {calibration.path}: {e}")
+
                 # Verify output file
                 if os.path.exists(output_file):
                     file_size = os.path.getsize(output_file)
@@ -710,12 +976,6 @@ class Tools:
                 logger.error(f"❌ ffmpeg执行失败:\n{error_text}")
                 raise Exception(f"ffmpeg error: {error_text}")
 
-        finally:
-            # Clean up temporary ASS file
-            if os.path.exists(ass_temp.name):
-                logger.info(f"🗑️ 删除临时ASS文件: {ass_temp.name}")
-                os.unlink(ass_temp.name)
-
         logger.info(f"🎉 卡拉OK字幕烧录完成: {out_file.resolve()}")
         if enable_uniqueness:
             logger.info(f"✨ 视频唯一性增强已应用")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+中间片缓存
+Mezzanine Cache for Karaoke Renders
+
+Re-rendering the same video with another style only changes the cheap `ass` filter,
+while the decode, lanczos upscale and crop stay identical. This module caches the
+geometry-normalised intermediate as a lossless encode keyed by
+(source fingerprint, scale filter, crop filter).
+"""
+
+import logging
+import subprocess
+from pathlib import Path
+from typing import Optional, Union
+
+from subsai.disk_cache import DiskCache, StripedLocks, file_fingerprint, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+# 中间片格式版本，编码参数变化时递增以使旧条目失效
+MEZZANINE_FORMAT_VERSION = 1
+MEZZANINE_SUFFIX = '.mkv'
+
+
+class MezzanineCache:
+    """
+    缩放/裁剪后中间片的磁盘缓存
+
+    中间片使用 x264 无损（qp=0, ultrafast）编码并保留原始音频流，
+    后续渲染只需在其上叠加ASS字幕并做最终编码。
+    """
+
+    def __init__(self,
+                 cache_dir: Union[str, Path],
+                 max_size_gb: float = 20.0,
+                 ffmpeg_binary: str = '/usr/bin/ffmpeg'):
+        """
+        初始化中间片缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_size_gb: 磁盘预算（GB），超出后按LRU淘汰
+            ffmpeg_binary: ffmpeg可执行文件路径
+        """
+        self.cache = DiskCache(cache_dir, int(max_size_gb * 1024 ** 3))
+        self.ffmpeg_binary = ffmpeg_binary
+        # 同一进程内对同一键的并发请求只编码一次
+        self._key_locks = StripedLocks()
+
+    def cache_key(self, media_file: str, scale_filter: Optional[str], crop_filter: Optional[str]) -> str:
+        """
+        计算中间片缓存键
+
+        Args:
+            media_file: 源视频路径
+            scale_filter: 缩放滤镜（如 "scale=1920:1080:flags=lanczos"）
+            crop_filter: 裁剪滤镜（如 "crop=1080:1920:420:0"）
+
+        Returns:
+            缓存键
+        """
+        return make_cache_key(MEZZANINE_FORMAT_VERSION, file_fingerprint(media_file), scale_filter, crop_filter)
+
+    def get_or_create(self, media_file: str, scale_filter: Optional[str], crop_filter: Optional[str],
+                      ffmpeg_runner=None) -> Optional[str]:
+        """
+        返回已缩放/裁剪的中间片路径，未命中时先生成
+
+        Args:
+            media_file: 源视频路径
+            scale_filter: 缩放滤镜（可选）
+            crop_filter: 裁剪滤镜（可选）
+            ffmpeg_runner: 可选的ffmpeg运行器 `(cmd, pass_fds, env) -> (returncode, stderr_bytes)`，
+                           用于可取消的执行（见 `Tools.burn_karaoke_subtitles`），默认使用 subprocess.run
+
+        Returns:
+            中间片文件的绝对路径，中间片超过磁盘预算时返回None（应直接使用源视频）
+        """
+        key = self.cache_key(media_file, scale_filter, crop_filter)
+
+        with self._key_locks.for_key(key):
+            cached = self.cache.get(key, MEZZANINE_SUFFIX)
+            if cached is not None:
+                logger.info(f"♻️ 命中中间片缓存: {cached.name}")
+                return str(cached.resolve())
+
+            filters = [f for f in (scale_filter, crop_filter) if f]
+            temp_path = self.cache.temp_path(MEZZANINE_SUFFIX)
+            ffmpeg_cmd = [
+                self.ffmpeg_binary,
+                '-i', media_file,
+                '-map', '0:v:0',
+                '-map', '0:a?',
+            ]
+            if filters:
+                ffmpeg_cmd.extend(['-vf', ",".join(filters)])
+            ffmpeg_cmd.extend([
+                '-c:v', 'libx264',
+                '-preset', 'ultrafast',
+                '-qp', '0',
+                '-c:a', 'copy',
+                '-y', str(temp_path)
+            ])
+
+            logger.info(f"🧱 生成中间片: {' '.join(ffmpeg_cmd)}")
+            try:
+                if ffmpeg_runner is None:
+                    subprocess.run(ffmpeg_cmd, capture_output=True, check=True)
+                else:
+                    returncode, stderr = ffmpeg_runner(ffmpeg_cmd, (), None)
+                    if returncode != 0:
+                        raise subprocess.CalledProcessError(returncode, ffmpeg_cmd, stderr=stderr)
+            except subprocess.CalledProcessError as e:
+                self.cache.discard(temp_path)
+                error_text = e.stderr.decode('utf-8', errors='ignore')
+                logger.error(f"❌ 中间片生成失败:\n{error_text}")
+                raise Exception(f"ffmpeg error: {error_text}")
+            except BaseException:
+                # 被取消（运行器已终止ffmpeg）：删除未写完的中间片
+                self.cache.discard(temp_path)
+                raise
+
+            final_path = self.cache.commit(temp_path, key, MEZZANINE_SUFFIX)
+            if final_path is None:
+                return None
+            logger.info(f"💾 中间片已缓存: {final_path.name} ({final_path.stat().st_size / (1024 * 1024):.1f} MB)")
+            return str(final_path.resolve())
@@ -12,6 +12,13 @@ class AbstractModel(ABC):
     """
     Abstract Model class
     """
+    #: :class:`subsai.cancellation.CancellationToken` of the running transcription, set by
+    #: :func:`subsai.main.SubsAI.transcribe`. Backends call :meth:`check_cancelled` between segments or chunks.
+    cancel_token = None
+    #: Optional ``callback(start_ms, end_ms, text)`` set by :func:`subsai.main.SubsAI.transcribe`. Backends that
+    #: decode segment by segment call :meth:`emit_segment` as soon as each segment is available.
+    segment_callback = None
+
     def __init__(self, model_name=None, model_config={}):
         self.model_name = model_name
         self.model_config = model_config
@@ -36,3 +43,24 @@ class AbstractModel(ABC):
         :return: Collection of SSAEvent(s) (see :mod:`pysubs2.ssaevent`)
         """
         pass
+
+    def check_cancelled(self) -> None:
+        """
+        Raises :class:`subsai.cancellation.JobCancelled` if the running transcription was cancelled.
+
+        :return: None
+        """
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+
+    def emit_segment(self, start: int, end: int, text: str) -> None:
+        """
+        Reports a decoded segment to the :attr:`segment_callback` of the running transcription, if any.
+
+        :param start: start time in milliseconds
+        :param end: end time in milliseconds
+        :param text: segment text
+        :return: None
+        """
+        if self.segment_callback is not None:
+            self.segment_callback(start, end, text)
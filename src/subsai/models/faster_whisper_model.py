@@ -15,6 +15,7 @@ from tqdm import tqdm
 
 from subsai.models.abstract_model import AbstractModel
 from subsai.utils import _load_config, get_available_devices
+from subsai.word_timings import WordTimings, attach_word_timings
 from faster_whisper import WhisperModel
 
 
@@ -258,17 +259,26 @@ class FasterWhisperModel(AbstractModel):
         timestamps = 0.0  # to get the current segments
         with tqdm(total=total_duration, unit=" audio seconds") as pbar:
             if self.transcribe_configs['word_timestamps']:  # word level timestamps
-                for segment in segments:
+                word_timings = WordTimings()
+                for segment_index, segment in enumerate(segments):
+                    # segments is a lazy generator: each step decodes the next window
+                    self.check_cancelled()
                     pbar.update(segment.end - timestamps)
                     timestamps = segment.end
                     if timestamps < info.duration:
                         pbar.update(info.duration - timestamps)
                     for word in segment.words:
-                        event = SSAEvent(start=pysubs2.make_time(s=word.start), end=pysubs2.make_time(s=word.end))
+                        start, end = pysubs2.make_time(s=word.start), pysubs2.make_time(s=word.end)
+                        event = SSAEvent(start=start, end=end)
                         event.plaintext = word.word.strip()
                         subs.append(event)
+                        word_timings.append(word.word, start, end, segment_index)
+                    self.emit_segment(pysubs2.make_time(s=segment.start), pysubs2.make_time(s=segment.end),
+                                      segment.text.strip())
+                attach_word_timings(subs, word_timings)
             else:
                 for segment in segments:
+                    self.check_cancelled()
                     pbar.update(segment.end - timestamps)
                     timestamps = segment.end
                     if timestamps < info.duration:
@@ -276,5 +286,6 @@ class FasterWhisperModel(AbstractModel):
                     event = SSAEvent(start=pysubs2.make_time(s=segment.start), end=pysubs2.make_time(s=segment.end))
                     event.plaintext = segment.text.strip()
                     subs.append(event)
+                    self.emit_segment(event.start, event.end, event.plaintext)
 
         return subs
@@ -14,13 +14,23 @@ from pysubs2 import SSAFile, SSAEvent
 
 from subsai.models.abstract_model import AbstractModel
 from subsai.utils import _load_config, get_available_devices
-from stable_whisper.whisper_word_level import transcribe_stable, load_model
+from subsai.vocal_cache import get_vocal_stem_cache
+from subsai.word_timings import WordTimings, attach_word_timings
+from stable_whisper.whisper_word_level import transcribe_stable, load_model, load_faster_whisper
 
 
 class StableTsModel(AbstractModel):
     model_name = 'jianfch/stable-ts'
     config_schema = {
         # load model config
+        'engine': {
+            'type': list,
+            'description': "Inference engine. 'whisper' runs the original PyTorch Whisper, 'faster-whisper' runs "
+                           "CTranslate2 (several times faster on CPU with int8). Regrouping and timestamp "
+                           "stabilization are applied with both engines.",
+            'options': ['whisper', 'faster-whisper'],
+            'default': 'whisper'
+        },
         'model_type': {
             'type': list,
             'description': "One of the official model names listed by `whisper.available_models()`, or "
@@ -54,6 +64,28 @@ class StableTsModel(AbstractModel):
             'options': None,
             'default': False
         },
+        'compute_type': {
+            'type': str,
+            'description': "faster-whisper engine only. Type to use for computation, e.g. int8, int8_float16, float16. "
+                           "See https://opennmt.net/CTranslate2/quantization.html.",
+            'options': None,
+            'default': 'int8'
+        },
+        'cpu_threads': {
+            'type': int,
+            'description': "faster-whisper engine only. Number of threads to use when running on CPU. "
+                           "0 (the default) lets CTranslate2 decide; a non zero value overrides the "
+                           "OMP_NUM_THREADS environment variable.",
+            'options': None,
+            'default': 0
+        },
+        'num_workers': {
+            'type': int,
+            'description': "faster-whisper engine only. Number of workers, having multiple workers enables true "
+                           "parallelism when transcribe() is called from multiple Python threads.",
+            'options': None,
+            'default': 1
+        },
         # transcribe config
         'verbose': {
             'type': bool,
@@ -198,6 +230,25 @@ class StableTsModel(AbstractModel):
             'options': None,
             'default': None
         },
+        'demucs_cache': {
+            'type': bool,
+            'description': "Cache the vocals isolated by Demucs on disk, keyed by the media content and ``demucs_options``, "
+                           "so re-transcribing the same media skips the separation. Ignored if ``demucs = False``.",
+            'options': None,
+            'default': True
+        },
+        'demucs_cache_dir': {
+            'type': str,
+            'description': "Directory of the Demucs vocals cache. Defaults to `subsai/vocals` in the system temp directory.",
+            'options': None,
+            'default': None
+        },
+        'demucs_cache_size_gb': {
+            'type': float,
+            'description': "Disk budget of the Demucs vocals cache in GB, least recently used entries are evicted first.",
+            'options': None,
+            'default': 10.0
+        },
         'vad': {
             'type': bool,
             'description': "Whether to use Silero VAD to generate timestamp suppression mask."
@@ -399,15 +450,26 @@ class StableTsModel(AbstractModel):
         # },
     }
 
+    # faster-whisper 的解码参数（stable-ts把它们原样传给 WhisperModel.transcribe）
+    FASTER_WHISPER_DECODE_OPTIONS = ['temperature', 'compression_ratio_threshold', 'no_speech_threshold',
+                                     'condition_on_previous_text', 'initial_prompt', 'prepend_punctuations',
+                                     'append_punctuations', 'task', 'language', 'best_of', 'beam_size', 'patience',
+                                     'length_penalty', 'prefix', 'suppress_blank', 'without_timestamps',
+                                     'max_initial_timestamp']
+
     def __init__(self, model_config):
         super(StableTsModel, self).__init__(model_config=model_config,
                                             model_name=self.model_name)
         # config
+        self._engine = _load_config('engine', model_config, self.config_schema)
         self._model_type = _load_config('model_type', model_config, self.config_schema)
         self._device = _load_config('device', model_config, self.config_schema)
         self._in_memory = _load_config('in_memory', model_config, self.config_schema)
         self._cpu_preload = _load_config('cpu_preload', model_config, self.config_schema)
         self._dq = _load_config('dq', model_config, self.config_schema)
+        self._compute_type = _load_config('compute_type', model_config, self.config_schema)
+        self._cpu_threads = _load_config('cpu_threads', model_config, self.config_schema)
+        self._num_workers = _load_config('num_workers', model_config, self.config_schema)
 
         self._verbose = _load_config('verbose', model_config, self.config_schema)
         self._temperature = _load_config('temperature', model_config, self.config_schema)
@@ -429,6 +491,9 @@ class StableTsModel(AbstractModel):
         self._demucs = _load_config('demucs', model_config, self.config_schema)
         self._demucs_output = _load_config('demucs_output', model_config, self.config_schema)
         self._demucs_options = _load_config('demucs_options', model_config, self.config_schema)
+        self._demucs_cache = _load_config('demucs_cache', model_config, self.config_schema)
+        self._demucs_cache_dir = _load_config('demucs_cache_dir', model_config, self.config_schema)
+        self._demucs_cache_size_gb = _load_config('demucs_cache_size_gb', model_config, self.config_schema)
         self._vad = _load_config('vad', model_config, self.config_schema)
         self._vad_threshold = _load_config('vad_threshold', model_config, self.config_schema)
         self._vad_onnx = _load_config('vad_onnx', model_config, self.config_schema)
@@ -448,13 +513,20 @@ class StableTsModel(AbstractModel):
             {config: _load_config(config, model_config, self.config_schema)
              for config in self.config_schema if not hasattr(self, f"_{config}")}
 
-        self.model = load_model(name=self._model_type,
-                                device=self._device,
-                                in_memory=self._in_memory,
-                                cpu_preload=self._cpu_preload,
-                                dq=self._dq)
-
-        # self.model = load_faster_whisper(model_size_or_path=self._model_type)
+        if self._engine == 'faster-whisper':
+            device, device_index = self._ctranslate2_device(self._device)
+            self.model = load_faster_whisper(model_size_or_path=self._model_type,
+                                             device=device,
+                                             device_index=device_index,
+                                             compute_type=self._compute_type,
+                                             cpu_threads=self._cpu_threads,
+                                             num_workers=self._num_workers)
+        else:
+            self.model = load_model(name=self._model_type,
+                                    device=self._device,
+                                    in_memory=self._in_memory,
+                                    cpu_preload=self._cpu_preload,
+                                    dq=self._dq)
 
         # to show the progress
         # import logging
@@ -462,49 +534,112 @@ class StableTsModel(AbstractModel):
         # logging.basicConfig()
         # logging.getLogger("faster_whisper").setLevel(logging.DEBUG)
 
+    @staticmethod
+    def _ctranslate2_device(device) -> tuple:
+        """
+        Converts a PyTorch device string from the `device` option ('cpu', 'cuda:1', ...) into the
+        (device, device_index) pair CTranslate2 expects, which does not accept the 'cuda:N' form.
+
+        :param device: PyTorch device string or None
+        :return: (device, device_index)
+        """
+        if not device:
+            return 'auto', 0
+        name, _, index = str(device).partition(':')
+        return name, int(index) if index else 0
+
+    def _faster_whisper_options(self, demucs) -> dict:
+        """
+        Builds the keyword arguments of the faster-whisper engine: stable-ts pre/post-processing options plus the
+        decoding options faster-whisper understands. Options that only exist in the PyTorch engine
+        (ts_num, time_scale, mel_first, gap_padding, fp16, ...) are ignored.
+        """
+        options = dict(verbose=self._verbose,
+                       word_timestamps=self._word_timestamps,
+                       regroup=self._regroup,
+                       suppress_silence=self._suppress_silence,
+                       suppress_word_ts=self._suppress_word_ts,
+                       q_levels=self._q_levels,
+                       k_size=self._k_size,
+                       demucs=demucs,
+                       demucs_options=self._demucs_options if demucs else None,
+                       vad=self._vad,
+                       vad_threshold=self._vad_threshold,
+                       vad_onnx=self._vad_onnx,
+                       min_word_dur=self._min_word_dur,
+                       only_voice_freq=self._only_voice_freq,
+                       only_ffmpeg=self._only_ffmpeg,
+                       log_prob_threshold=self._logprob_threshold)
+        for config in self.FASTER_WHISPER_DECODE_OPTIONS:
+            value = getattr(self, f"_{config}") if hasattr(self, f"_{config}") else self.transcribe_configs[config]
+            # None表示使用faster-whisper的默认值
+            if value is not None:
+                options[config] = value
+        suppress_tokens = self.transcribe_configs['suppress_tokens']
+        if suppress_tokens is not None:
+            options['suppress_tokens'] = [int(t) for t in str(suppress_tokens).split(',')] if suppress_tokens != '' else []
+        return options
+
     def transcribe(self, media_file) -> SSAFile:
-        result = transcribe_stable(self.model,
-                                   audio=media_file,
-                                   verbose=self._verbose,
-                                   temperature=self._temperature,
-                                   compression_ratio_threshold=self._compression_ratio_threshold,
-                                   logprob_threshold=self._logprob_threshold,
-                                   no_speech_threshold=self._no_speech_threshold,
-                                   condition_on_previous_text=self._condition_on_previous_text,
-                                   initial_prompt=self._initial_prompt,
-                                   word_timestamps=self._word_timestamps,
-                                   regroup=self._regroup,
-                                   ts_num=self._ts_num,
-                                   ts_noise=self._ts_noise,
-                                   suppress_silence=self._suppress_silence,
-                                   suppress_word_ts=self._suppress_word_ts,
-                                   q_levels=self._q_levels,
-                                   k_size=self._k_size,
-                                   time_scale=self._time_scale,
-                                   demucs=self._demucs,
-                                   # demucs_output=self._demucs_output,
-                                   demucs_options=self._demucs_options,
-                                   vad=self._vad,
-                                   vad_threshold=self._vad_threshold,
-                                   vad_onnx=self._vad_onnx,
-                                   min_word_dur=self._min_word_dur,
-                                   only_voice_freq=self._only_voice_freq,
-                                   prepend_punctuations=self._prepend_punctuations,
-                                   append_punctuations=self._append_punctuations,
-                                   mel_first=self._mel_first,
-                                   suppress_ts_tokens=self._suppress_ts_tokens,
-                                   gap_padding=self._gap_padding,
-                                   only_ffmpeg=self._only_ffmpeg,
-                                   max_instant_words=self._max_instant_words,
-                                   avg_prob_threshold=self._avg_prob_threshold,
-                                   ignore_compatibility=self._ignore_compatibility,
-                                   **self.transcribe_configs,
-                                   )
+        demucs = self._demucs
+        if demucs and self._demucs_cache:
+            # 人声只分离一次，之后直接转录缓存中的人声（超过缓存预算时照常在转录中分离）
+            vocals_file = get_vocal_stem_cache(self._demucs_cache_dir, self._demucs_cache_size_gb).get_or_create(
+                media_file, self._demucs_options, verbose=self._verbose)
+            if vocals_file is not None:
+                media_file = vocals_file
+                demucs = False
+
+        if self._engine == 'faster-whisper':
+            result = self.model.transcribe(media_file,
+                                           progress_callback=lambda *_: self.check_cancelled(),
+                                           **self._faster_whisper_options(demucs))
+        else:
+            result = transcribe_stable(self.model,
+                                       audio=media_file,
+                                       verbose=self._verbose,
+                                       temperature=self._temperature,
+                                       compression_ratio_threshold=self._compression_ratio_threshold,
+                                       logprob_threshold=self._logprob_threshold,
+                                       no_speech_threshold=self._no_speech_threshold,
+                                       condition_on_previous_text=self._condition_on_previous_text,
+                                       initial_prompt=self._initial_prompt,
+                                       word_timestamps=self._word_timestamps,
+                                       regroup=self._regroup,
+                                       ts_num=self._ts_num,
+                                       ts_noise=self._ts_noise,
+                                       suppress_silence=self._suppress_silence,
+                                       suppress_word_ts=self._suppress_word_ts,
+                                       q_levels=self._q_levels,
+                                       k_size=self._k_size,
+                                       time_scale=self._time_scale,
+                                       demucs=demucs,
+                                       # demucs_output=self._demucs_output,
+                                       demucs_options=self._demucs_options if demucs else None,
+                                       vad=self._vad,
+                                       vad_threshold=self._vad_threshold,
+                                       vad_onnx=self._vad_onnx,
+                                       min_word_dur=self._min_word_dur,
+                                       only_voice_freq=self._only_voice_freq,
+                                       prepend_punctuations=self._prepend_punctuations,
+                                       append_punctuations=self._append_punctuations,
+                                       mel_first=self._mel_first,
+                                       suppress_ts_tokens=self._suppress_ts_tokens,
+                                       gap_padding=self._gap_padding,
+                                       only_ffmpeg=self._only_ffmpeg,
+                                       max_instant_words=self._max_instant_words,
+                                       avg_prob_threshold=self._avg_prob_threshold,
+                                       ignore_compatibility=self._ignore_compatibility,
+                                       # 每个解码窗口后检查取消
+                                       progress_callback=lambda *_: self.check_cancelled(),
+                                       **self.transcribe_configs,
+                                       )
 
         subs = SSAFile()
 
         if self._word_timestamps:  # word level timestamps
-            for segment in result.segments:
+            word_timings = WordTimings()
+            for segment_index, segment in enumerate(result.segments):
                 for word in segment.words:
                     try:
                         event = SSAEvent(start=pysubs2.make_time(s=word.start), end=pysubs2.make_time(s=word.end))
@@ -514,9 +649,11 @@ class StableTsModel(AbstractModel):
                         else:
                             event.plaintext = word.word.strip()
                         subs.append(event)
+                        word_timings.append(word.word, event.start, event.end, segment_index)
                     except Exception as e:
                         logging.warning(f"Something wrong with {word}")
                         logging.warning(e)
+            attach_word_timings(subs, word_timings)
 
         else:
             for segment in result.segments:
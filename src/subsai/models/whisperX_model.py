@@ -15,6 +15,7 @@ from subsai.models.abstract_model import AbstractModel
 import whisper
 import whisperx
 from subsai.utils import _load_config, get_available_devices
+from subsai.word_timings import WordTimings, attach_word_timings
 import gc
 from pysubs2 import SSAFile, SSAEvent
 
@@ -142,6 +143,13 @@ class WhisperXModel(AbstractModel):
             del diarize_model
 
         subs = SSAFile()
+        word_timings = WordTimings()
+        for segment_index, segment in enumerate(result['segments']):
+            for word in segment.get('words', []):
+                # 无法对齐的词（如数字）没有时间戳
+                if 'start' in word and 'end' in word:
+                    word_timings.append(word["word"], pysubs2.make_time(s=word["start"]),
+                                        pysubs2.make_time(s=word["end"]), segment_index)
 
         if self.segment_type == 'word':  # word level timestamps
             for segment in result['segments']:
@@ -164,7 +172,7 @@ class WhisperXModel(AbstractModel):
         else:
             raise Exception(f'Unknown `segment_type` value, it should be one of the following: '
                             f' {self.config_schema["segment_type"]["options"]}')
-        return subs
+        return attach_word_timings(subs, word_timings)
 
     def _clear_gpu(self):
         gc.collect()
@@ -10,10 +10,12 @@ See [openai/whisper](https://platform.openai.com/docs/guides/speech-to-text)
 import os
 import ffmpeg
 import tempfile
+import pysubs2
 from subsai.models.abstract_model import AbstractModel
 from subsai.utils import _load_config
+from subsai.word_timings import WordTimings, attach_word_timings
 from openai import OpenAI
-from pysubs2 import SSAFile
+from pysubs2 import SSAFile, SSAEvent
 from pydub import AudioSegment
 from joblib import Parallel, delayed
 
@@ -88,6 +90,14 @@ class WhisperAPIModel(AbstractModel):
                 "description": "Number of calls to do in parallel (1 to not use parallel call)",
                 "options": None,
                 "default": 1,
+            },
+            'segment_type': {
+                'type': list,
+                'description': "Sentence-level or word-level timestamps. When set, the API is asked for `verbose_json` "
+                               "with word and segment timestamp granularities (whisper-1 only) and the word timings "
+                               "are kept for karaoke. None requests plain SRT.",
+                'options': [None, 'sentence', 'word'],
+                'default': None
             }
     }
 
@@ -102,6 +112,10 @@ class WhisperAPIModel(AbstractModel):
         if not self.base_url.endswith("/"):
             self.base_url += "/"
         self.n_jobs = _load_config("n_jobs", model_config, self.config_schema)
+        self.segment_type = _load_config('segment_type', model_config, self.config_schema)
+        if self.segment_type not in self.config_schema['segment_type']['options']:
+            raise Exception(f'Unknown `segment_type` value, it should be one of the following: '
+                            f' {self.config_schema["segment_type"]["options"]}')
 
         self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
 
@@ -142,15 +156,23 @@ class WhisperAPIModel(AbstractModel):
         Returns
         -------
         tuple
-            Tuple containing (chunk_index, transcription_result, offset)
+            Tuple containing (chunk_index, transcription_result, offset), the result is an SRT string or, when
+            `segment_type` is set, a verbose JSON transcription with segments and words
         """
         i, chunk, offset = chunk_data
+        self.check_cancelled()
         chunk_path = os.path.join(TMPDIR, f"chunk_{i}.mp3")
 
         try:
             print("Transcribing audio chunk {}".format(i))
             chunk.export(chunk_path, format="mp3")
 
+            if self.segment_type is None:
+                response_options = dict(response_format="srt")
+            else:
+                response_options = dict(response_format="verbose_json",
+                                        timestamp_granularities=["word", "segment"])
+
             with open(chunk_path, "rb") as audio_file:
                 # Use OpenAI Whisper API
                 result = self.client.audio.transcriptions.create(
@@ -159,7 +181,7 @@ class WhisperAPIModel(AbstractModel):
                     prompt=self.prompt,
                     temperature=self.temperature,
                     file=audio_file,
-                    response_format="srt",
+                    **response_options,
                 )
 
             # Clean up the temporary chunk file
@@ -197,6 +219,9 @@ class WhisperAPIModel(AbstractModel):
         # Sort results by chunk index to maintain order
         parallel_results.sort(key=lambda x: x[0])
 
+        if self.segment_type is not None:
+            return self._verbose_results_to_subs(parallel_results)
+
         # Process results and apply time offsets
         results = ""
         for i, result_text, offset in parallel_results:
@@ -206,3 +231,48 @@ class WhisperAPIModel(AbstractModel):
             results += result.to_string("srt")
 
         return SSAFile.from_string(results)
+
+    def _verbose_results_to_subs(self, parallel_results) -> SSAFile:
+        """
+        Builds word- or sentence-level events from the verbose JSON results of every chunk, shifted by the chunk
+        offsets, and attaches the word timings.
+
+        Parameters
+        ----------
+        parallel_results : list
+            (chunk_index, verbose_json_result, offset) tuples sorted by chunk index
+
+        Returns
+        -------
+        SSAFile
+        """
+        subs = SSAFile()
+        word_timings = WordTimings()
+        segment_base = 0
+        for i, result, offset in parallel_results:
+            offset = int(offset)
+            segments = result.segments or []
+            words = result.words or []
+
+            # 单词不嵌套在句子中：按时间归属到所在的句子
+            segment = 0
+            for word in words:
+                while segment < len(segments) - 1 and word.start >= segments[segment].end:
+                    segment += 1
+                start = offset + pysubs2.make_time(s=word.start)
+                end = offset + pysubs2.make_time(s=word.end)
+                word_timings.append(word.word, start, end, segment_base + segment)
+                if self.segment_type == 'word':
+                    event = SSAEvent(start=start, end=end)
+                    event.plaintext = word.word.strip()
+                    subs.append(event)
+
+            if self.segment_type == 'sentence':
+                for segment in segments:
+                    event = SSAEvent(start=offset + pysubs2.make_time(s=segment.start),
+                                     end=offset + pysubs2.make_time(s=segment.end))
+                    event.plaintext = segment.text.strip()
+                    subs.append(event)
+            segment_base += len(segments)
+
+        return attach_word_timings(subs, word_timings)
@@ -14,6 +14,7 @@ from pysubs2 import SSAFile, SSAEvent
 from subsai.models.abstract_model import AbstractModel
 import whisper_timestamped
 from subsai.utils import _load_config, get_available_devices
+from subsai.word_timings import WordTimings, attach_word_timings
 
 
 class WhisperTimeStamped(AbstractModel):
@@ -254,16 +255,27 @@ class WhisperTimeStamped(AbstractModel):
 
     def transcribe(self, media_file) -> str:
         audio = whisper_timestamped.load_audio(media_file)
-        results = whisper_timestamped.transcribe(self.model, audio,
-                                                 verbose=self.verbose,
-                                                 temperature=self.temperature,
-                                                 compression_ratio_threshold=self.compression_ratio_threshold,
-                                                 logprob_threshold=self.logprob_threshold,
-                                                 no_speech_threshold=self.no_speech_threshold,
-                                                 condition_on_previous_text=self.condition_on_previous_text,
-                                                 **self.decode_options
-                                                 )
+        # whisper-timestamped has no progress callback; the encoder runs once per 30 s window,
+        # so a forward pre-hook on it is the earliest point to stop between windows
+        cancel_hook = self.model.encoder.register_forward_pre_hook(lambda *_: self.check_cancelled())
+        try:
+            results = whisper_timestamped.transcribe(self.model, audio,
+                                                     verbose=self.verbose,
+                                                     temperature=self.temperature,
+                                                     compression_ratio_threshold=self.compression_ratio_threshold,
+                                                     logprob_threshold=self.logprob_threshold,
+                                                     no_speech_threshold=self.no_speech_threshold,
+                                                     condition_on_previous_text=self.condition_on_previous_text,
+                                                     **self.decode_options
+                                                     )
+        finally:
+            cancel_hook.remove()
         subs = SSAFile()
+        word_timings = WordTimings()
+        for segment_index, segment in enumerate(results['segments']):
+            for word in segment.get('words', []):
+                word_timings.append(word["text"], pysubs2.make_time(s=word["start"]),
+                                    pysubs2.make_time(s=word["end"]), segment_index)
         if self.segment_type == 'word':  # word level timestamps
             for segment in results['segments']:
                 for word in segment['words']:
@@ -278,4 +290,4 @@ class WhisperTimeStamped(AbstractModel):
         else:
             raise Exception(f'Unknown `segment_type` value, it should be one of the following: '
                             f' {self.config_schema["segment_type"]["options"]}')
-        return subs
+        return attach_word_timings(subs, word_timings)
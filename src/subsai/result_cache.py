@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+转录与渲染结果缓存
+Result Cache for Transcripts and Karaoke Renders
+
+Clients often resubmit the same video with the same settings, or only with another
+style. This module stores transcripts keyed by
+(media content hash, model name, normalized model config) and finished renders keyed
+by (transcript key, karaoke params, encode params), so a style-only change skips
+transcription and an exact repeat returns the stored video without any work.
+
+Uploaded files are keyed by the full SHA-256 computed during the upload. Only other
+paths fall back to the sampled :func:`subsai.disk_cache.file_fingerprint`, which can
+collide for files that differ only outside the sampled blocks.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from pysubs2 import SSAFile
+
+from subsai.disk_cache import DiskCache, file_fingerprint, make_cache_key
+from subsai.word_timings import WordTimings, attach_word_timings, get_word_timings
+
+logger = logging.getLogger(__name__)
+
+# 结果格式版本，序列化格式或渲染管线变化时递增以使旧条目失效
+RESULT_FORMAT_VERSION = 1
+TRANSCRIPT_SUFFIX = '.json'
+# 只影响运行方式、不影响转录结果的模型配置项
+RUNTIME_ONLY_KEYS = {'device', 'cpu_threads', 'num_workers', 'verbose',
+                     'demucs_cache', 'demucs_cache_dir', 'demucs_cache_size_gb'}
+
+
+def normalize_model_config(model_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    规范化模型配置：去掉None值和只影响运行方式的配置项
+
+    Args:
+        model_config: 模型配置
+
+    Returns:
+        用于缓存键的配置字典
+    """
+    return {key: value for key, value in (model_config or {}).items()
+            if value is not None and key not in RUNTIME_ONLY_KEYS}
+
+
+def dump_transcript(subs: SSAFile) -> bytes:
+    """
+    序列化转录结果（挂载的词级时间戳一并保存）
+
+    Args:
+        subs: 转录结果
+
+    Returns:
+        UTF-8 JSON
+    """
+    word_timings = get_word_timings(subs)
+    data = {
+        'subs': subs.to_string('json'),
+        'word_timings': None if word_timings is None else [
+            {'word': word_timings.tokens[i], 'start': word_timings.starts[i],
+             'end': word_timings.ends[i], 'segment': word_timings.segments[i]}
+            for i in range(len(word_timings))
+        ]
+    }
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def load_transcript(path: Union[str, Path]) -> SSAFile:
+    """
+    读取 :func:`dump_transcript` 写出的转录结果
+
+    Args:
+        path: JSON文件路径
+
+    Returns:
+        SSAFile（有词级时间戳时已挂载）
+
+    Raises:
+        OSError, ValueError, KeyError: 文件不存在或内容损坏
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    subs = SSAFile.from_string(data['subs'], format_='json')
+    if data.get('word_timings') is not None:
+        attach_word_timings(subs, WordTimings.from_word_list(data['word_timings']))
+    return subs
+
+
+def _link_or_copy(src: Union[str, Path], dst: Union[str, Path]):
+    # 同一文件系统上硬链接，不占用额外磁盘
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class ResultCache:
+    """
+    转录结果（JSON）和渲染结果（视频文件）的磁盘缓存
+    """
+
+    def __init__(self,
+                 cache_dir: Union[str, Path],
+                 transcript_max_size_gb: float = 1.0,
+                 render_max_size_gb: float = 50.0):
+        """
+        初始化结果缓存
+
+        Args:
+            cache_dir: 缓存目录（其下分 transcripts 和 renders 两个子目录）
+            transcript_max_size_gb: 转录结果的磁盘预算（GB）
+            render_max_size_gb: 渲染结果的磁盘预算（GB）
+        """
+        cache_dir = Path(cache_dir)
+        self.transcripts = DiskCache(cache_dir / 'transcripts', int(transcript_max_size_gb * 1024 ** 3))
+        self.renders = DiskCache(cache_dir / 'renders', int(render_max_size_gb * 1024 ** 3))
+        self._lock = threading.Lock()
+        self.counters = {'transcript_hits': 0, 'transcript_misses': 0, 'render_hits': 0, 'render_misses': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def transcript_key(self, media_file: str, model_name: str, model_config: Optional[Dict[str, Any]],
+                       content_sha256: Optional[str] = None, **options: Any) -> str:
+        """
+        计算转录结果的缓存键
+
+        Args:
+            media_file: 媒体文件路径
+            model_name: 模型名（歌词对齐模式可传 'forced-alignment'）
+            model_config: 模型配置
+            content_sha256: 文件内容的完整SHA-256（上传文件已知），None 时使用采样指纹
+            options: 其他影响结果的选项（如 word_alignment、lyrics）
+
+        Returns:
+            缓存键
+        """
+        media_id = f"sha256:{content_sha256}" if content_sha256 else file_fingerprint(media_file)
+        return make_cache_key(RESULT_FORMAT_VERSION, 'transcript', media_id,
+                              model_name, normalize_model_config(model_config), options)
+
+    def render_key(self, transcript_key: str, karaoke_params: Dict[str, Any], encode_params: Dict[str, Any]) -> str:
+        """
+        计算渲染结果的缓存键（转录键已包含媒体内容哈希）
+
+        Args:
+            transcript_key: 转录结果的缓存键
+            karaoke_params: 卡拉OK字幕参数（样式、字号、颜色等）
+            encode_params: 编码参数（宽高比、CRF、预设）
+
+        Returns:
+            缓存键
+        """
+        return make_cache_key(RESULT_FORMAT_VERSION, 'render', transcript_key, karaoke_params, encode_params)
+
+    def get_transcript(self, key: str) -> Optional[SSAFile]:
+        """
+        读取缓存的转录结果（包括词级时间戳）
+
+        Args:
+            key: 转录键
+
+        Returns:
+            SSAFile，未命中时返回None
+        """
+        path = self.transcripts.get(key, TRANSCRIPT_SUFFIX)
+        if path is None:
+            self._count('transcript_misses')
+            return None
+        try:
+            subs = load_transcript(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"转录缓存条目损坏，忽略: {path.name} ({e})")
+            self._count('transcript_misses')
+            return None
+
+        self._count('transcript_hits')
+        logger.info(f"♻️ 命中转录缓存: {key[:12]} ({len(subs)} 个事件)")
+        return subs
+
+    def put_transcript(self, key: str, subs: SSAFile):
+        """
+        保存转录结果
+
+        Args:
+            key: 转录键
+            subs: 转录结果（挂载的词级时间戳一并保存）
+        """
+        self.transcripts.put_bytes(key, dump_transcript(subs), TRANSCRIPT_SUFFIX)
+
+    def get_render(self, key: str, suffix: str, output_path: Union[str, Path]) -> bool:
+        """
+        将缓存的渲染结果放到输出路径
+
+        Args:
+            key: 渲染键
+            suffix: 视频后缀（如 .mp4）
+            output_path: 输出路径
+
+        Returns:
+            是否命中
+        """
+        path = self.renders.get(key, suffix)
+        if path is None:
+            self._count('render_misses')
+            return False
+        _link_or_copy(path, output_path)
+        self._count('render_hits')
+        logger.info(f"♻️ 命中渲染缓存: {key[:12]} -> {Path(output_path).name}")
+        return True
+
+    def put_render(self, key: str, output_path: Union[str, Path]):
+        """
+        保存渲染结果（同一文件系统上为硬链接）
+
+        Args:
+            key: 渲染键
+            output_path: 渲染完成的视频
+        """
+        suffix = Path(output_path).suffix
+        temp_path = self.renders.temp_path(suffix)
+        try:
+            _link_or_copy(output_path, temp_path)
+        except Exception:
+            self.renders.discard(temp_path)
+            raise
+        self.renders.commit(temp_path, key, suffix)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中/未命中次数和命中率"""
+        with self._lock:
+            stats = dict(self.counters)
+        for kind in ('transcript', 'render'):
+            lookups = stats[f'{kind}_hits'] + stats[f'{kind}_misses']
+            stats[f'{kind}_hit_rate'] = round(stats[f'{kind}_hits'] / lookups, 4) if lookups else None
+        return stats
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+内存字幕传输
+In-memory Subtitle Transport for ffmpeg
+
+Serialises subtitles once and hands them to an ffmpeg child process through a
+memory-backed file descriptor (``memfd_create``), so no temporary subtitle file is
+written, stat'ed or read back. Platforms without ``memfd_create`` fall back to a
+temporary file.
+"""
+
+import logging
+import os
+import tempfile
+from typing import Tuple, Union
+
+from pysubs2 import SSAFile
+
+logger = logging.getLogger(__name__)
+
+
+class SubtitleTransport:
+    """
+    将字幕以内存文件形式传给ffmpeg子进程
+
+    用法::
+
+        with SubtitleTransport(subs, 'ass') as transport:
+            cmd = ['ffmpeg', '-i', video, '-vf', f'ass={transport.path}', ...]
+            subprocess.run(cmd, pass_fds=transport.pass_fds, check=True)
+    """
+
+    def __init__(self, subs: Union[SSAFile, str, bytes], format_: str = 'ass', name: str = 'subsai-subs'):
+        """
+        初始化字幕传输
+
+        Args:
+            subs: SSAFile对象，或已序列化的字幕文本/字节
+            format_: 字幕格式（如 'ass', 'srt'），仅在subs为SSAFile时用于序列化
+            name: 内存文件名称（仅用于调试，出现在 /proc/<pid>/fd 中）
+        """
+        if isinstance(subs, SSAFile):
+            subs = subs.to_string(format_)
+        if isinstance(subs, str):
+            subs = subs.encode('utf-8')
+        self.data: bytes = subs
+        self.format = format_
+        self.name = name
+        self.path: str = None
+        self.pass_fds: Tuple[int, ...] = ()
+        self._fd = None
+        self._temp_path = None
+
+    def __enter__(self) -> 'SubtitleTransport':
+        if hasattr(os, 'memfd_create'):
+            self._fd = os.memfd_create(self.name)
+            view = memoryview(self.data)
+            while view:
+                written = os.write(self._fd, view)
+                view = view[written:]
+            # 子进程通过 /dev/fd/N 重新打开内存文件，读取位置从0开始
+            self.path = f"/dev/fd/{self._fd}"
+            self.pass_fds = (self._fd,)
+        else:
+            temp_file = tempfile.NamedTemporaryFile(suffix=f".{self.format}", delete=False)
+            with temp_file:
+                temp_file.write(self.data)
+            self._temp_path = temp_file.name
+            self.path = self._temp_path
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._temp_path is not None:
+            try:
+                os.unlink(self._temp_path)
+            except FileNotFoundError:
+                pass
+            self._temp_path = None
+        self.pass_fds = ()
+
+    @property
+    def size(self) -> int:
+        """序列化后的字幕字节数"""
+        return len(self.data)
+
+    def preview(self, length: int = 150) -> str:
+        """返回字幕内容的前length个字符（用于调试日志）"""
+        return self.data[:length * 4].decode('utf-8', errors='ignore')[:length]
+
+    def log_preview(self, log: logging.Logger, length: int = 150):
+        """仅在DEBUG级别启用时才生成并输出内容预览"""
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(f"📖 字幕内容预览 ({self.size} 字节):\n{self.preview(length)}...")
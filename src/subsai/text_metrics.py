@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+文本宽度计算
+Text Width Providers for Karaoke Auto-wrap
+
+The heuristic provider reproduces the original character-class estimate (CJK 1.0,
+space 0.3, other 0.6 x fontsize). The font-metric provider reads the real glyph
+advances of the style's font once with fontTools (optional dependency) and scales
+them the way libass does (fontsize maps to usWinAscent + usWinDescent). Providers
+are shared per (font file, size) and memoize word widths in an LRU. A font that cannot
+be resolved is not remembered: once it is added to the fonts directory, the next
+render picks it up.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, NamedTuple
+
+from subsai import fonts
+
+try:
+    from fontTools.ttLib import TTFont
+except ImportError:
+    TTFont = None
+
+logger = logging.getLogger(__name__)
+
+# 每个宽度提供者缓存的单词宽度数量
+WORD_WIDTH_CACHE_SIZE = 65536
+
+
+def heuristic_text_width(text: str, fontsize: float) -> float:
+    """
+    按字符类别估算文本宽度（像素）
+
+    Args:
+        text: 文本内容
+        fontsize: 字体大小
+
+    Returns:
+        估算的宽度（像素）
+    """
+    width = 0.0
+
+    for char in text:
+        if '\u4e00' <= char <= '\u9fff':  # 中文字符
+            width += fontsize * 1.0
+        elif char == ' ':  # 空格
+            width += fontsize * 0.3
+        else:  # 英文和其他字符
+            width += fontsize * 0.6
+
+    return width
+
+
+class TextWidthProvider:
+    """
+    文本宽度提供者基类
+
+    子类实现 `_measure`；`text_width` 是带LRU缓存的同名调用入口。
+    """
+
+    def __init__(self, fontsize: float, cache_size: int = WORD_WIDTH_CACHE_SIZE):
+        self.fontsize = fontsize
+        self.text_width = lru_cache(maxsize=cache_size)(self._measure)
+
+    def _measure(self, text: str) -> float:
+        raise NotImplementedError
+
+
+class HeuristicWidthProvider(TextWidthProvider):
+    """按字符类别估算宽度（原有算法）"""
+
+    def _measure(self, text: str) -> float:
+        return heuristic_text_width(text, self.fontsize)
+
+
+class FontAdvances(NamedTuple):
+    """字体的字形前进宽度表"""
+    advances: Dict[int, int]  # 码位 -> 前进宽度（字体单位）
+    em_height: int  # usWinAscent + usWinDescent（字体单位）
+
+
+@lru_cache(maxsize=32)
+def load_font_advances(font_file: str) -> FontAdvances:
+    """
+    读取字体文件中所有字符的前进宽度（每个字体文件只读取一次）
+
+    Args:
+        font_file: 字体文件路径（.ttf/.otf/.ttc）
+
+    Returns:
+        FontAdvances
+    """
+    font_number = 0 if font_file.lower().endswith(('.ttc', '.otc')) else -1
+    font = TTFont(font_file, fontNumber=font_number, lazy=True)
+    try:
+        metrics = font['hmtx'].metrics
+        advances = {codepoint: metrics[glyph][0] for codepoint, glyph in font.getBestCmap().items()
+                    if glyph in metrics}
+        if 'OS/2' in font and font['OS/2'].usWinAscent + font['OS/2'].usWinDescent > 0:
+            em_height = font['OS/2'].usWinAscent + font['OS/2'].usWinDescent
+        else:
+            em_height = font['hhea'].ascent - font['hhea'].descent or font['head'].unitsPerEm
+    finally:
+        font.close()
+    return FontAdvances(advances=advances, em_height=em_height)
+
+
+class FontMetricsWidthProvider(TextWidthProvider):
+    """按字体文件中的真实字形宽度计算，字体中缺失的字符按字符类别估算"""
+
+    def __init__(self, font_file: str, fontsize: float, cache_size: int = WORD_WIDTH_CACHE_SIZE):
+        super().__init__(fontsize, cache_size)
+        self.font_file = font_file
+        table = load_font_advances(font_file)
+        self._advances = table.advances
+        self._scale = fontsize / table.em_height
+
+    def _measure(self, text: str) -> float:
+        units = 0
+        fallback = ''
+        for char in text:
+            advance = self._advances.get(ord(char))
+            if advance is None:
+                fallback += char
+            else:
+                units += advance
+        width = units * self._scale
+        if fallback:
+            width += heuristic_text_width(fallback, self.fontsize)
+        return width
+
+
+@lru_cache(maxsize=64)
+def _heuristic_provider(fontsize: float) -> HeuristicWidthProvider:
+    return HeuristicWidthProvider(fontsize)
+
+
+@lru_cache(maxsize=64)
+def _font_metrics_provider(font_file: str, fontsize: float) -> FontMetricsWidthProvider:
+    # 读取失败时抛出异常，不会被缓存
+    return FontMetricsWidthProvider(font_file, fontsize)
+
+
+def get_width_provider(fontname: str, fontsize: float, use_font_metrics: bool = False) -> TextWidthProvider:
+    """
+    获取(字体, 字号)对应的宽度提供者（同一组合在进程内共享，单词宽度缓存跨渲染复用）
+
+    字体无法解析或读取时回退到估算宽度，这一结果不缓存，下次调用会重新解析字体。
+
+    Args:
+        fontname: 字体名称
+        fontsize: 字体大小
+        use_font_metrics: 是否使用真实字形宽度（需要fontTools且字体可被fontconfig解析）
+
+    Returns:
+        TextWidthProvider
+    """
+    if use_font_metrics:
+        if TTFont is None:
+            logger.warning("⚠️  未安装fontTools，自动换行使用估算宽度 (pip install fonttools)")
+        else:
+            font_file = fonts.resolve_font(fontname)
+            if font_file is None:
+                logger.warning(f"⚠️  字体 '{fontname}' 无法解析，自动换行使用估算宽度")
+            else:
+                try:
+                    return _font_metrics_provider(font_file, fontsize)
+                except Exception as e:
+                    logger.warning(f"⚠️  读取字体 {font_file} 失败: {e}，自动换行使用估算宽度")
+    return _heuristic_provider(fontsize)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+上传文件存储
+Content-addressed Upload Store for the Batch Service
+
+Uploads are streamed to disk in chunks while their SHA-256 is computed, then stored
+once per content under ``blobs/<sha[:2]>/<sha><ext>``. Each upload gets its own
+file_id that is hard-linked to the blob, so uploading the same video again costs no
+disk space. The file_id -> path index lives in SQLite next to the jobs, and large
+files can be sent as resumable chunked uploads that continue at the last received
+offset after a dropped connection or a restart.
+
+Chunked upload state lives only in SQLite and the partial file, never in process
+memory, so the chunks of one session may arrive at different uvicorn workers.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# 流式复制/哈希的块大小
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class UploadStore:
+    """
+    按内容（SHA-256）去重的上传文件存储
+
+    每个线程使用独立的SQLite连接，写入和哈希都是阻塞操作，应在线程池中调用。
+    """
+
+    def __init__(self, upload_dir: Union[str, Path], db_path: Union[str, Path]):
+        """
+        初始化上传存储
+
+        Args:
+            upload_dir: 上传目录（file_id链接所在目录）
+            db_path: 索引数据库路径（可与任务数据库共用）
+        """
+        self.upload_dir = Path(upload_dir)
+        self.blob_dir = self.upload_dir / 'blobs'
+        self.partial_dir = self.upload_dir / '.partial'
+        for path in (self.blob_dir, self.partial_dir):
+            path.mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        conn.execute('CREATE TABLE IF NOT EXISTS uploads ('
+                     'file_id TEXT PRIMARY KEY, sha256 TEXT NOT NULL, name TEXT, '
+                     'path TEXT NOT NULL, size INTEGER NOT NULL, created_at TEXT NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_uploads_sha ON uploads(sha256)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_uploads_path ON uploads(path)')
+        conn.execute('CREATE TABLE IF NOT EXISTS upload_sessions ('
+                     'upload_id TEXT PRIMARY KEY, name TEXT, size INTEGER, '
+                     'received INTEGER NOT NULL DEFAULT 0, created_at TEXT NOT NULL)')
+
+    def _partial_path(self, upload_id: str) -> Path:
+        return self.partial_dir / upload_id
+
+    def ingest(self, fileobj: BinaryIO, name: str) -> Dict[str, Any]:
+        """
+        流式保存一个文件（边写边计算SHA-256），内容已存在时不再占用磁盘
+
+        Args:
+            fileobj: 可读的二进制文件对象
+            name: 原始文件名
+
+        Returns:
+            上传记录（id、name、path、size、sha256、deduplicated）
+        """
+        temp_path = self.partial_dir / f"{uuid.uuid4().hex}.tmp"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as out:
+                while True:
+                    chunk = fileobj.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return self._commit(temp_path, digest.hexdigest(), size, name)
+
+    def _commit(self, temp_path: Path, sha256: str, size: int, name: str) -> Dict[str, Any]:
+        ext = os.path.splitext(name or '')[1]
+        blob_path = self.blob_dir / sha256[:2] / f"{sha256}{ext}"
+        blob_path.parent.mkdir(exist_ok=True)
+        deduplicated = blob_path.exists()
+        if deduplicated:
+            temp_path.unlink(missing_ok=True)
+            logger.info(f"♻️ 上传内容已存在，复用: {name} ({sha256[:12]})")
+        else:
+            os.replace(temp_path, blob_path)
+
+        # 每个file_id一个硬链接：文件名仍是 file_id（输出文件名据此生成），内容只存一份
+        file_id = str(uuid.uuid4())
+        link_path = self.upload_dir / f"{file_id}{ext}"
+        try:
+            os.link(blob_path, link_path)
+        except OSError:
+            os.symlink(blob_path.resolve(), link_path)
+
+        self._connection().execute(
+            'INSERT INTO uploads (file_id, sha256, name, path, size, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (file_id, sha256, name, str(link_path), size, datetime.now().isoformat()))
+        return {
+            'id': file_id,
+            'name': name,
+            'path': str(link_path),
+            'size': size,
+            'sha256': sha256,
+            'deduplicated': deduplicated
+        }
+
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """
+        按file_id查询上传记录
+
+        Args:
+            file_id: 上传返回的ID
+
+        Returns:
+            上传记录，不存在时返回None
+        """
+        row = self._connection().execute('SELECT * FROM uploads WHERE file_id = ?', (file_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def resolve(self, file_id: str) -> Optional[Path]:
+        """
+        返回file_id对应的文件路径
+
+        Args:
+            file_id: 上传返回的ID
+
+        Returns:
+            文件路径，不存在（或文件已被删除）时返回None
+        """
+        record = self.get(file_id)
+        if record is None or not os.path.exists(record['path']):
+            return None
+        return Path(record['path'])
+
+    def content_sha256(self, path: Union[str, Path]) -> Optional[str]:
+        """
+        返回上传文件内容的SHA-256（上传时已计算）
+
+        Args:
+            path: :meth:`resolve` 返回的文件路径
+
+        Returns:
+            十六进制SHA-256，不是上传文件时返回None
+        """
+        row = self._connection().execute('SELECT sha256 FROM uploads WHERE path = ?', (str(path),)).fetchone()
+        return row['sha256'] if row is not None else None
+
+    def create_session(self, name: str, size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        开始一个可续传的分块上传
+
+        Args:
+            name: 原始文件名
+            size: 文件总大小（字节，可选，用于完成时校验）
+
+        Returns:
+            会话信息（upload_id、name、size、received）
+        """
+        upload_id = uuid.uuid4().hex
+        self._connection().execute(
+            'INSERT INTO upload_sessions (upload_id, name, size, received, created_at) VALUES (?, ?, ?, 0, ?)',
+            (upload_id, name, size, datetime.now().isoformat()))
+        self._partial_path(upload_id).touch()
+        return self.get_session(upload_id)
+
+    def get_session(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """
+        查询分块上传的进度（客户端据 received 续传）
+
+        Args:
+            upload_id: 会话ID
+
+        Returns:
+            会话信息，不存在时返回None
+        """
+        row = self._connection().execute(
+            'SELECT upload_id, name, size, received FROM upload_sessions WHERE upload_id = ?',
+            (upload_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def append(self, upload_id: str, offset: int, data: bytes) -> int:
+        """
+        在指定偏移写入一块数据
+
+        写入在 ``BEGIN IMMEDIATE`` 事务中进行：多个进程同时写同一会话时，
+        偏移检查、写文件和更新 received 对其他进程是原子的。
+
+        Args:
+            upload_id: 会话ID
+            offset: 这块数据的起始偏移，必须等于已接收的字节数
+            data: 数据
+
+        Returns:
+            写入后已接收的字节数
+
+        Raises:
+            KeyError: 会话不存在
+            ValueError: 偏移与已接收字节数不一致
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            session = self.get_session(upload_id)
+            if session is None:
+                raise KeyError(upload_id)
+            if offset != session['received']:
+                raise ValueError(f"偏移不一致: 期望 {session['received']}，收到 {offset}")
+            with open(self._partial_path(upload_id), 'r+b') as f:
+                f.seek(offset)
+                f.write(data)
+                f.truncate()
+            received = offset + len(data)
+            cursor = conn.execute('UPDATE upload_sessions SET received = ? WHERE upload_id = ? AND received = ?',
+                                  (received, upload_id, offset))
+            if cursor.rowcount == 0:
+                raise ValueError(f"偏移不一致: 会话 {upload_id} 已被其他请求更新")
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return received
+
+    def complete(self, upload_id: str) -> Dict[str, Any]:
+        """
+        完成分块上传并存入内容寻址存储
+
+        先原子地删除会话记录（之后的追加和重复完成都会得到 KeyError），
+        再从磁盘重新计算完整文件的SHA-256；失败时恢复会话，客户端可以重试。
+
+        Args:
+            upload_id: 会话ID
+
+        Returns:
+            上传记录（与 :meth:`ingest` 相同）
+
+        Raises:
+            KeyError: 会话不存在
+            ValueError: 已接收字节数与声明的大小不一致
+        """
+        conn = self._connection()
+        session = self.get_session(upload_id)
+        if session is None:
+            raise KeyError(upload_id)
+        if session['size'] is not None and session['received'] != session['size']:
+            raise ValueError(f"上传不完整: {session['received']}/{session['size']} 字节")
+        cursor = conn.execute('DELETE FROM upload_sessions WHERE upload_id = ? AND received = ?',
+                              (upload_id, session['received']))
+        if cursor.rowcount == 0:
+            # 其他请求刚完成了该会话，或又追加了数据
+            raise KeyError(upload_id)
+
+        partial_path = self._partial_path(upload_id)
+        try:
+            hasher = hashlib.sha256()
+            with open(partial_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+            return self._commit(partial_path, hasher.hexdigest(), session['received'], session['name'])
+        except BaseException:
+            conn.execute(
+                'INSERT OR IGNORE INTO upload_sessions (upload_id, name, size, received, created_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (upload_id, session['name'], session['size'], session['received'], datetime.now().isoformat()))
+            raise
@@ -3,6 +3,7 @@
 用于生成独特的视频指纹,避免平台批量检测
 """
 import random
+import re
 import hashlib
 from datetime import datetime, timedelta
 
@@ -35,19 +36,23 @@ def generate_random_metadata():
         'comment': '',  # 清空注释
     }
 
-def calculate_uniqueness_params(input_file: str, index: int = 0):
+def calculate_uniqueness_params(input_file: str, index: int = 0, seed: int = None):
     """
     根据输入文件和索引计算唯一性参数
 
     Args:
         input_file: 输入文件路径
         index: 视频序号 (用于批量处理时的差异化)
+        seed: 随机种子，指定时相同的种子和序号得到相同的参数（可重现的成品），None 时每次调用都不同
 
     Returns:
         dict: 包含唯一性处理参数
     """
     # 基于文件路径和时间的种子
-    seed_str = f"{input_file}_{datetime.now().timestamp()}_{index}"
+    if seed is None:
+        seed_str = f"{input_file}_{datetime.now().timestamp()}_{index}"
+    else:
+        seed_str = f"{seed}_{index}"
     seed_hash = hashlib.md5(seed_str.encode()).hexdigest()
 
     # 使用哈希值作为随机种子,确保可重现但唯一
@@ -133,8 +138,24 @@ def get_resolution_scale_params(original_width: int, original_height: int,
         'scale_ratio': scale_ratio
     }
 
+def escape_filter_value(value: str) -> str:
+    """
+    转义ffmpeg滤镜参数中的路径等值（如 ass= 的字幕路径和 fontsdir=）
+
+    先按滤镜选项值转义 \\ ' :，再按滤镜图描述转义 \\ ' [ ] , ;
+
+    Args:
+        value: 原始值
+
+    Returns:
+        str: 可以直接放入 -vf 参数的值
+    """
+    value = re.sub(r"([\\':])", r"\\\1", str(value))
+    return re.sub(r"([\\'\[\],;])", r"\\\1", value)
+
 def build_uniqueness_filters(uniqueness_params: dict, scale_params: dict = None,
-                               crop_filter: str = None, ass_file: str = None):
+                               crop_filter: str = None, ass_file: str = None,
+                               fontsdir: str = None):
     """
     构建完整的视频滤镜链,包含唯一性处理
 
@@ -143,6 +164,7 @@ def build_uniqueness_filters(uniqueness_params: dict, scale_params: dict = None,
         scale_params: 缩放参数 (可选)
         crop_filter: 裁剪滤镜 (可选)
         ass_file: ASS字幕文件路径 (可选)
+        fontsdir: ASS字幕使用的字体目录 (可选)
 
     Returns:
         str: 完整的ffmpeg滤镜链
@@ -169,7 +191,10 @@ def build_uniqueness_filters(uniqueness_params: dict, scale_params: dict = None,
 
     # 5. ASS字幕 (最后添加)
     if ass_file:
-        filters.append(f"ass={ass_file}")
+        ass_filter = f"ass={escape_filter_value(ass_file)}"
+        if fontsdir:
+            ass_filter += f":fontsdir={escape_filter_value(fontsdir)}"
+        filters.append(ass_filter)
 
     return ",".join(filters)
 
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+人声分离缓存
+Vocal Stem Cache for Demucs Runs
+
+Isolating vocals with Demucs is by far the most expensive preprocessing step on CPU
+and its output only depends on the media content and the Demucs options. This module
+stores the separated vocals as 16 kHz mono WAV files keyed by
+(media fingerprint, demucs options), so re-transcriptions with other decoding
+options, and other backends, can reuse them.
+"""
+
+import logging
+import tempfile
+import wave
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+
+from subsai.disk_cache import DiskCache, StripedLocks, file_fingerprint, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+# 人声文件格式版本，输出格式变化时递增以使旧条目失效
+VOCAL_FORMAT_VERSION = 1
+VOCAL_SUFFIX = '.wav'
+# Whisper系列模型的输入采样率
+VOCAL_SAMPLE_RATE = 16000
+DEFAULT_VOCAL_CACHE_DIR = Path(tempfile.gettempdir()) / 'subsai' / 'vocals'
+
+
+def _write_wav(path: Union[str, Path], samples: np.ndarray, sample_rate: int):
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+
+class VocalStemCache:
+    """
+    Demucs人声分离结果的磁盘缓存
+
+    条目是16kHz单声道WAV，任何通过ffmpeg读取音频的后端都可以直接使用。
+    """
+
+    def __init__(self, cache_dir: Union[str, Path] = DEFAULT_VOCAL_CACHE_DIR, max_size_gb: float = 10.0):
+        """
+        初始化人声缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_size_gb: 磁盘预算（GB），超出后按LRU淘汰
+        """
+        self.cache = DiskCache(cache_dir, int(max_size_gb * 1024 ** 3))
+        # 同一进程内对同一键的并发请求只分离一次
+        self._key_locks = StripedLocks()
+
+    def cache_key(self, media_file: str, demucs_options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        计算人声缓存键
+
+        Args:
+            media_file: 媒体文件路径
+            demucs_options: 传给 `stable_whisper.audio.demucs_audio` 的选项
+
+        Returns:
+            缓存键
+        """
+        # device只影响运行位置，不影响结果
+        options = {k: v for k, v in (demucs_options or {}).items() if k != 'device'}
+        return make_cache_key(VOCAL_FORMAT_VERSION, file_fingerprint(media_file), 'htdemucs', options)
+
+    def get_or_create(self,
+                      media_file: str,
+                      demucs_options: Optional[Dict[str, Any]] = None,
+                      verbose: Optional[bool] = None) -> Optional[str]:
+        """
+        返回分离后的人声WAV路径，未命中时先运行Demucs
+
+        Args:
+            media_file: 媒体文件路径
+            demucs_options: Demucs选项（如 shifts、overlap、device）
+            verbose: 是否显示Demucs进度（None不显示）
+
+        Returns:
+            人声WAV文件的绝对路径，人声超过磁盘预算时返回None（由调用方自行分离）
+        """
+        key = self.cache_key(media_file, demucs_options)
+
+        with self._key_locks.for_key(key):
+            cached = self.cache.get(key, VOCAL_SUFFIX)
+            if cached is not None:
+                logger.info(f"♻️ 命中人声缓存: {cached.name}")
+                return str(cached.resolve())
+
+            from stable_whisper.audio import demucs_audio
+
+            logger.info(f"🎤 Demucs人声分离: {media_file}")
+            vocals = demucs_audio(str(media_file),
+                                  output_sr=VOCAL_SAMPLE_RATE,
+                                  verbose=verbose,
+                                  **(demucs_options or {}))
+            temp_path = self.cache.temp_path(VOCAL_SUFFIX)
+            try:
+                _write_wav(temp_path, vocals.cpu().numpy(), VOCAL_SAMPLE_RATE)
+            except Exception:
+                self.cache.discard(temp_path)
+                raise
+
+            final_path = self.cache.commit(temp_path, key, VOCAL_SUFFIX)
+            if final_path is None:
+                return None
+            logger.info(f"💾 人声已缓存: {final_path.name} ({final_path.stat().st_size / (1024 * 1024):.1f} MB)")
+            return str(final_path.resolve())
+
+
+@lru_cache(maxsize=8)
+def get_vocal_stem_cache(cache_dir: Optional[str] = None, max_size_gb: float = 10.0) -> VocalStemCache:
+    """
+    返回进程内共享的人声缓存（同一目录共用键锁，避免重复分离）
+
+    Args:
+        cache_dir: 缓存目录（None使用系统临时目录下的 subsai/vocals）
+        max_size_gb: 磁盘预算（GB）
+
+    Returns:
+        VocalStemCache
+    """
+    return VocalStemCache(cache_dir or DEFAULT_VOCAL_CACHE_DIR, max_size_gb)
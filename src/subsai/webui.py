@@ -6,6 +6,7 @@ Subs AI Web User Interface (webui)
 """
 
 import importlib
+import io
 import json
 import mimetypes
 import os.path
@@ -51,6 +52,18 @@ subs_ai = SubsAI()
 tools = Tools()
 
 
+@st.cache_resource
+def _get_mezzanine_cache():
+    """
+    Shared mezzanine cache used to speed up karaoke re-renders of the same video
+
+    :return: MezzanineCache instance
+    """
+    from subsai.mezzanine_cache import MezzanineCache
+    cache_dir = Path(tempfile.gettempdir()) / 'subsai' / 'mezzanine'
+    return MezzanineCache(cache_dir, max_size_gb=float(os.environ.get('SUBSAI_MEZZANINE_CACHE_GB', '20')))
+
+
 def _get_key(model_name: str, config_name: str) -> str:
     """
     a simple helper method to generate unique key for configs UI
@@ -679,6 +692,9 @@ def webui() -> None:
                 else:
                     aspect_ratio = None
 
+            use_mezzanine_cache = st.checkbox('Cache Scaled Source', value=True,
+                                              help='缓存缩放/裁剪后的中间视频，换样式重新渲染时只需叠加字幕并编码')
+
             # 使用当前字幕生成卡拉OK视频
             media_file = Path(file_path)
             karaoke_output_filename = st.text_input(
@@ -699,31 +715,39 @@ def webui() -> None:
 
                             # 生成卡拉OK字幕
                             st.info(f"📝 Converting to karaoke format (style: {selected_style}, fontsize: {font_size or 'default'}, position: {vertical_margin or 'default'}px, aspect_ratio: {aspect_ratio or 'original'})...")
-                            karaoke_subs = create_karaoke_subtitles(
-                                subs=subs,
+                            # 生成器保存在会话中：只修改样式时复用已计算的分行和\\k标签
+                            karaoke_params = dict(
                                 style_name=selected_style,
                                 words_per_line=words_per_line,
                                 fontsize=font_size,
                                 vertical_margin=vertical_margin
                             )
+                            generator = st.session_state.get('karaoke_generator')
+                            if generator is None:
+                                generator = st.session_state['karaoke_generator'] = KaraokeGenerator(**karaoke_params)
+                            else:
+                                generator.update(**karaoke_params)
+                            karaoke_ass = io.StringIO()
+                            event_count = generator.write_ass(subs, karaoke_ass)
 
-                            if karaoke_subs is None or len(karaoke_subs) == 0:
+                            if event_count == 0:
                                 st.error("❌ Failed to generate karaoke subtitles")
                             else:
-                                st.info(f"✅ Generated {len(karaoke_subs)} karaoke subtitle events")
+                                st.info(f"✅ Generated {event_count} karaoke subtitle events")
 
                                 # 保存ASS字幕文件
                                 karaoke_ass_file = media_file.parent / f"{karaoke_output_filename}.ass"
-                                karaoke_subs.save(str(karaoke_ass_file))
+                                karaoke_ass_file.write_text(karaoke_ass.getvalue(), encoding='utf-8')
                                 st.success(f"💾 Karaoke subtitles saved: {karaoke_ass_file}")
 
                                 # 烧录到视频（使用专用卡拉OK烧录方法，支持宽高比裁剪）
                                 st.info(f"🎬 Burning karaoke subtitles to video (using ffmpeg with ASS support{', cropping to ' + aspect_ratio if aspect_ratio else ''})...")
                                 karaoke_video_path = tools.burn_karaoke_subtitles(
-                                    subs=karaoke_subs,
+                                    subs=karaoke_ass.getvalue(),
                                     media_file=str(media_file.resolve()),
                                     output_filename=karaoke_output_filename,
-                                    aspect_ratio=aspect_ratio
+                                    aspect_ratio=aspect_ratio,
+                                    mezzanine_cache=_get_mezzanine_cache() if use_mezzanine_cache else None
                                 )
 
                                 st.success(f'🎉 Karaoke video generated successfully!')
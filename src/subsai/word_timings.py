@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+紧凑的词级时间戳
+Compact Word-level Timings
+
+Word-level backends produce one `SSAEvent` per word, and the karaoke generator used
+to re-split the event text and rebuild a list of dicts. `WordTimings` keeps the same
+information in flat arrays (start/end in milliseconds, segment index) plus a token
+list, and can travel with the `SSAFile` returned by a backend.
+"""
+
+from array import array
+from typing import Any, Dict, Iterator, List, Optional
+
+from pysubs2 import SSAFile, SSAEvent
+
+# 挂载在SSAFile上的属性名
+WORD_TIMINGS_ATTR = 'word_timings'
+_SIGNATURE_ATTR = '_word_timings_signature'
+
+
+class WordTimings:
+    """
+    数组存储的词级时间戳
+
+    Attributes:
+        starts: 每个词的开始时间（毫秒，array('i')）
+        ends: 每个词的结束时间（毫秒，array('i')）
+        tokens: 每个词的文本
+        segments: 每个词所属的句子/片段序号（array('i')）
+    """
+
+    __slots__ = ('starts', 'ends', 'tokens', 'segments')
+
+    def __init__(self):
+        self.starts = array('i')
+        self.ends = array('i')
+        self.tokens: List[str] = []
+        self.segments = array('i')
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def append(self, token: str, start: int, end: int, segment: int = 0):
+        """
+        追加一个词（空文本会被忽略）
+
+        Args:
+            token: 词文本
+            start: 开始时间（毫秒）
+            end: 结束时间（毫秒）
+            segment: 所属片段序号
+        """
+        token = token.strip()
+        if not token:
+            return
+        self.tokens.append(token)
+        self.starts.append(int(start))
+        self.ends.append(int(end))
+        self.segments.append(segment)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self.tokens)):
+            yield {"word": self.tokens[i], "start": self.starts[i], "end": self.ends[i]}
+
+    def to_word_list(self) -> List[Dict[str, Any]]:
+        """转换为 [{"word": str, "start": int, "end": int}, ...] 列表"""
+        return list(self)
+
+    @classmethod
+    def from_word_list(cls, words: List[Dict[str, Any]]) -> 'WordTimings':
+        """
+        从词级时间戳列表创建
+
+        Args:
+            words: [{"word": str, "start": int, "end": int, "segment": int(可选)}, ...]
+
+        Returns:
+            WordTimings对象
+        """
+        timings = cls()
+        for word in words:
+            timings.append(word["word"], word["start"], word["end"], word.get("segment", 0))
+        return timings
+
+    @classmethod
+    def from_ssafile(cls, subs: SSAFile) -> 'WordTimings':
+        """
+        从SSAFile创建：每个事件按空格分词，事件时长在词之间均分
+
+        Args:
+            subs: pysubs2 SSAFile对象
+
+        Returns:
+            WordTimings对象
+        """
+        timings = cls()
+        for segment, event in enumerate(subs):
+            word_list = event.text.split()
+            if not word_list:
+                continue
+
+            word_duration = (event.end - event.start) / len(word_list)
+            for i, word in enumerate(word_list):
+                timings.tokens.append(word)
+                timings.starts.append(event.start + int(i * word_duration))
+                timings.ends.append(event.start + int((i + 1) * word_duration))
+                timings.segments.append(segment)
+        return timings
+
+    def to_ssafile(self) -> SSAFile:
+        """转换为每个词一个事件的SSAFile"""
+        subs = SSAFile()
+        for i, token in enumerate(self.tokens):
+            subs.append(SSAEvent(start=self.starts[i], end=self.ends[i], text=token))
+        return subs
+
+
+def subs_signature(subs: SSAFile) -> int:
+    """
+    计算字幕事件内容的签名（时间和文本），用于判断字幕是否被修改
+
+    Args:
+        subs: SSAFile对象
+
+    Returns:
+        签名（整数）
+    """
+    return hash(tuple((event.start, event.end, event.text) for event in subs))
+
+
+def attach_word_timings(subs: SSAFile, timings: WordTimings) -> SSAFile:
+    """
+    将词级时间戳挂载到后端返回的SSAFile上
+
+    Args:
+        subs: 后端生成的SSAFile
+        timings: 与之对应的词级时间戳
+
+    Returns:
+        同一个SSAFile对象
+    """
+    setattr(subs, WORD_TIMINGS_ATTR, timings)
+    setattr(subs, _SIGNATURE_ATTR, subs_signature(subs))
+    return subs
+
+
+def get_word_timings(subs: SSAFile) -> Optional[WordTimings]:
+    """
+    获取挂载在SSAFile上的词级时间戳
+
+    字幕在挂载之后被修改（平移、编辑文本等）时返回None，调用方应回退到从事件中提取。
+
+    Args:
+        subs: SSAFile对象
+
+    Returns:
+        WordTimings对象或None
+    """
+    timings = getattr(subs, WORD_TIMINGS_ATTR, None)
+    if timings is None or getattr(subs, _SIGNATURE_ATTR, None) != subs_signature(subs):
+        return None
+    return timings
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分阶段工作槽与模型池
+Stage Slots and Model Pool for the Batch Service
+
+Every file of every job goes through the same stages (ASR, karaoke generation,
+ffmpeg encode). Each stage has its own fixed number of slots, so one file's encode
+overlaps the next file's transcription and concurrent jobs cannot oversubscribe the
+cores. Transcription models are pooled per (model name, config) and reused across
+jobs instead of being loaded once per job.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class StageSlots:
+    """
+    一个处理阶段的并发槽（asyncio信号量），并统计占用情况
+    """
+
+    def __init__(self, name: str, capacity: int):
+        """
+        初始化阶段槽
+
+        Args:
+            name: 阶段名称（asr/karaoke/encode）
+            capacity: 并发槽数量
+        """
+        self.name = name
+        self.capacity = max(1, int(capacity))
+        self._semaphore = asyncio.Semaphore(self.capacity)
+        self.busy = 0
+        self.waiting = 0
+        self.completed = 0
+        self._busy_seconds = 0.0
+        self._busy_since = 0.0  # busy > 0 期间，上一次结算占用时间的时刻
+        self._started_at = time.monotonic()
+
+    def _settle(self):
+        now = time.monotonic()
+        if self.busy:
+            self._busy_seconds += self.busy * (now - self._busy_since)
+        self._busy_since = now
+
+    @asynccontextmanager
+    async def acquire(self):
+        """占用一个槽，直到退出上下文"""
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self._settle()
+        self.busy += 1
+        try:
+            yield self
+        finally:
+            self._settle()
+            self.busy -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回槽的使用情况
+
+        Returns:
+            容量、占用数、排队数、完成数，以及启动以来的平均利用率（0~1）
+        """
+        self._settle()
+        elapsed = max(time.monotonic() - self._started_at, 1e-9)
+        return {
+            'capacity': self.capacity,
+            'busy': self.busy,
+            'waiting': self.waiting,
+            'completed': self.completed,
+            'busy_seconds': round(self._busy_seconds, 1),
+            'utilisation': round(self._busy_seconds / (self.capacity * elapsed), 4),
+        }
+
+
+class ModelPool:
+    """
+    转录模型池（线程安全）
+
+    同一 (模型名, 配置) 的空闲实例被复用；实例总数超过上限时淘汰最久未用的空闲实例。
+    正在使用的实例不会被淘汰，因此池的实际大小可能暂时超过上限。
+    """
+
+    def __init__(self, max_models: int = 1):
+        """
+        初始化模型池
+
+        Args:
+            max_models: 最多保留的模型实例数
+        """
+        self.max_models = max(1, int(max_models))
+        self._idle: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def _idle_count(self) -> int:
+        return sum(len(models) for models in self._idle.values())
+
+    def _evict(self, reserve: int):
+        # 为即将加载的实例腾出位置（调用时已持有锁）
+        while self._idle and self._idle_count() + self._in_use + reserve > self.max_models:
+            key, models = next(iter(self._idle.items()))
+            models.pop(0)
+            if not models:
+                del self._idle[key]
+            self.evictions += 1
+            logger.info(f"🗑️ 模型池淘汰空闲模型: {key[:12]}")
+
+    def acquire(self, key: str, factory: Callable[[], Any]) -> Any:
+        """
+        取出一个模型实例，没有空闲实例时用factory加载
+
+        Args:
+            key: 模型键（模型名和配置的哈希）
+            factory: 加载模型的函数
+
+        Returns:
+            模型实例（用完后必须调用 :meth:`release`）
+        """
+        with self._lock:
+            models = self._idle.get(key)
+            if models:
+                model = models.pop()
+                if not models:
+                    del self._idle[key]
+                self._in_use += 1
+                self.hits += 1
+                return model
+            self._evict(reserve=1)
+            self._in_use += 1
+            self.loads += 1
+        try:
+            return factory()
+        except BaseException:
+            with self._lock:
+                self._in_use -= 1
+            raise
+
+    def release(self, key: str, model: Any):
+        """
+        归还模型实例
+
+        Args:
+            key: 模型键
+            model: acquire 返回的实例
+        """
+        with self._lock:
+            self._in_use -= 1
+            self._idle.setdefault(key, []).append(model)
+            self._idle.move_to_end(key)
+            self._evict(reserve=0)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回模型池的命中、加载和淘汰次数及当前实例数"""
+        with self._lock:
+            return {
+                'max_models': self.max_models,
+                'idle': self._idle_count(),
+                'in_use': self._in_use,
+                'hits': self.hits,
+                'loads': self.loads,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for cost-based admission control
+
+"""
+from unittest import TestCase
+
+from subsai.admission import AdmissionController, CostModel, cost_model_key, estimate_finish_s
+
+
+def queued(job_id, status='pending', priority=1, client_id='a', asr_s=0.0, encode_s=0.0, progress=0):
+    return {'job_id': job_id, 'status': status, 'priority': priority, 'client_id': client_id, 'progress': progress,
+            'estimated_asr_s': asr_s, 'estimated_encode_s': encode_s}
+
+
+class TestCostModel(TestCase):
+
+    def test_estimate_uses_model_and_preset(self):
+        model = CostModel(encode_rtf=0.5)
+        key = cost_model_key('openai/whisper', {'model_type': 'large-v3'})
+        asr_s, encode_s = model.estimate([100, None], key, 'medium')
+        self.assertAlmostEqual(asr_s, (100 + 300) * 0.5)
+        self.assertAlmostEqual(encode_s, (100 + 300) * 0.5)
+        # 更快的预设编码成本更低；复用转录时没有转录成本
+        self.assertLess(model.estimate([100], None, 'veryfast')[1], model.estimate([100], None, 'slow')[1])
+        self.assertEqual(model.estimate([100], None, None), (0.0, 0.0))
+
+    def test_observations_replace_defaults(self):
+        model = CostModel(alpha=0.5)
+        model.observe_transcribe('openai/whisper:base', 100, 50)
+        self.assertAlmostEqual(model.transcribe_rtf('openai/whisper:base'), 0.5)
+        model.observe_transcribe('openai/whisper:base', 100, 100)
+        self.assertAlmostEqual(model.transcribe_rtf('openai/whisper:base'), 0.75)
+        # 按slow预设实测的速度换算到medium
+        model.observe_encode('slow', 100, 100)
+        self.assertLess(model.encode_rtf('medium'), 1.0)
+        model.observe_transcribe('openai/whisper:base', None, 10)
+        self.assertEqual(model.stats()['observations'], {'transcribe': 2, 'encode': 1})
+
+
+class TestAdmissionController(TestCase):
+
+    def setUp(self):
+        self.admission = AdmissionController({'asr': 1, 'encode': 2}, max_backlog_s=1000, max_client_backlog_s=1500)
+
+    def test_finish_estimate_takes_slowest_stage(self):
+        jobs = [queued('a', asr_s=300, encode_s=1000), queued('b', asr_s=100, encode_s=0, progress=50)]
+        self.assertEqual(estimate_finish_s(jobs, {'asr': 1, 'encode': 2}), 500)
+
+    def test_empty_queue_accepts_any_job(self):
+        decision = self.admission.decide([], (5000, 0), 'a', priority=1)
+        self.assertEqual((decision['action'], decision['eta_s']), ('accept', 5000))
+
+    def test_over_capacity_rejects_or_defers(self):
+        jobs = [queued('a', status='processing', client_id='x', asr_s=900)]
+        decision = self.admission.decide(jobs, (200, 0), 'b', priority=1)
+        self.assertEqual(decision['action'], 'reject')
+        self.assertEqual(decision['retry_after_s'], 100)
+        self.assertEqual(self.admission.decide(jobs, (200, 0), 'b', priority=1, allow_defer=True)['action'], 'defer')
+
+        deferred = queued('d', status='deferred', client_id='b', asr_s=200)
+        self.assertFalse(self.admission.can_start(jobs + [deferred], deferred))
+        jobs[0]['progress'] = 50
+        self.assertTrue(self.admission.can_start(jobs + [deferred], deferred))
+
+    def test_higher_priority_skips_lower_priority_backlog(self):
+        jobs = [queued('a', priority=2, client_id='x', asr_s=900)]
+        self.assertEqual(self.admission.decide(jobs, (200, 0), 'b', priority=2)['action'], 'reject')
+        decision = self.admission.decide(jobs, (200, 0), 'b', priority=0)
+        self.assertEqual((decision['action'], decision['eta_s']), ('accept', 200))
+
+    def test_client_share(self):
+        jobs = [queued('a', client_id='a', asr_s=400)]
+        decision = self.admission.decide(jobs, (2000, 0), 'a', priority=0)
+        self.assertEqual((decision['action'], decision['reason']), ('reject', 'client_share'))
+        # 其他客户端不受影响
+        self.assertEqual(self.admission.decide(jobs, (500, 0), 'b', priority=0)['action'], 'accept')
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the forced alignment helpers
+
+"""
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from subsai.alignment import ForcedAligner, SAMPLE_RATE, _fill_unaligned, parse_lyrics
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+
+class FakeFrontEnd:
+    """与MMS_FA的卷积前端相同的输出帧数：感受野400采样、步长320，输入更短时报错"""
+
+    def __init__(self):
+        self.lengths = []
+
+    def __call__(self, waveform):
+        length = waveform.size(1)
+        self.lengths.append(length)
+        if length < 400:
+            raise RuntimeError('input is smaller than the kernel size')
+        return torch.zeros(1, (length - 400) // 320 + 1, 29), None
+
+
+class TestAlignment(TestCase):
+
+    def test_unaligned_words_fill_gaps_between_neighbours(self):
+        starts = [None, 1000, None, None, 2000, None]
+        ends = [None, 1200, None, None, 2400, None]
+        _fill_unaligned(starts, ends, lower=800, upper=3000)
+        self.assertEqual(starts, [800, 1000, 1200, 1600, 2000, 2400])
+        self.assertEqual(ends, [1000, 1200, 1600, 2000, 2400, 3000])
+
+    def test_nothing_aligned_spreads_over_segment(self):
+        starts, ends = [None] * 4, [None] * 4
+        _fill_unaligned(starts, ends, lower=0, upper=1000)
+        self.assertEqual(starts, [0, 250, 500, 750])
+        self.assertEqual(ends, [250, 500, 750, 1000])
+
+    def test_parse_lyrics_skips_blank_lines_and_lrc_tags(self):
+        lyrics = "[00:12.34]Twinkle twinkle little star\n\n  \n[00:15.00][01:02.5] How I wonder  what you are\r\n我们 一起唱"
+        self.assertEqual(parse_lyrics(lyrics), [['Twinkle', 'twinkle', 'little', 'star'],
+                                                ['How', 'I', 'wonder', 'what', 'you', 'are'],
+                                                ['我们', '一起唱']])
+
+    def test_align_lyrics_falls_back_when_aligner_fails(self):
+        class BrokenAligner(ForcedAligner):
+            def align_words(self, audio, words, offset_ms=0):
+                raise RuntimeError('model failed')
+
+        audio = np.zeros(4 * SAMPLE_RATE, dtype=np.float32)
+        timings = BrokenAligner().align_lyrics('song.mp3', 'la la\nla la', audio=audio)
+        self.assertEqual(list(timings.starts), [0, 1000, 2000, 3000])
+        self.assertEqual(list(timings.segments), [0, 0, 1, 1])
+
+    @unittest.skipIf(torch is None, 'torch is not installed')
+    def test_short_tail_is_merged_into_previous_chunk(self):
+        aligner = ForcedAligner()
+        aligner._model = FakeFrontEnd()
+        emission = aligner._emission(np.zeros(30 * SAMPLE_RATE + 100, dtype=np.float32))
+        self.assertEqual(aligner._model.lengths, [30 * SAMPLE_RATE + 100])
+        self.assertEqual(emission.size(0), (30 * SAMPLE_RATE + 100 - 400) // 320 + 1)
+
+        # 比感受野还短的整段音频补零后得到一帧
+        aligner._model = FakeFrontEnd()
+        self.assertEqual(aligner._emission(np.zeros(100, dtype=np.float32)).size(0), 1)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the batch processing service (needs fastapi and ffmpeg-python)
+
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+import uuid
+from pathlib import Path
+from unittest import TestCase, mock
+
+from pysubs2 import SSAEvent, SSAFile
+
+# 导入时会打开任务数据库，测试用临时文件
+os.environ.setdefault('SUBSAI_JOB_DB', os.path.join(tempfile.mkdtemp(), 'jobs.db'))
+try:
+    from subsai import api_service
+except ImportError:
+    api_service = None
+
+if api_service is not None:
+    from subsai.cancellation import CancellationToken, JobCancelled
+    from subsai.job_store import JobStore
+    from subsai.result_cache import ResultCache
+    from subsai.upload_store import UploadStore
+
+
+@unittest.skipIf(api_service is None, 'fastapi or ffmpeg-python is not installed')
+class TestRenderCache(TestCase):
+
+    # 假烧录报告的截止时间是否换用了其他预设
+    deadline_adjusted = False
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name)
+        self.video = self.root / 'song.mp4'
+        self.video.write_bytes(b'video' * 100)
+        self.transcribe_calls = 0
+        self.burns = []
+
+        self.patches = [
+            mock.patch.object(api_service, 'OUTPUT_DIR', self.root / 'outputs'),
+            mock.patch.object(api_service, 'result_cache', ResultCache(self.root / 'results')),
+            mock.patch.object(api_service, 'job_store', JobStore(self.root / 'jobs.db')),
+            mock.patch.object(api_service, 'upload_store', UploadStore(self.root / 'uploads', self.root / 'jobs.db')),
+            mock.patch.object(api_service, 'transcribe_with_pool', self.transcribe),
+            mock.patch.object(api_service, 'build_karaoke_ass', lambda subs, config: ('[Script Info]\n', len(subs))),
+            mock.patch.object(api_service, 'probe_media_duration', lambda media_file: 10.0),
+            mock.patch.object(api_service.Tools, 'burn_karaoke_subtitles', self.burn),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.tmp_dir.cleanup()
+
+    def transcribe(self, model_name, model_config, media_file, cancel_token=None, segment_callback=None):
+        self.transcribe_calls += 1
+        subs = SSAFile()
+        subs.append(SSAEvent(start=0, end=1000, text='hello world'))
+        return subs
+
+    def burn(self, subs, media_file, output_filename, enable_uniqueness=True, uniqueness_seed=None,
+             encode_report=None, **kwargs):
+        # 与真实烧录一致：启用唯一性时预设被随机替换，并记录在编码报告中
+        self.burns.append(uniqueness_seed)
+        output = Path(media_file).parent / f"{output_filename}.mp4"
+        output.write_bytes(f'render {uniqueness_seed}'.encode())
+        encode_report.update(preset='slower' if enable_uniqueness else kwargs['preset'],
+                             deadline_adjusted=self.deadline_adjusted)
+        return str(output)
+
+    def process(self, config):
+        job_id = uuid.uuid4().hex
+        job = api_service.job_store.create(job_id, [str(self.video)], config.dict())
+        (api_service.OUTPUT_DIR / job_id).mkdir(parents=True)
+        return asyncio.run(api_service.process_video_file(job_id, 0, self.video, config, {}, job, 1,
+                                                          CancellationToken()))
+
+    def test_default_config_hits_render_cache(self):
+        config = api_service.ProcessConfig()
+        first = self.process(config)
+        second = self.process(config)
+
+        self.assertEqual(first['encode']['preset'], 'slower')
+        self.assertEqual(second['encode'], {'cached': True})
+        self.assertEqual(self.transcribe_calls, 1)
+        self.assertEqual(len(self.burns), 1)
+        # 唯一性参数由渲染键派生，缓存的成品就是这个请求会得到的成品
+        self.assertIsNotNone(self.burns[0])
+
+    def test_uniqueness_seed_is_part_of_the_key(self):
+        self.process(api_service.ProcessConfig(uniqueness_seed=1))
+        self.process(api_service.ProcessConfig(uniqueness_seed=2))
+        self.process(api_service.ProcessConfig(uniqueness_seed=2))
+        self.assertEqual(self.burns, [1, 2])
+
+    def test_deadline_adjusted_render_is_not_cached(self):
+        self.deadline_adjusted = True
+        config = api_service.ProcessConfig(enable_uniqueness=False)
+        self.process(config)
+        self.process(config)
+        self.assertEqual(len(self.burns), 2)
+        self.assertEqual(self.transcribe_calls, 1)
+
+
+@unittest.skipIf(api_service is None, 'fastapi or ffmpeg-python is not installed')
+class TestRunFfmpeg(TestCase):
+
+    def test_cancel_callback_is_removed(self):
+        token = CancellationToken()
+        for _ in range(3):
+            returncode, _ = asyncio.run(api_service.run_ffmpeg([sys.executable, '-c', 'pass'], cancel_token=token))
+            self.assertEqual(returncode, 0)
+        self.assertEqual(token._callbacks, [])
+
+    def test_cancel_terminates_process(self):
+        token = CancellationToken()
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.2, token.cancel)
+            await api_service.run_ffmpeg([sys.executable, '-c', 'import time; time.sleep(30)'], cancel_token=token)
+
+        with self.assertRaises(JobCancelled):
+            asyncio.run(main())
+        self.assertEqual(token._callbacks, [])
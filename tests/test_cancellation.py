@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for cooperative cancellation tokens
+
+"""
+import threading
+from unittest import TestCase
+
+from subsai.cancellation import CancellationToken, JobCancelled
+
+
+class TestCancellationToken(TestCase):
+
+    def test_cancel_runs_callbacks_once(self):
+        token = CancellationToken()
+        calls = []
+        token.add_callback(lambda: calls.append('first'))
+        token.raise_if_cancelled()
+
+        token.cancel('deleted')
+        token.cancel('cancelled')
+
+        self.assertTrue(token.cancelled)
+        self.assertEqual(token.reason, 'deleted')
+        self.assertEqual(calls, ['first'])
+        # 已取消时注册的回调立即执行
+        token.add_callback(lambda: calls.append('late'))
+        self.assertEqual(calls, ['first', 'late'])
+
+    def test_removed_callback_is_not_called(self):
+        token = CancellationToken()
+        calls = []
+        remove = token.add_callback(lambda: calls.append('removed'))
+        token.add_callback(lambda: calls.append('kept'))
+        remove()
+        remove()
+
+        token.cancel()
+        self.assertEqual(calls, ['kept'])
+        # 已取消后注册得到的注销函数什么也不做
+        token.add_callback(lambda: calls.append('late'))()
+        self.assertEqual(calls, ['kept', 'late'])
+
+    def test_raise_if_cancelled(self):
+        token = CancellationToken()
+        token.cancel()
+        with self.assertRaises(JobCancelled) as context:
+            token.raise_if_cancelled()
+        self.assertEqual(str(context.exception), 'cancelled')
+
+    def test_cancel_from_another_thread(self):
+        token = CancellationToken()
+        stopped = threading.Event()
+
+        def worker():
+            # 模拟逐窗口解码：每个窗口之间检查取消标记
+            try:
+                while True:
+                    token.raise_if_cancelled()
+                    token._event.wait(0.01)
+            except JobCancelled:
+                stopped.set()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        token.cancel()
+        thread.join(timeout=1)
+        self.assertTrue(stopped.is_set())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the disk cache module
+
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from subsai.disk_cache import DiskCache, StripedLocks, file_fingerprint, make_cache_key
+
+
+class TestDiskCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(Path(self.tmp_dir.name) / 'cache', max_size_bytes=350)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_and_get(self):
+        key = make_cache_key('fingerprint', 'scale=1920:1080', None)
+        self.assertIsNone(self.cache.get(key, '.bin'))
+        self.cache.put_bytes(key, b'x' * 10, '.bin')
+        self.assertEqual(self.cache.get(key, '.bin').read_bytes(), b'x' * 10)
+
+    def test_evicts_least_recently_used(self):
+        keys = [make_cache_key(i) for i in range(3)]
+        for i, key in enumerate(keys):
+            path = self.cache.put_bytes(key, b'x' * 100, '.bin')
+            os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+        # 第一个条目被访问后不应被淘汰
+        self.cache.get(keys[0], '.bin')
+        self.cache.put_bytes(make_cache_key('new'), b'x' * 100, '.bin')
+        self.assertIsNotNone(self.cache.get(keys[0], '.bin'))
+        self.assertIsNone(self.cache.get(keys[1], '.bin'))
+        self.assertLessEqual(self.cache.total_size(), 350)
+
+    def test_refuses_entry_larger_than_budget(self):
+        key = make_cache_key('small')
+        self.cache.put_bytes(key, b'x' * 100, '.bin')
+        # 超过整个预算的条目不提交，也不淘汰已有条目
+        self.assertIsNone(self.cache.put_bytes(make_cache_key('huge'), b'x' * 400, '.bin'))
+        self.assertIsNone(self.cache.get(make_cache_key('huge'), '.bin'))
+        self.assertIsNotNone(self.cache.get(key, '.bin'))
+        self.assertEqual(list((self.cache.cache_dir / DiskCache.TMP_DIR_NAME).iterdir()), [])
+
+    def test_striped_locks_are_bounded(self):
+        locks = StripedLocks(stripes=4)
+        keys = [make_cache_key(i) for i in range(100)]
+        self.assertIs(locks.for_key(keys[0]), locks.for_key(keys[0]))
+        self.assertEqual(len({id(locks.for_key(key)) for key in keys}), 4)
+
+    def test_fingerprint_ignores_path(self):
+        first = Path(self.tmp_dir.name) / 'a.mp4'
+        second = Path(self.tmp_dir.name) / 'b.mp4'
+        first.write_bytes(b'media' * 1000)
+        second.write_bytes(b'media' * 1000)
+        self.assertEqual(file_fingerprint(first), file_fingerprint(second))
+        second.write_bytes(b'media' * 999 + b'other')
+        self.assertNotEqual(file_fingerprint(first), file_fingerprint(second))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for deadline-aware encoder preset planning
+
+"""
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from subsai.encode_planner import (
+    X264_PRESET_SPEED,
+    EncodeCalibration,
+    get_total_frames,
+    measure_encode_fps,
+    pixel_bucket,
+    plan_preset,
+)
+
+
+class TestPlanPreset(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.calibration = EncodeCalibration(Path(self.tmp_dir.name) / 'calibration.json')
+        self.bucket = pixel_bucket(1920, 1080)
+        self.probes = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def measure(self, preset):
+        self.probes.append(preset)
+        return 400.0
+
+    def test_probe_when_table_is_empty(self):
+        # veryfast 试编码 400fps -> medium 100fps、slow 60fps；1000帧在 20*0.85=17 秒内能完成的最慢预设是 slow
+        plan = plan_preset(20, 1000, 'libx264', self.bucket, self.calibration, self.measure)
+        self.assertEqual(self.probes, ['veryfast'])
+        self.assertEqual(plan['preset'], 'slow')
+        self.assertEqual(plan['fps_source'], 'probe')
+        self.assertAlmostEqual(plan['estimated_fps'], 400 * X264_PRESET_SPEED['slow'] / X264_PRESET_SPEED['veryfast'])
+
+    def test_calibration_avoids_probe(self):
+        # medium 实测 100fps（slow 换算为 60fps）；预算 12*0.85=10.2 秒
+        self.calibration.update('libx264', 'medium', self.bucket, 100.0)
+        plan = plan_preset(12, 1000, 'libx264', self.bucket, self.calibration, self.measure)
+        self.assertEqual(self.probes, [])
+        self.assertEqual(plan['preset'], 'medium')
+        self.assertEqual(plan['fps_source'], 'calibration')
+
+    def test_probe_time_is_taken_from_the_budget(self):
+        # 同上，但试编码用了0.5秒：预算 (20-0.5)*0.85=16.6 秒，slow 需要 16.7 秒
+        def slow_measure(preset):
+            time.sleep(0.5)
+            return self.measure(preset)
+
+        plan = plan_preset(20, 1000, 'libx264', self.bucket, self.calibration, slow_measure)
+        self.assertEqual(plan['preset'], 'medium')
+        self.assertGreaterEqual(plan['probe_s'], 0.5)
+
+    def test_impossible_deadline_picks_fastest(self):
+        plan = plan_preset(1, 100000, 'libx264', self.bucket, self.calibration, self.measure)
+        self.assertEqual(plan['preset'], 'ultrafast')
+
+    def test_probe_failure_propagates(self):
+        def failing(preset):
+            raise subprocess.CalledProcessError(1, ['ffmpeg'])
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            plan_preset(20, 1000, 'libx264', self.bucket, self.calibration, failing)
+
+
+class TestEncodeCalibration(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / 'nested' / 'calibration.json'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_update_smooths_and_persists(self):
+        calibration = EncodeCalibration(self.path, smoothing=0.5)
+        self.assertIsNone(calibration.get('libx264', 'fast', '2.0MP'))
+        calibration.update('libx264', 'fast', '2.0MP', 100.0)
+        calibration.update('libx264', 'fast', '2.0MP', 200.0)
+        self.assertAlmostEqual(calibration.get('libx264', 'fast', '2.0MP'), 150.0)
+        # 新实例从文件读取，按主机分表
+        table = json.loads(self.path.read_text(encoding='utf-8'))
+        self.assertEqual(list(table), [calibration.host])
+        self.assertAlmostEqual(EncodeCalibration(self.path).get('libx264', 'fast', '2.0MP'), 150.0)
+
+    def test_concurrent_updates_from_separate_instances(self):
+        # 每次烧录都新建实例：锁和临时文件不能按实例/进程区分
+        errors = []
+
+        def worker(preset):
+            try:
+                for _ in range(20):
+                    EncodeCalibration(self.path).update('libx264', preset, '2.0MP', 100.0)
+            except OSError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(preset,)) for preset in ('fast', 'medium', 'slow', 'slower')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        calibration = EncodeCalibration(self.path)
+        for preset in ('fast', 'medium', 'slow', 'slower'):
+            self.assertAlmostEqual(calibration.get('libx264', preset, '2.0MP'), 100.0)
+        self.assertEqual([path.name for path in self.path.parent.iterdir()], [self.path.name])
+
+    def test_corrupt_file_is_ignored(self):
+        self.path.parent.mkdir(parents=True)
+        self.path.write_text('{not json', encoding='utf-8')
+        self.assertIsNone(EncodeCalibration(self.path).get('libx264', 'fast', '2.0MP'))
+
+
+class TestMeasureEncodeFps(TestCase):
+
+    def test_measure_runs_command(self):
+        fps = measure_encode_fps([sys.executable, '-c', 'pass'], 100)
+        self.assertGreater(fps, 0)
+
+    def test_failed_command_raises(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            measure_encode_fps([sys.executable, '-c', 'raise SystemExit(1)'], 100)
+
+    def test_runner_replaces_subprocess(self):
+        calls = []
+
+        def runner(cmd, pass_fds, env):
+            calls.append(cmd)
+            return (1, b'probe failed') if 'fail' in cmd else (0, b'')
+
+        self.assertGreater(measure_encode_fps(['ffmpeg', 'ok'], 100, ffmpeg_runner=runner), 0)
+        with self.assertRaises(subprocess.CalledProcessError) as context:
+            measure_encode_fps(['ffmpeg', 'fail'], 100, ffmpeg_runner=runner)
+        self.assertEqual(context.exception.stderr, b'probe failed')
+        self.assertEqual(calls, [['ffmpeg', 'ok'], ['ffmpeg', 'fail']])
+
+    def test_total_frames(self):
+        self.assertEqual(get_total_frames({'nb_frames': '250'}), 250)
+        self.assertEqual(get_total_frames({'avg_frame_rate': '25/1', 'duration': '10.0'}), 250)
+        self.assertIsNone(get_total_frames({'avg_frame_rate': '0/0', 'duration': '10.0'}))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for font resolution and filter-graph escaping
+
+"""
+import os
+import stat
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+from subsai import fonts
+from subsai.video_uniqueness import escape_filter_value
+
+# 假的 fc-match：记录每次调用；只认识 "Known Sans"，其他名字回退到 DejaVu Sans（与真实 fc-match 的行为一致）
+FC_MATCH_STUB = """#!/bin/sh
+echo "$3" >> "${0%/*}/calls"
+if [ "$3" = "Known Sans" ]; then
+    printf 'Known Sans,Known Sans Regular\\n/fonts/known.ttf'
+else
+    printf 'DejaVu Sans\\n/usr/share/fonts/DejaVuSans.ttf'
+fi
+"""
+
+
+class FakeStyle:
+
+    def __init__(self, fontname):
+        self.fontname = fontname
+
+    def get_fontname(self):
+        return self.fontname
+
+
+class TestResolveFont(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.tmp_dir.name)
+        bin_dir = root / 'bin'
+        bin_dir.mkdir()
+        self.calls_file = bin_dir / 'calls'
+        fc_match = bin_dir / 'fc-match'
+        fc_match.write_text(FC_MATCH_STUB)
+        fc_match.chmod(fc_match.stat().st_mode | stat.S_IEXEC)
+
+        self.patches = [
+            mock.patch.dict(os.environ, {'PATH': str(bin_dir)}),
+            mock.patch.object(fonts, 'FONTS_DIR', root / 'fonts'),
+            mock.patch.object(fonts, 'FONTCONFIG_CACHE_DIR', root / 'cache'),
+            mock.patch.object(fonts, 'FONTCONFIG_FILE', root / 'cache' / 'fonts.conf'),
+            mock.patch.dict(fonts._resolved_fonts, clear=True),
+            mock.patch.dict(fonts._unresolved_fonts, clear=True),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.tmp_dir.cleanup()
+
+    def test_exact_family_resolves(self):
+        self.assertEqual(fonts.resolve_font('Known Sans'), '/fonts/known.ttf')
+        self.assertTrue(fonts.FONTCONFIG_FILE.exists())
+
+    def test_fallback_family_is_unresolved(self):
+        self.assertIsNone(fonts.resolve_font('Missing Font'))
+
+    def test_missing_fc_match(self):
+        with mock.patch.dict(os.environ, {'PATH': self.tmp_dir.name}):
+            self.assertIsNone(fonts.resolve_font('Known Sans'))
+        # 解析失败不被记住，fc-match可用后立即解析成功
+        self.assertEqual(fonts.resolve_font('Known Sans'), '/fonts/known.ttf')
+
+    def fc_match_calls(self):
+        return self.calls_file.read_text().split('\n')[:-1] if self.calls_file.exists() else []
+
+    def test_unresolved_family_is_cached_until_fonts_change(self):
+        self.assertIsNone(fonts.resolve_font('Missing Font'))
+        self.assertIsNone(fonts.resolve_font('Missing Font'))
+        self.assertEqual(self.fc_match_calls(), ['Missing Font'])
+
+        # 放入新字体后字体目录的mtime改变，重新解析
+        (fonts.FONTS_DIR / 'missing.ttf').write_bytes(b'')
+        stat_result = fonts.FONTS_DIR.stat()
+        os.utime(fonts.FONTS_DIR, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1_000_000_000))
+        self.assertIsNone(fonts.resolve_font('Missing Font'))
+        self.assertEqual(self.fc_match_calls(), ['Missing Font', 'Missing Font'])
+
+        fonts.clear_font_cache()
+        self.assertIsNone(fonts.resolve_font('Missing Font'))
+        self.assertEqual(len(self.fc_match_calls()), 3)
+
+    def test_unresolved_cache_is_bounded(self):
+        with mock.patch.object(fonts, 'UNRESOLVED_FONTS_MAX', 2):
+            for name in ('One', 'Two', 'Three'):
+                fonts.resolve_font(name)
+        self.assertEqual(list(fonts._unresolved_fonts), ['Two', 'Three'])
+
+    def test_validate_style_fonts(self):
+        with self.assertLogs(fonts.logger, level='WARNING') as logs:
+            resolved = fonts.validate_style_fonts([FakeStyle('Known Sans'), FakeStyle('Missing Font'),
+                                                   FakeStyle('Known Sans')])
+        self.assertEqual(resolved, {'Known Sans': '/fonts/known.ttf', 'Missing Font': None})
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Missing Font', logs.output[0])
+
+
+class TestFilterEscaping(TestCase):
+
+    def test_escape_filter_value(self):
+        # ffmpeg文档中的例子：先转义选项值，再转义滤镜图描述
+        self.assertEqual(escape_filter_value("a 'b': c, d"), "a \\\\\\'b\\\\\\'\\\\: c\\, d")
+        self.assertEqual(escape_filter_value('/dev/fd/5'), '/dev/fd/5')
+        self.assertEqual(escape_filter_value('/data/fonts [v1]'), '/data/fonts \\[v1\\]')
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the per-job websocket event hub
+
+"""
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from subsai.job_events import ALL_JOBS, JobEventHub
+from subsai.job_store import JobStore
+
+
+class TestJobEventHub(TestCase):
+
+    def test_deltas_are_coalesced_and_filtered(self):
+        async def main():
+            hub = JobEventHub(min_interval=0.01)
+            job_messages, all_messages = [], []
+
+            async def job_send(message):
+                job_messages.append(message)
+
+            async def all_send(message):
+                all_messages.append(message)
+
+            hub.connect(job_send, ['a'])
+            hub.connect(all_send, [ALL_JOBS])
+            hub.publish('a', {'status': 'processing', 'progress': 0, 'output_files': []})
+            for progress in (10, 20, 30):
+                hub.publish('a', {'status': 'processing', 'progress': progress, 'output_files': []})
+            hub.publish('b', {'status': 'pending', 'progress': 0, 'output_files': []})
+            await asyncio.sleep(0.05)
+            return hub, job_messages, all_messages
+
+        hub, job_messages, all_messages = asyncio.run(main())
+
+        # 订阅单个任务：只收到该任务，且多次进度合并为一帧
+        self.assertEqual([m['job_id'] for m in job_messages], ['a'])
+        self.assertEqual(job_messages[0]['data'], {'status': 'processing', 'progress': 30, 'output_files': []})
+        # 订阅全部任务：收到所有任务的摘要（不含输出文件列表）
+        self.assertEqual(sorted(m['job_id'] for m in all_messages), ['a', 'b'])
+        self.assertTrue(all('output_files' not in m['data'] for m in all_messages))
+        self.assertGreater(hub.stats()['coalesced'], 0)
+
+    def test_failed_connection_is_removed(self):
+        async def main():
+            hub = JobEventHub(min_interval=0.01)
+
+            async def broken_send(message):
+                raise ConnectionError('gone')
+
+            hub.connect(broken_send, [ALL_JOBS])
+            hub.publish('a', {'status': 'pending'})
+            await asyncio.sleep(0.05)
+            return hub
+
+        self.assertEqual(asyncio.run(main()).stats()['connections'], 0)
+
+    def test_events_go_to_explicit_subscribers_only(self):
+        async def main():
+            hub = JobEventHub(min_interval=0.01)
+            job_messages, all_messages = [], []
+
+            async def job_send(message):
+                job_messages.append(message)
+
+            async def all_send(message):
+                all_messages.append(message)
+
+            hub.connect(job_send, ['a'])
+            hub.connect(all_send, [ALL_JOBS])
+            hub.send_event('a', {'type': 'transcript', 'job_id': 'a', 'segments': [{'text': 'hi'}]})
+            await asyncio.sleep(0.05)
+            return job_messages, all_messages
+
+        job_messages, all_messages = asyncio.run(main())
+        self.assertEqual([m['type'] for m in job_messages], ['transcript'])
+        self.assertEqual(all_messages, [])
+
+    def test_stale_state_is_not_published(self):
+        async def main():
+            hub = JobEventHub(min_interval=0.01)
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            hub.connect(send, ['a'])
+            self.assertEqual(hub.followed_jobs(), {'a'})
+            hub.publish('a', {'progress': 50, 'updated_at': '2026-01-01T00:00:02'})
+            # 轮询读到的较旧状态被忽略
+            hub.publish('a', {'progress': 40, 'updated_at': '2026-01-01T00:00:01'})
+            await asyncio.sleep(0.05)
+            return messages
+
+        messages = asyncio.run(main())
+        self.assertEqual([m['data']['progress'] for m in messages], [50])
+
+    def test_local_and_polled_states_mix(self):
+        # 本进程发布（get_event_state）与轮询发布（list_updated_since）交替：同一状态不重复推送
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = JobStore(Path(tmp_dir) / 'jobs.db')
+            store.create('a', ['a.mp4'], {}, status='processing')
+            since = '1970-01-01T00:00:00'
+
+            async def main():
+                hub = JobEventHub(min_interval=0.01)
+                messages = []
+
+                async def send(message):
+                    messages.append(message)
+
+                hub.connect(send, ['a'])
+                hub.publish('a', store.get_event_state('a'))
+                for job in store.list_updated_since(since):
+                    hub.publish(job['job_id'], job)
+                await asyncio.sleep(0.05)
+
+                store.update('a', progress=50)
+                for job in store.list_updated_since(since):
+                    hub.publish(job['job_id'], job)
+                hub.publish('a', store.get_event_state('a'))
+                await asyncio.sleep(0.05)
+
+                store.update('a', status='completed', progress=100, output_files=[{'name': 'a_karaoke.mp4'}])
+                hub.publish('a', store.get_event_state('a'))
+                await asyncio.sleep(0.05)
+                # 轮询在本进程发布结束状态后又读到同一行
+                for job in store.list_updated_since(since):
+                    hub.publish(job['job_id'], job)
+                await asyncio.sleep(0.05)
+                return messages
+
+            messages = asyncio.run(main())
+
+        self.assertEqual(len(messages), 3)
+        self.assertIn('output_files', messages[0]['data'])
+        self.assertEqual(set(messages[1]['data']), {'progress', 'updated_at'})
+        self.assertEqual(messages[2]['data']['status'], 'completed')
+        self.assertEqual(messages[2]['data']['output_files'], [{'name': 'a_karaoke.mp4'}])
+        self.assertEqual(sum(m['data'].get('status') == 'completed' for m in messages), 1)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the SQLite job store
+
+"""
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from subsai.cancellation import CancellationToken
+from subsai.job_store import JobHeartbeat, JobStore
+
+
+class TestJobStore(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = JobStore(Path(self.tmp_dir.name) / 'jobs.db', lease_seconds=60)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_public_shape_and_updates(self):
+        job = self.store.create('a', ['/tmp/x.mp4', '/tmp/y.mp4'], {'style_name': 'neon'})
+        self.assertEqual(job['status'], 'pending')
+        self.assertEqual(job['total_files'], 2)
+        self.assertEqual(job['output_files'], [])
+        self.assertNotIn('config', job)
+
+        self.store.increment('a', processed_files=1)
+        self.store.update('a', output_files=[{'name': 'x_karaoke.mp4'}], progress=50)
+        job = self.store.get('a')
+        self.assertEqual((job['processed_files'], job['progress']), (1, 50))
+        self.assertEqual(job['output_files'], [{'name': 'x_karaoke.mp4'}])
+        self.assertEqual(self.store.get('a', internal=True)['config'], {'style_name': 'neon'})
+        with self.assertRaises(KeyError):
+            self.store.update('a', colour='red')
+
+    def test_list_updated_since(self):
+        self.store.create('a', ['/tmp/x.mp4'], {})
+        self.store.create('b', ['/tmp/y.mp4'], {})
+        since = max(job['updated_at'] for job in (self.store.get('a'), self.store.get('b')))
+        self.assertEqual(self.store.list_updated_since(since), [])
+
+        # 另一个进程（独立连接）更新任务后，按 updated_at 查到变化
+        other = JobStore(self.store.db_path)
+        other.update('b', progress=30)
+        changed = self.store.list_updated_since(since)
+        self.assertEqual([(job['job_id'], job['progress']) for job in changed], [('b', 30)])
+        self.assertIn('output_count', changed[0])
+        self.assertEqual(self.store.list_updated_since(since, ['a']), [])
+        self.assertEqual(self.store.list_updated_since(since, []), [])
+
+    def test_claim_is_exclusive_across_connections(self):
+        for i in range(5):
+            self.store.create(f'job{i}', ['/tmp/x.mp4'], {})
+        claimed = []
+
+        def worker(worker_id):
+            # 每个线程使用独立连接，模拟多个进程
+            while True:
+                job = self.store.claim(worker_id)
+                if job is None:
+                    return
+                claimed.append(job['job_id'])
+
+        threads = [threading.Thread(target=worker, args=(f'w{i}',)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), [f'job{i}' for i in range(5)])
+
+    def test_stale_job_is_reclaimed_with_resume_position(self):
+        self.store.create('a', ['/tmp/x.mp4', '/tmp/y.mp4'], {})
+        self.assertEqual(self.store.claim('w1')['done_files'], [])
+        self.store.update('a', done_files=[1])
+        self.assertIsNone(self.store.claim('w2'))
+        self.assertTrue(self.store.heartbeat('a', 'w1'))
+
+        # 心跳超时后由其他worker接管，并从未完成的文件继续
+        self.store.update('a', heartbeat_at=time.time() - 120)
+        job = self.store.claim('w2')
+        self.assertEqual((job['job_id'], job['done_files'], job['worker_id']), ('a', [1], 'w2'))
+        self.assertFalse(self.store.heartbeat('a', 'w1'))
+
+    def test_finish_and_cancel_are_exclusive(self):
+        self.store.create('a', ['/tmp/x.mp4'], {})
+        self.store.create('b', ['/tmp/y.mp4'], {})
+        self.store.claim('w1')
+        self.store.claim('w1')
+
+        # 取消先到：worker不能再把任务标记为完成
+        self.assertTrue(self.store.cancel('a'))
+        self.assertFalse(self.store.finish('a', 'w1', 'completed', progress=100))
+        self.assertEqual(self.store.get('a')['status'], 'cancelled')
+        # 完成先到：取消不再生效
+        self.assertTrue(self.store.finish('b', 'w1', 'completed', progress=100))
+        self.assertFalse(self.store.cancel('b'))
+        self.assertEqual(self.store.get('b')['status'], 'completed')
+        self.assertFalse(self.store.cancel('missing'))
+
+    def test_lost_lease_cannot_finish_and_trips_token(self):
+        self.store.create('a', ['/tmp/x.mp4'], {})
+        self.store.claim('w1')
+        token = CancellationToken()
+        with JobHeartbeat(self.store, 'a', 'w1', token, interval=0.01):
+            # 租约过期后被w2接管
+            self.store.update('a', heartbeat_at=time.time() - 120)
+            self.assertEqual(self.store.claim('w2')['worker_id'], 'w2')
+            token._event.wait(1)
+        self.assertEqual(token.reason, 'lease_lost')
+        self.assertFalse(self.store.finish('a', 'w1', 'completed'))
+        self.assertTrue(self.store.finish('a', 'w2', 'completed'))
+
+    def test_job_failing_too_often_is_given_up(self):
+        store = JobStore(Path(self.tmp_dir.name) / 'jobs.db', lease_seconds=0, max_attempts=2)
+        store.create('a', ['/tmp/x.mp4'], {})
+        self.assertIsNotNone(store.claim('w1'))
+        self.assertIsNotNone(store.claim('w2'))
+        self.assertIsNone(store.claim('w3'))
+        self.assertEqual(store.get('a')['status'], 'failed')
+
+    def test_paginated_summaries_and_prune(self):
+        for i in range(7):
+            self.store.create(f'job{i}', ['/tmp/x.mp4'], {})
+            self.store.update(f'job{i}', created_at=f'2024-01-0{i + 1}T00:00:00')
+        self.store.update('job6', status='completed', output_files=[{'name': 'a'}, {'name': 'b'}])
+
+        page, total = self.store.list_jobs(limit=3, offset=0)
+        self.assertEqual(total, 7)
+        self.assertEqual([job['job_id'] for job in page], ['job6', 'job5', 'job4'])
+        self.assertNotIn('output_files', page[0])
+        self.assertEqual(page[0]['output_count'], 2)
+        self.assertEqual([job['job_id'] for job in self.store.list_jobs(limit=3, offset=6)[0]], ['job0'])
+        self.assertEqual(self.store.list_jobs(status='completed')[1], 1)
+
+        self.assertEqual(self.store.prune(ttl_seconds=3600), [])
+        self.assertEqual(self.store.prune(ttl_seconds=-1), ['job6'])
+        self.assertIsNone(self.store.get('job6'))
+        self.assertEqual(self.store.count_by_status(), {'pending': 6})
+
+    def test_claim_order_priority_and_fair_share(self):
+        self.store.create('a1', ['/tmp/x.mp4'], {}, client_id='a')
+        self.store.create('a2', ['/tmp/x.mp4'], {}, client_id='a')
+        self.store.create('b1', ['/tmp/x.mp4'], {}, client_id='b')
+        self.store.create('urgent', ['/tmp/x.mp4'], {}, client_id='a', priority=0)
+        self.store.create('later', ['/tmp/x.mp4'], {}, status='deferred', client_id='c')
+
+        # 高优先级最先；之后正在处理任务最少的客户端优先；延后的任务不会被领取
+        claimed = [self.store.claim('w')['job_id'] for _ in range(4)]
+        self.assertEqual(claimed, ['urgent', 'b1', 'a1', 'a2'])
+        self.assertIsNone(self.store.claim('w'))
+        self.assertEqual([job['job_id'] for job in self.store.list_queued(('deferred',))], ['later'])
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the karaoke generator
+
+The reference implementation below is the original per-word loop; the vectorized
+engine must produce byte-for-byte identical ASS output.
+"""
+import io
+import random
+from unittest import TestCase
+
+from pysubs2 import SSAFile, SSAEvent
+
+from subsai.karaoke_generator import KaraokeGenerator
+from subsai.word_timings import WordTimings
+
+
+def reference_generate(generator: KaraokeGenerator, words: list) -> SSAFile:
+    style = generator.style
+
+    def estimate_width(text):
+        fontsize = style.get_fontsize()
+        width = 0.0
+        for char in text:
+            if '\u4e00' <= char <= '\u9fff':
+                width += fontsize * 1.0
+            elif char == ' ':
+                width += fontsize * 0.3
+            else:
+                width += fontsize * 0.6
+        return width
+
+    lines = []
+    current_line = []
+    current_line_start = words[0]["start"] if words else 0
+    for word in words:
+        should_break = len(current_line) >= generator.words_per_line
+        if current_line and (word["end"] - current_line_start) > generator.max_line_duration_ms:
+            should_break = True
+        if should_break and current_line:
+            lines.append(current_line)
+            current_line = [word]
+            current_line_start = word["start"]
+        else:
+            current_line.append(word)
+    if current_line:
+        lines.append(current_line)
+
+    subs = SSAFile()
+    style_name = style.style_key if style.style_key else "Default"
+    subs.styles[style_name] = style.get_ssa_style()
+    for line in lines:
+        if generator.max_line_width_px and generator.max_line_width_px > 0:
+            result = ["{\\an2}"]
+            current_line_width = 0.0
+            max_width = generator.max_line_width_px * 0.8
+            for i, word in enumerate(line):
+                tag = style.get_karaoke_tags(max(1, (word["end"] - word["start"]) // 10))
+                word_width = estimate_width(word["word"])
+                space_width = estimate_width(" ") if i > 0 else 0
+                if i > 0 and current_line_width + space_width + word_width > max_width:
+                    result.append("\\N")
+                    current_line_width = 0
+                if i > 0 and current_line_width > 0:
+                    result.append(" ")
+                    current_line_width += space_width
+                result.append(f"{tag}{word['word']}")
+                current_line_width += word_width
+            text = "".join(result)
+        else:
+            text = " ".join(style.get_karaoke_tags(max(1, (word["end"] - word["start"]) // 10)) + word["word"]
+                            for word in line)
+        subs.append(SSAEvent(start=line[0]["start"], end=line[-1]["end"], text=text, style=style_name))
+    return subs
+
+
+class TestKaraokeGenerator(TestCase):
+
+    vocab = ['hello', 'world', '我们', '是', 'a', 'karaoke', 'supercalifragilistic', 'x', '测试文本', 'ab']
+
+    def random_words(self, rng, count):
+        words, t = [], 0
+        for _ in range(count):
+            duration = rng.choice([0, 5, 9, 10, 250, rng.randint(0, 3000)])
+            words.append({"word": rng.choice(self.vocab), "start": t, "end": t + duration})
+            t += duration + rng.choice([0, 0, rng.randint(-200, 800)])
+        return words
+
+    def assert_parity(self, words, **kwargs):
+        generator = KaraokeGenerator(**kwargs)
+        expected = reference_generate(generator, words).to_string('ass')
+        self.assertEqual(generator.generate_from_word_list(words).to_string('ass'), expected, kwargs)
+
+    def test_parity_without_wrap(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            self.assert_parity(self.random_words(rng, rng.randint(1, 80)),
+                               style_name=rng.choice(['classic', 'modern', 'neon', 'elegant', 'anime']),
+                               words_per_line=rng.randint(1, 20),
+                               max_line_duration_ms=rng.randint(0, 8000))
+
+    def test_parity_with_wrap(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            self.assert_parity(self.random_words(rng, rng.randint(1, 80)),
+                               words_per_line=rng.randint(1, 20),
+                               max_line_duration_ms=rng.randint(500, 8000),
+                               fontsize=rng.choice([None, 7, 48, 50, 64]),
+                               max_line_width_px=rng.choice([1, 100, 300, 720, 1080, 1920]))
+
+    def test_parity_at_exact_wrap_width(self):
+        # "ab ab" 在字号50时宽度为 30+30+15+30+30=135，正好等于 168.75*0.8
+        words = [{"word": "ab", "start": i * 100, "end": i * 100 + 100} for i in range(12)]
+        for max_line_width_px in [168.75, 168.7, 168.8, 262.5, 356.25]:
+            self.assert_parity(words, fontsize=50, words_per_line=12, max_line_width_px=max_line_width_px)
+
+    def test_parity_with_zero_width_words(self):
+        words = [{"word": "a", "start": i * 100, "end": i * 100 + 100} for i in range(8)]
+        self.assert_parity(words, fontsize=0, words_per_line=8, max_line_width_px=100)
+
+    def test_generate_from_ssafile(self):
+        subs = SSAFile()
+        subs.append(SSAEvent(start=0, end=3000, text="Hello world this is a test"))
+        subs.append(SSAEvent(start=3000, end=6000, text="Karaoke subtitle generator"))
+        karaoke = KaraokeGenerator(words_per_line=5).generate(subs)
+        self.assertEqual([(event.start, event.end) for event in karaoke], [(0, 2500), (2500, 6000)])
+        self.assertEqual(karaoke[0].text, "{\\kf50}Hello {\\kf50}world {\\kf50}this {\\kf50}is {\\kf50}a")
+
+    def test_lines_do_not_cross_lyric_lines(self):
+        words = WordTimings()
+        for i, (token, segment) in enumerate([('one', 0), ('two', 0), ('three', 0), ('four', 1), ('five', 1),
+                                              ('six', 2)]):
+            words.append(token, i * 100, i * 100 + 100, segment)
+
+        generator = KaraokeGenerator(words_per_line=2)
+        self.assertEqual(generator._group_words_by_lines(words), [(0, 2), (2, 4), (4, 6)])
+        generator.update(break_on_segments=True)
+        self.assertEqual(generator._group_words_by_lines(words), [(0, 2), (2, 3), (3, 5), (5, 6)])
+        self.assertEqual(len(generator.generate_from_word_timings(words)), 4)
+
+    def test_update_reuses_layout_and_matches_fresh_generator(self):
+        rng = random.Random(2)
+        subs = SSAFile()
+        for word in self.random_words(rng, 300):
+            subs.append(SSAEvent(start=word["start"], end=word["end"], text=word["word"]))
+
+        generator = KaraokeGenerator(words_per_line=8, max_line_width_px=720)
+        generator.generate(subs)
+        lines_entry = generator._stage_cache['lines']
+
+        changes = [
+            dict(style_name='neon', primary_color='#00FF00'),
+            dict(vertical_margin=80),
+            dict(fontsize=30),
+            dict(words_per_line=5),
+            dict(max_line_width_px=None),
+            dict(max_line_duration_ms=2000, max_line_width_px=1080),
+        ]
+        params = dict(words_per_line=8, max_line_width_px=720)
+        for change in changes:
+            params.update(change)
+            generator.update(**change)
+            self.assertEqual(generator.generate(subs).to_string('ass'),
+                             KaraokeGenerator(**params).generate(subs).to_string('ass'), change)
+            if set(change) <= set(KaraokeGenerator.STYLE_PARAMS):
+                # 样式修改不应重新分行
+                self.assertIs(generator._stage_cache['lines'], lines_entry)
+            lines_entry = generator._stage_cache['lines']
+
+        with self.assertRaises(TypeError):
+            generator.update(colour='#FFFFFF')
+
+    def test_streaming_writer_matches_pysubs2(self):
+        rng = random.Random(3)
+        words = self.random_words(rng, 400) + [{"word": "end", "start": 3723990, "end": 3723999}]
+        for kwargs in [dict(), dict(style_name='anime', max_line_width_px=607), dict(words_per_line=3)]:
+            generator = KaraokeGenerator(**kwargs)
+            timings = WordTimings.from_word_list(words)
+            buffer = io.StringIO()
+            count = generator.write_ass(timings, buffer)
+            expected = generator.generate_from_word_timings(timings)
+            self.assertEqual(count, len(expected))
+            self.assertEqual(buffer.getvalue(), expected.to_string('ass'))
+
+        buffer = io.StringIO()
+        self.assertEqual(KaraokeGenerator().write_ass(SSAFile(), buffer), 0)
+        self.assertEqual(buffer.getvalue(), SSAFile().to_string('ass'))
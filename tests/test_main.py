@@ -70,3 +70,11 @@ class TestTools(TestCase):
         Tools.merge_subs_with_video({'English': self.subs}, self.file, 'subs-merged')
         in_file = pathlib.Path(self.file)
         self.assertTrue((in_file.parent / f"subs-merged{in_file.suffix}").exists())
+
+    def test_merge_subs_with_video_many(self):
+        items = [{'subs': {'English': self.subs}, 'media_file': self.file, 'output_filename': 'subs-merged-many'},
+                 {'subs': {'English': self.subs}, 'media_file': 'missing.webm'}]
+        results = Tools.merge_subs_with_video_many(items, workers=2)
+        self.assertEqual([r['status'] for r in results], ['done', 'failed'])
+        in_file = pathlib.Path(self.file)
+        self.assertTrue((in_file.parent / f"subs-merged-many{in_file.suffix}").exists())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the text exposition metrics registry
+
+"""
+from unittest import TestCase
+
+from subsai.metrics import Registry, process_rss_bytes
+
+
+class TestMetrics(TestCase):
+
+    def test_render_text_format(self):
+        registry = Registry()
+        files = registry.counter('subsai_files_total', 'Processed files', ['result'])
+        depth = registry.gauge('subsai_queue_depth', 'Pending jobs')
+        stage = registry.histogram('subsai_stage_duration_seconds', 'Stage duration', ['stage'], buckets=(1, 10))
+
+        files.inc(result='succeeded')
+        files.inc(2, result='succeeded')
+        depth.set(4)
+        for value in (0.5, 5, 50):
+            stage.observe(value, stage='burn')
+
+        text = registry.render()
+        self.assertIn('# TYPE subsai_files_total counter', text)
+        self.assertIn('subsai_files_total{result="succeeded"} 3', text)
+        self.assertIn('subsai_queue_depth 4', text)
+        self.assertIn('subsai_stage_duration_seconds_bucket{stage="burn",le="1"} 1', text)
+        self.assertIn('subsai_stage_duration_seconds_bucket{stage="burn",le="10"} 2', text)
+        self.assertIn('subsai_stage_duration_seconds_bucket{stage="burn",le="+Inf"} 3', text)
+        self.assertIn('subsai_stage_duration_seconds_sum{stage="burn"} 55.5', text)
+        self.assertIn('subsai_stage_duration_seconds_count{stage="burn"} 3', text)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_label_and_value_checks(self):
+        registry = Registry()
+        counter = registry.counter('c_total', 'c', ['kind'])
+        with self.assertRaises(ValueError):
+            counter.inc(kind='a', extra='b')
+        with self.assertRaises(ValueError):
+            counter.inc(-1, kind='a')
+        with self.assertRaises(ValueError):
+            registry.gauge('c_total', 'duplicate')
+
+    def test_process_rss(self):
+        self.assertGreater(process_rss_bytes(), 0)
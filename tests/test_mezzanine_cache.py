@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the mezzanine cache
+
+"""
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from subsai.cancellation import JobCancelled
+from subsai.mezzanine_cache import MezzanineCache
+
+
+class TestMezzanineCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name)
+        self.cache = MezzanineCache(self.root / 'cache')
+        self.media = self.root / 'song.mp4'
+        self.media.write_bytes(b'media' * 100)
+        self.commands = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def runner(self, cmd, pass_fds, env):
+        # 假的ffmpeg：把输出写到命令的最后一个参数
+        self.commands.append(cmd)
+        Path(cmd[-1]).write_bytes(b'lossless')
+        return 0, b''
+
+    def test_runner_encodes_once(self):
+        first = self.cache.get_or_create(str(self.media), 'scale=1920:1080', None, ffmpeg_runner=self.runner)
+        second = self.cache.get_or_create(str(self.media), 'scale=1920:1080', None, ffmpeg_runner=self.runner)
+        self.assertEqual(first, second)
+        self.assertEqual(Path(first).read_bytes(), b'lossless')
+        self.assertEqual(len(self.commands), 1)
+        self.assertIn('scale=1920:1080', self.commands[0])
+
+    def test_cancelled_encode_leaves_nothing(self):
+        def cancelled_runner(cmd, pass_fds, env):
+            # 运行器终止了写到一半的ffmpeg
+            Path(cmd[-1]).write_bytes(b'partial')
+            raise JobCancelled('cancelled')
+
+        with self.assertRaises(JobCancelled):
+            self.cache.get_or_create(str(self.media), 'scale=1920:1080', None, ffmpeg_runner=cancelled_runner)
+        self.assertEqual(list((self.root / 'cache' / 'tmp').iterdir()), [])
+        key = self.cache.cache_key(str(self.media), 'scale=1920:1080', None)
+        self.assertIsNone(self.cache.cache.get(key, '.mkv'))
+
+    def test_failed_encode_raises(self):
+        with self.assertRaises(Exception) as context:
+            self.cache.get_or_create(str(self.media), None, 'crop=1080:1920:0:0',
+                                     ffmpeg_runner=lambda cmd, pass_fds, env: (1, b'bad filter'))
+        self.assertIn('bad filter', str(context.exception))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the transcript and render result cache
+
+"""
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from pysubs2 import SSAEvent, SSAFile
+
+from subsai.result_cache import ResultCache, dump_transcript, load_transcript
+from subsai.word_timings import WordTimings, attach_word_timings, get_word_timings
+
+
+class TestResultCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name)
+        self.cache = ResultCache(self.root / 'cache')
+        self.media = self.root / 'song.mp4'
+        self.media.write_bytes(b'media' * 100)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_transcript_key_ignores_runtime_options(self):
+        key = self.cache.transcript_key(str(self.media), 'openai/whisper', {'model_type': 'base', 'device': 'cpu'})
+        self.assertEqual(key, self.cache.transcript_key(str(self.media), 'openai/whisper',
+                                                        {'model_type': 'base', 'device': 'cuda', 'language': None}))
+        self.assertNotEqual(key, self.cache.transcript_key(str(self.media), 'openai/whisper', {'model_type': 'small'}))
+
+    def test_transcript_key_prefers_content_hash(self):
+        # 采样指纹相同（大小和采样块一致）的两个文件，按上传时的完整SHA-256区分
+        first = self.cache.transcript_key(str(self.media), 'openai/whisper', {}, 'a' * 64)
+        second = self.cache.transcript_key(str(self.media), 'openai/whisper', {}, 'b' * 64)
+        self.assertNotEqual(first, second)
+        self.assertNotEqual(first, self.cache.transcript_key(str(self.media), 'openai/whisper', {}))
+
+    def test_transcript_round_trip_keeps_word_timings(self):
+        subs = SSAFile()
+        subs.append(SSAEvent(start=0, end=1000, text='hello world'))
+        attach_word_timings(subs, WordTimings.from_word_list([
+            {'word': 'hello', 'start': 0, 'end': 400},
+            {'word': 'world', 'start': 500, 'end': 1000},
+        ]))
+        key = self.cache.transcript_key(str(self.media), 'openai/whisper', {})
+
+        self.assertIsNone(self.cache.get_transcript(key))
+        self.cache.put_transcript(key, subs)
+        cached = self.cache.get_transcript(key)
+
+        self.assertEqual([(e.start, e.end, e.text) for e in cached], [(0, 1000, 'hello world')])
+        self.assertEqual(get_word_timings(cached).to_word_list(), get_word_timings(subs).to_word_list())
+        self.assertEqual(self.cache.stats()['transcript_hit_rate'], 0.5)
+
+    def test_dump_and_load_transcript(self):
+        subs = SSAFile()
+        subs.append(SSAEvent(start=0, end=800, text='la la'))
+        attach_word_timings(subs, WordTimings.from_word_list([
+            {'word': 'la', 'start': 0, 'end': 300},
+            {'word': 'la', 'start': 400, 'end': 800},
+        ]))
+        path = self.root / 'transcript.json'
+        path.write_bytes(dump_transcript(subs))
+
+        loaded = load_transcript(path)
+        self.assertEqual([(e.start, e.end, e.text) for e in loaded], [(0, 800, 'la la')])
+        self.assertEqual(get_word_timings(loaded).to_word_list(), get_word_timings(subs).to_word_list())
+
+    def test_render_hit_links_output(self):
+        render = self.root / 'render.mp4'
+        render.write_bytes(b'rendered video')
+        key = self.cache.render_key('transcript', {'style_name': 'neon'}, {'crf': 18, 'preset': 'medium'})
+        self.assertNotEqual(key, self.cache.render_key('transcript', {'style_name': 'classic'},
+                                                       {'crf': 18, 'preset': 'medium'}))
+
+        output = self.root / 'out.mp4'
+        self.assertFalse(self.cache.get_render(key, '.mp4', output))
+        self.cache.put_render(key, render)
+        self.assertTrue(self.cache.get_render(key, '.mp4', output))
+        self.assertEqual(output.read_bytes(), b'rendered video')
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the in-memory subtitle transport
+
+"""
+import os
+import subprocess
+import sys
+import unittest
+from unittest import TestCase
+
+from pysubs2 import SSAEvent, SSAFile
+
+from subsai.subtitle_transport import SubtitleTransport
+
+
+def make_subs():
+    subs = SSAFile()
+    subs.append(SSAEvent(start=0, end=1000, text='你好 world'))
+    return subs
+
+
+class TestSubtitleTransport(TestCase):
+
+    @unittest.skipUnless(hasattr(os, 'memfd_create'), 'memfd_create is not available')
+    def test_child_reads_memfd(self):
+        with SubtitleTransport(make_subs(), 'ass') as transport:
+            self.assertTrue(transport.path.startswith('/dev/fd/'))
+            self.assertEqual(len(transport.pass_fds), 1)
+            # 子进程按路径重新打开内存文件（与ffmpeg的 ass= 滤镜相同）
+            result = subprocess.run([sys.executable, '-c',
+                                     'import sys; sys.stdout.buffer.write(open(sys.argv[1], "rb").read())',
+                                     transport.path],
+                                    capture_output=True, check=True, pass_fds=transport.pass_fds)
+            self.assertEqual(result.stdout, transport.data)
+            self.assertIn('你好 world', result.stdout.decode('utf-8'))
+            fd = transport.pass_fds[0]
+
+        self.assertEqual(transport.pass_fds, ())
+        with self.assertRaises(OSError):
+            os.fstat(fd)
+
+    def test_tempfile_fallback_is_removed(self):
+        memfd_create = getattr(os, 'memfd_create', None)
+        if memfd_create is not None:
+            del os.memfd_create
+            self.addCleanup(setattr, os, 'memfd_create', memfd_create)
+
+        with SubtitleTransport('[Script Info]\n', 'ass') as transport:
+            path = transport.path
+            self.assertTrue(path.endswith('.ass'))
+            self.assertEqual(transport.pass_fds, ())
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b'[Script Info]\n')
+        self.assertFalse(os.path.exists(path))
+
+        # 出错退出时同样删除临时文件
+        with self.assertRaises(RuntimeError):
+            with SubtitleTransport(b'data', 'srt') as transport:
+                path = transport.path
+                raise RuntimeError('ffmpeg failed')
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the text width providers
+
+"""
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import TestCase, mock
+
+from subsai import fonts
+from subsai.text_metrics import (TTFont, FontMetricsWidthProvider, HeuristicWidthProvider,
+                                 get_width_provider, heuristic_text_width)
+
+
+def build_test_font(path: str):
+    from fontTools.fontBuilder import FontBuilder
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(['.notdef', 'a', 'space'])
+    builder.setupCharacterMap({ord('a'): 'a', ord(' '): 'space'})
+    builder.setupGlyf({name: TTGlyphPen(None).glyph() for name in ['.notdef', 'a', 'space']})
+    builder.setupHorizontalMetrics({'.notdef': (500, 0), 'a': (600, 0), 'space': (250, 0)})
+    builder.setupHorizontalHeader(ascent=800, descent=-200)
+    builder.setupOS2(usWinAscent=800, usWinDescent=200)
+    builder.setupNameTable({'familyName': 'SubsaiTest', 'styleName': 'Regular'})
+    builder.setupPost()
+    builder.save(path)
+
+
+class TestTextMetrics(TestCase):
+
+    def test_heuristic_provider_matches_character_classes(self):
+        provider = HeuristicWidthProvider(50)
+        self.assertEqual(provider.text_width('ab 我'), heuristic_text_width('ab 我', 50))
+        self.assertEqual(provider.text_width('ab 我'), 50 * 0.6 * 2 + 50 * 0.3 + 50 * 1.0)
+
+    def test_provider_is_shared_per_font_and_size(self):
+        self.assertIs(get_width_provider('Arial', 48), get_width_provider('Arial', 48))
+        self.assertIsNot(get_width_provider('Arial', 48), get_width_provider('Arial', 60))
+
+    @unittest.skipIf(TTFont is None, 'fontTools is not installed')
+    def test_font_metrics_provider_uses_glyph_advances(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            font_file = str(Path(tmp_dir) / 'test.ttf')
+            build_test_font(font_file)
+            provider = FontMetricsWidthProvider(font_file, 50)
+            # 字号映射到 usWinAscent + usWinDescent = 1000 个字体单位
+            self.assertAlmostEqual(provider.text_width('aa a'), (600 * 3 + 250) * 50 / 1000)
+            # 字体中缺失的字符按字符类别估算
+            self.assertAlmostEqual(provider.text_width('a我'), 600 * 50 / 1000 + 50 * 1.0)
+
+    @unittest.skipIf(TTFont is None, 'fontTools is not installed')
+    def test_fallback_is_not_cached(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            font_file = str(Path(tmp_dir) / 'test.ttf')
+            build_test_font(font_file)
+            # 第一次字体无法解析，放入字体目录后第二次解析成功
+            with mock.patch.object(fonts, 'resolve_font', side_effect=[None, font_file]):
+                self.assertIsInstance(get_width_provider('SubsaiTest', 50, True), HeuristicWidthProvider)
+                provider = get_width_provider('SubsaiTest', 50, True)
+            self.assertIsInstance(provider, FontMetricsWidthProvider)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the content-addressed upload store
+
+"""
+import hashlib
+import io
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from subsai.upload_store import UploadStore
+
+
+class TestUploadStore(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.tmp_dir.name)
+        self.store = UploadStore(root / 'uploads', root / 'jobs.db')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_ingest_deduplicates_content(self):
+        data = b'video' * 1000
+        first = self.store.ingest(io.BytesIO(data), 'a.mp4')
+        second = self.store.ingest(io.BytesIO(data), 'b.mp4')
+
+        self.assertEqual(first['sha256'], hashlib.sha256(data).hexdigest())
+        self.assertFalse(first['deduplicated'])
+        self.assertTrue(second['deduplicated'])
+        self.assertNotEqual(first['id'], second['id'])
+        self.assertEqual(len(list(self.store.blob_dir.rglob('*.mp4'))), 1)
+
+        path = self.store.resolve(second['id'])
+        self.assertEqual(path.name, f"{second['id']}.mp4")
+        self.assertEqual(path.read_bytes(), data)
+        self.assertIsNone(self.store.resolve('missing'))
+        self.assertEqual(self.store.content_sha256(path), first['sha256'])
+        self.assertIsNone(self.store.content_sha256(self.store.upload_dir / 'other.mp4'))
+
+    def test_resumable_upload(self):
+        data = bytes(range(256)) * 100
+        session = self.store.create_session('song.mkv', len(data))
+        upload_id = session['upload_id']
+
+        self.assertEqual(self.store.append(upload_id, 0, data[:1000]), 1000)
+        with self.assertRaises(ValueError):
+            self.store.append(upload_id, 500, data[500:1500])
+        with self.assertRaises(ValueError):
+            self.store.complete(upload_id)
+
+        self.assertEqual(self.store.append(upload_id, 1000, data[1000:]), len(data))
+        record = self.store.complete(upload_id)
+
+        self.assertEqual(record['sha256'], hashlib.sha256(data).hexdigest())
+        self.assertEqual(self.store.resolve(record['id']).read_bytes(), data)
+        self.assertIsNone(self.store.get_session(upload_id))
+        with self.assertRaises(KeyError):
+            self.store.complete(upload_id)
+
+    def test_session_spans_workers(self):
+        # 两个实例共用目录和数据库，模拟分块请求落在不同的uvicorn worker上
+        root = Path(self.tmp_dir.name)
+        other = UploadStore(root / 'uploads', root / 'jobs.db')
+        data = b'chunked' * 500
+        upload_id = self.store.create_session('clip.mp4', len(data))['upload_id']
+
+        self.assertEqual(other.append(upload_id, 0, data[:1000]), 1000)
+        with self.assertRaises(ValueError):
+            self.store.append(upload_id, 0, data[:1000])
+        self.assertEqual(self.store.append(upload_id, 1000, data[1000:]), len(data))
+        record = self.store.complete(upload_id)
+
+        self.assertEqual(record['sha256'], hashlib.sha256(data).hexdigest())
+        self.assertEqual(other.resolve(record['id']).read_bytes(), data)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the vocal stem cache
+
+"""
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from subsai.vocal_cache import VocalStemCache, VOCAL_SUFFIX
+
+
+class TestVocalStemCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = VocalStemCache(Path(self.tmp_dir.name) / 'vocals', max_size_gb=1)
+        self.media = Path(self.tmp_dir.name) / 'song.mp4'
+        self.media.write_bytes(b'media' * 1000)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_key_depends_on_content_and_options(self):
+        key = self.cache.cache_key(str(self.media), {'shifts': 1, 'overlap': 0.25})
+        self.assertEqual(key, self.cache.cache_key(str(self.media), {'overlap': 0.25, 'shifts': 1, 'device': 'cuda'}))
+        self.assertNotEqual(key, self.cache.cache_key(str(self.media), {'shifts': 2, 'overlap': 0.25}))
+        self.assertNotEqual(self.cache.cache_key(str(self.media)), self.cache.cache_key(str(self.media), {'shifts': 1}))
+
+        copy = Path(self.tmp_dir.name) / 'copy.mp4'
+        copy.write_bytes(self.media.read_bytes())
+        self.assertEqual(key, self.cache.cache_key(str(copy), {'shifts': 1, 'overlap': 0.25}))
+
+    def test_hit_returns_cached_vocals(self):
+        key = self.cache.cache_key(str(self.media), None)
+        path = self.cache.cache.put_bytes(key, b'RIFF', VOCAL_SUFFIX)
+        self.assertEqual(self.cache.get_or_create(str(self.media)), str(path.resolve()))
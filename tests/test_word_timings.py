@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the word timings module
+
+"""
+from unittest import TestCase
+
+from pysubs2 import SSAFile, SSAEvent
+
+from subsai.karaoke_generator import KaraokeGenerator
+from subsai.word_timings import WordTimings, attach_word_timings, get_word_timings
+
+
+class TestWordTimings(TestCase):
+
+    words = [
+        {"word": "Hello", "start": 0, "end": 400},
+        {"word": "karaoke", "start": 400, "end": 1200},
+        {"word": " ", "start": 1200, "end": 1300},
+        {"word": "world", "start": 1300, "end": 2000},
+    ]
+
+    def test_from_word_list_skips_empty_tokens(self):
+        timings = WordTimings.from_word_list(self.words)
+        self.assertEqual(len(timings), 3)
+        self.assertEqual(timings.tokens, ["Hello", "karaoke", "world"])
+        self.assertEqual(list(timings.starts), [0, 400, 1300])
+
+    def test_from_ssafile_spreads_event_duration(self):
+        subs = SSAFile()
+        subs.append(SSAEvent(start=1000, end=2000, text="one two three four"))
+        timings = WordTimings.from_ssafile(subs)
+        self.assertEqual(list(timings.starts), [1000, 1250, 1500, 1750])
+        self.assertEqual(list(timings.ends), [1250, 1500, 1750, 2000])
+
+    def test_attached_timings_are_used_by_generator(self):
+        timings = WordTimings.from_word_list(self.words)
+        subs = attach_word_timings(timings.to_ssafile(), timings)
+        self.assertIs(get_word_timings(subs), timings)
+        generator = KaraokeGenerator(words_per_line=10)
+        self.assertEqual(generator.generate(subs).to_string('ass'),
+                         generator.generate_from_word_list(self.words).to_string('ass'))
+
+    def test_attached_timings_invalidated_by_edits(self):
+        timings = WordTimings.from_word_list(self.words)
+        subs = attach_word_timings(timings.to_ssafile(), timings)
+        subs.shift(ms=500)
+        self.assertIsNone(get_word_timings(subs))
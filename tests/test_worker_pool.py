@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test file for the stage slots and the model pool
+
+"""
+import asyncio
+from unittest import TestCase
+
+from subsai.worker_pool import ModelPool, StageSlots
+
+
+class TestStageSlots(TestCase):
+
+    def test_capacity_is_enforced(self):
+        slots = StageSlots('encode', 2)
+        peak = []
+
+        async def work():
+            async with slots.acquire():
+                peak.append(slots.busy)
+                await asyncio.sleep(0.01)
+
+        async def main():
+            await asyncio.gather(*(work() for _ in range(5)))
+
+        asyncio.run(main())
+        self.assertEqual(max(peak), 2)
+        stats = slots.stats()
+        self.assertEqual(stats['completed'], 5)
+        self.assertEqual(stats['busy'], 0)
+        self.assertEqual(stats['waiting'], 0)
+        self.assertGreater(stats['busy_seconds'], 0)
+        self.assertLessEqual(stats['utilisation'], 1)
+
+
+class TestModelPool(TestCase):
+
+    def test_reuse_and_eviction(self):
+        pool = ModelPool(max_models=1)
+        loaded = []
+
+        def factory(name):
+            def load():
+                loaded.append(name)
+                return object()
+            return load
+
+        a = pool.acquire('a', factory('a'))
+        pool.release('a', a)
+        self.assertIs(pool.acquire('a', factory('a')), a)
+        pool.release('a', a)
+
+        b = pool.acquire('b', factory('b'))
+        pool.release('b', b)
+        self.assertEqual(loaded, ['a', 'b'])
+        stats = pool.stats()
+        self.assertEqual((stats['hits'], stats['loads'], stats['evictions']), (1, 2, 1))
+        self.assertEqual((stats['idle'], stats['in_use']), (1, 0))
+
+    def test_failed_load_releases_slot(self):
+        pool = ModelPool(max_models=1)
+
+        def broken():
+            raise RuntimeError('no model')
+
+        with self.assertRaises(RuntimeError):
+            pool.acquire('a', broken)
+        self.assertEqual(pool.stats()['in_use'], 0)
@@ -3,6 +3,7 @@ const state = {
     uploadedFiles: [],
     selectedFiles: [],
     currentJob: null,
+    jobs: {},
     ws: null,
     config: {}
 };
@@ -10,6 +11,11 @@ const state = {
 // API基础URL
 const API_BASE = window.location.protocol + '//' + window.location.hostname + ':8001/api';
 
+// 超过此大小的文件使用可续传的分块上传
+const CHUNKED_UPLOAD_THRESHOLD = 64 * 1024 * 1024;
+const UPLOAD_CHUNK_SIZE = 16 * 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 5;
+
 // 初始化应用
 document.addEventListener('DOMContentLoaded', async () => {
     initTabs();
@@ -145,21 +151,42 @@ async function uploadFiles() {
     uploadProgress.style.display = 'block';
     uploadBtn.disabled = true;
 
-    const formData = new FormData();
-    state.selectedFiles.forEach(file => {
-        formData.append('files', file);
-    });
+    const smallFiles = state.selectedFiles.filter(file => file.size <= CHUNKED_UPLOAD_THRESHOLD);
+    const largeFiles = state.selectedFiles.filter(file => file.size > CHUNKED_UPLOAD_THRESHOLD);
+    const totalBytes = state.selectedFiles.reduce((sum, file) => sum + file.size, 0) || 1;
+    let doneBytes = 0;
+    const showProgress = (bytes) => {
+        uploadProgressBar.style.width = `${Math.round(bytes / totalBytes * 100)}%`;
+    };
 
     try {
         uploadStatus.textContent = '正在上传...';
-        uploadProgressBar.style.width = '50%';
+        const files = [];
 
-        const response = await fetch(`${API_BASE}/upload`, {
-            method: 'POST',
-            body: formData
-        });
+        if (smallFiles.length > 0) {
+            const formData = new FormData();
+            smallFiles.forEach(file => {
+                formData.append('files', file);
+            });
+            const response = await fetch(`${API_BASE}/upload`, {
+                method: 'POST',
+                body: formData
+            });
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            files.push(...(await response.json()).files);
+            doneBytes += smallFiles.reduce((sum, file) => sum + file.size, 0);
+            showProgress(doneBytes);
+        }
 
-        const data = await response.json();
+        for (const file of largeFiles) {
+            uploadStatus.textContent = `正在上传 ${file.name}...`;
+            files.push(await uploadFileChunked(file, bytes => showProgress(doneBytes + bytes)));
+            doneBytes += file.size;
+        }
+
+        const data = {success: true, files: files, count: files.length};
 
         if (data.success) {
             uploadProgressBar.style.width = '100%';
@@ -187,6 +214,54 @@ async function uploadFiles() {
     }
 }
 
+// 分块上传大文件：每块按偏移发送，失败时查询服务端进度后续传
+async function uploadFileChunked(file, onProgress) {
+    const sessionResponse = await fetch(`${API_BASE}/uploads`, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({name: file.name, size: file.size})
+    });
+    if (!sessionResponse.ok) {
+        throw new Error(`HTTP ${sessionResponse.status}`);
+    }
+    const uploadId = (await sessionResponse.json()).upload_id;
+
+    let offset = 0;
+    let retries = 0;
+    while (offset < file.size) {
+        const chunk = file.slice(offset, offset + UPLOAD_CHUNK_SIZE);
+        try {
+            const response = await fetch(`${API_BASE}/uploads/${uploadId}?offset=${offset}`, {
+                method: 'PUT',
+                headers: {'Content-Type': 'application/octet-stream'},
+                body: chunk
+            });
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            offset = (await response.json()).received;
+            retries = 0;
+            onProgress(offset);
+        } catch (error) {
+            if (++retries > UPLOAD_MAX_RETRIES) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            // 以服务端已接收的字节数为准续传
+            const status = await fetch(`${API_BASE}/uploads/${uploadId}`);
+            if (status.ok) {
+                offset = (await status.json()).received;
+            }
+        }
+    }
+
+    const response = await fetch(`${API_BASE}/uploads/${uploadId}/complete`, {method: 'POST'});
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+    return await response.json();
+}
+
 // 加载配置
 async function loadConfig() {
     try {
@@ -383,21 +458,52 @@ async function startProcess() {
 
             // 清空已上传文件
             state.uploadedFiles = [];
+        } else {
+            // 参数无效或服务繁忙（429）
+            showToast('启动处理失败：' + (data.detail || response.statusText), 'error');
         }
     } catch (error) {
         showToast('启动处理失败：' + error.message, 'error');
     }
 }
 
+// 列表接口只返回摘要：为有输出的已完成任务补充输出文件列表
+async function fetchJobsWithOutputs() {
+    const response = await fetch(`${API_BASE}/jobs?limit=50`);
+    const data = await response.json();
+    await Promise.all(data.jobs.map(async job => {
+        job.output_files = [];
+        if (job.status === 'completed' && job.output_count > 0) {
+            const detail = await fetch(`${API_BASE}/jobs/${job.job_id}`);
+            if (detail.ok) {
+                job.output_files = (await detail.json()).output_files;
+            }
+        }
+    }));
+    return data;
+}
+
 // 加载任务列表
 async function loadJobs() {
     try {
-        const response = await fetch(`${API_BASE}/jobs`);
-        const data = await response.json();
+        const data = await fetchJobsWithOutputs();
+        state.jobs = {};
+        data.jobs.forEach(job => {
+            state.jobs[job.job_id] = job;
+        });
+        renderJobs();
+    } catch (error) {
+        console.error('加载任务失败:', error);
+    }
+}
 
+// 渲染任务列表（WebSocket增量更新后也会调用）
+function renderJobs() {
+    try {
+        const jobs = Object.values(state.jobs);
         const jobsList = document.getElementById('jobsList');
 
-        if (data.jobs.length === 0) {
+        if (jobs.length === 0) {
             jobsList.innerHTML = `
                 <div class="empty-state">
                     <i class="fas fa-inbox"></i>
@@ -410,7 +516,7 @@ async function loadJobs() {
 
         jobsList.innerHTML = '';
 
-        data.jobs.sort((a, b) => new Date(b.created_at) - new Date(a.created_at)).forEach(job => {
+        jobs.sort((a, b) => new Date(b.created_at) - new Date(a.created_at)).forEach(job => {
             const card = document.createElement('div');
             card.className = `job-card ${job.status}`;
             card.innerHTML = `
@@ -434,6 +540,11 @@ async function loadJobs() {
                     <p style="text-align: center; margin-top: 0.5rem;">
                         ${job.current_file || '准备中...'} (${job.progress}%)
                     </p>
+                    ${job.estimated_finish_at && job.status === 'pending' ? `
+                    <p style="text-align: center; font-size: 0.875rem; color: #718096;">
+                        预计完成: ${new Date(job.estimated_finish_at).toLocaleString('zh-CN')}
+                    </p>
+                    ` : ''}
                 </div>
                 ` : ''}
 
@@ -450,6 +561,10 @@ async function loadJobs() {
                         <div class="job-stat-value">${job.failed_files}</div>
                         <div class="job-stat-label">失败</div>
                     </div>
+                    <div class="job-stat">
+                        <div class="job-stat-value">${(job.transcript_cache_hits || 0) + (job.render_cache_hits || 0)}</div>
+                        <div class="job-stat-label">缓存命中</div>
+                    </div>
                 </div>
 
                 ${job.status === 'completed' && job.output_files.length > 0 ? `
@@ -473,6 +588,11 @@ async function loadJobs() {
                 ` : ''}
 
                 <div style="margin-top: 1rem;">
+                    ${['processing', 'pending', 'deferred'].includes(job.status) ? `
+                    <button class="btn btn-sm btn-secondary" onclick="cancelJob('${job.job_id}')">
+                        <i class="fas fa-stop"></i> 取消任务
+                    </button>
+                    ` : ''}
                     <button class="btn btn-sm btn-danger" onclick="deleteJob('${job.job_id}')">
                         <i class="fas fa-trash"></i> 删除任务
                     </button>
@@ -481,7 +601,51 @@ async function loadJobs() {
             jobsList.appendChild(card);
         });
     } catch (error) {
-        console.error('加载任务失败:', error);
+        console.error('渲染任务失败:', error);
+    }
+}
+
+// 合并服务端推送的任务增量，同一帧内只重绘一次
+let renderScheduled = false;
+function applyJobUpdate(message) {
+    const job = state.jobs[message.job_id];
+    if (message.data.deleted) {
+        delete state.jobs[message.job_id];
+    } else if (!job || message.data.status === 'completed') {
+        // 新任务或刚完成的任务需要完整信息（输出文件列表）
+        loadJobs();
+        return;
+    } else {
+        Object.assign(job, message.data);
+    }
+    if (!renderScheduled) {
+        renderScheduled = true;
+        requestAnimationFrame(() => {
+            renderScheduled = false;
+            const activeTab = document.querySelector('.tab-content.active');
+            if (activeTab && activeTab.id === 'jobs-tab') {
+                renderJobs();
+            }
+        });
+    }
+}
+
+// 取消任务（已完成的输出文件保留）
+async function cancelJob(jobId) {
+    if (!confirm('确定要取消此任务吗？')) return;
+
+    try {
+        const response = await fetch(`${API_BASE}/jobs/${jobId}/cancel`, {
+            method: 'POST'
+        });
+        if (!response.ok) {
+            const data = await response.json();
+            throw new Error(data.detail || response.statusText);
+        }
+        showToast('任务已取消', 'success');
+        loadJobs();
+    } catch (error) {
+        showToast('取消失败：' + error.message, 'error');
     }
 }
 
@@ -503,8 +667,7 @@ async function deleteJob(jobId) {
 // 加载下载列表
 async function loadDownloads() {
     try {
-        const response = await fetch(`${API_BASE}/jobs`);
-        const data = await response.json();
+        const data = await fetchJobsWithOutputs();
 
         const downloadsList = document.getElementById('downloadsList');
         const completedJobs = data.jobs.filter(j => j.status === 'completed' && j.output_files.length > 0);
@@ -552,7 +715,8 @@ async function loadDownloads() {
 // WebSocket连接
 function initWebSocket() {
     const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const wsUrl = `${wsProtocol}//${window.location.hostname}:8001/ws`;
+    // 订阅全部任务的摘要（不含输出文件列表），只接收变化的字段
+    const wsUrl = `${wsProtocol}//${window.location.hostname}:8001/ws?jobs=*`;
 
     state.ws = new WebSocket(wsUrl);
 
@@ -565,7 +729,7 @@ function initWebSocket() {
 
         if (data.type === 'job_update') {
             // 更新任务显示
-            loadJobs();
+            applyJobUpdate(data);
         }
     };
 
@@ -600,7 +764,9 @@ function getStatusText(status) {
         'pending': '等待中',
         'processing': '处理中',
         'completed': '已完成',
-        'failed': '失败'
+        'failed': '失败',
+        'cancelled': '已取消',
+        'deferred': '已延后'
     };
     return statusMap[status] || status;
 }